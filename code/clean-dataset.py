@@ -5,12 +5,30 @@ from evals.concepts import (
     OPERATOR_MAP,
     _slug,             
 )
+from extractor.columnar import parquet_path, read_dataset, write_parquet
+import numpy as np
 import pandas as pd
+import argparse
+import functools
+import hashlib
+import io
+import json
+import os
 import re
 
+# Incremental runs: the cleaned output has a state file next to it (cleaned_x.csv -> cleaned_x.clean-state.json)
+# holding a hash of the raw text of the row each cleaned row came from. A run re-cleans only raw rows that are
+# new or whose hash changed, drops rows whose file left the raw dataset, and merges the rest back into the
+# sorted output as they were. The state also holds a fingerprint of the cleaning rules (the concept maps,
+# the columns and CLEANING_VERSION); when it changes, or with --full-rebuild, every row is cleaned again.
+CLEANING_VERSION = 2  # bump when a cleaning step changes
+
 def load_dataset(path):
-    return pd.read_csv(
+    # .parquet files come back with their stored types. CSVs are read as text, so no column's type is guessed
+    # from whichever rows happen to be in the file (one blank year would otherwise write every year as 2018.0)
+    return read_dataset(
         path,
+        dtype=str,
         na_values=['', 'none', 'n/a', 'na', 'null'],
         keep_default_na=True
     )
@@ -19,18 +37,26 @@ def standardize_column_names(df):
     df.columns = [col.strip().lower() for col in df.columns]
     return df
 
+def text_columns(df):
+    # Every column but filename that isn't numbers or dates: whether a column holds text mustn't depend on the
+    # string dtype the reader picked (object, str, Arrow string or categorical)
+    return [
+        col for col in df.columns
+        if col != 'filename'  # leave filename untouched
+        and not pd.api.types.is_numeric_dtype(df[col])
+        and not pd.api.types.is_datetime64_any_dtype(df[col])
+    ]
+
 def lowercase_text(df):
-    str_cols = df.select_dtypes(include='object').columns
-    for col in str_cols:
-        if col == 'filename':
-            continue  # leave filename untouched
+    for col in text_columns(df):
         df[col] = df[col].astype(str).str.strip().str.lower()
     return df
 
 def parse_dates(df):
     for col in ['start_date', 'end_date']:
         if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
+            # format='mixed' parses each value on its own, so a date reads the same whichever rows it is cleaned with
+            df[col] = pd.to_datetime(df[col], format='mixed', errors='coerce')
             df[col] = df[col].dt.strftime('%Y-%m-%d').fillna(pd.NA)
     return df
 
@@ -55,11 +81,21 @@ def normalize_missing_values(df):
     )
     return df
 
+# Concept map per semantically standardized column
+SEMANTIC_MAPS = {
+    'purpose': PURPOSE_MAP,
+    'agent': AGENT_MAP,
+    'control_area': CONTROL_MAP,
+    'operator_affiliation': OPERATOR_MAP,
+}
+
+slug = functools.lru_cache(maxsize=None)(_slug)  # the same few hundred terms recur across columns and rows
+
 def _apply_mapping(cell, mapping):
     if pd.isna(cell):
         return pd.NA
     parts = re.split(r'[;,]|\\band\\b|\\b&\\b|\\bplus\\b', str(cell).lower())
-    mapped = [mapping.get(_slug(p), _slug(p)) for p in parts if p.strip()]
+    mapped = [mapping.get(slug(p), slug(p)) for p in parts if p.strip()]
     # parts = re.split(r'[;,]', str(cell).lower())
     # mapped = [mapping.get(p.strip(), p.strip()) for p in parts if p.strip()]
     # dedupe while preserving order
@@ -67,16 +103,23 @@ def _apply_mapping(cell, mapping):
     canonical_parts = [t for t in mapped if not (t in seen or seen.add(t))]
     return ', '.join(canonical_parts)
 
+@functools.lru_cache(maxsize=None)
+def canonical_term(cell, column):
+    return _apply_mapping(cell, SEMANTIC_MAPS[column])
+
+def canonicalize(values, column):
+    """Map a column through its concept map one distinct value at a time and broadcast the result back
+    as a categorical, so the cost follows the number of distinct values rather than rows."""
+    codes, uniques = pd.factorize(values)  # missing cells get code -1
+    mapped = pd.Index([canonical_term(value, column) for value in uniques], dtype=object)
+    categories = mapped.unique()
+    lookup = np.append(categories.get_indexer(mapped), -1)  # code -1 stays missing
+    return pd.Series(pd.Categorical.from_codes(lookup[codes], categories=categories), index=values.index, name=values.name)
+
 def standardize_semantic_terms(df):
-    col_to_map = {
-        'purpose': PURPOSE_MAP,
-        'agent': AGENT_MAP,
-        'control_area': CONTROL_MAP,
-        'operator_affiliation': OPERATOR_MAP,
-    }
-    for col, mp in col_to_map.items():
+    for col in SEMANTIC_MAPS:
         if col in df.columns:
-            df[col] = df[col].apply(_apply_mapping, args=(mp,))
+            df[col] = canonicalize(df[col], col)
     return df
 
 def validate_required_columns(df, required=None):
@@ -101,21 +144,94 @@ def validate_required_columns(df, required=None):
         raise ValueError(f"Missing required columns: {missing}")
     return df
 
-def clean_dataset(path, output_path):
-    df = load_dataset(path)
-    df = standardize_column_names(df)
-    df = validate_required_columns(df)
+def clean_rows(df):
     df = lowercase_text(df)
     df = standardize_semantic_terms(df)
     df = normalize_missing_values(df)
     df = parse_dates(df)
-    df = remove_duplicates(df)
-    df = sort_dataset(df)
+    return df
+
+def cleaning_fingerprint(columns):
+    payload = json.dumps([CLEANING_VERSION, list(columns), PURPOSE_MAP, AGENT_MAP, CONTROL_MAP, OPERATOR_MAP], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def row_hashes(path):
+    """Hash of each raw row's text, indexed like load_dataset(path). Read as strings so that one new row
+    can't change a column's inferred type (a blank year turns ints into floats) and with it every hash."""
+    if path.endswith('.parquet'):
+        raw = read_dataset(path).astype(str)  # stored types don't depend on the other rows
+    else:
+        raw = read_dataset(path, dtype=str, keep_default_na=False)
+    return pd.util.hash_pandas_object(raw, index=False).astype(str)
+
+def state_path(output_path):
+    return os.path.splitext(output_path)[0] + '.clean-state.json'
+
+def load_clean_state(path, fingerprint):
+    """filename -> raw row hash from the last run, or None when a full rebuild is needed."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        state = json.load(f)
+    if state.get('fingerprint') != fingerprint:
+        print("Cleaning rules or columns changed since the last run; rebuilding the whole dataset.")
+        return None
+    return state['rows']
+
+def save_clean_state(path, fingerprint, rows):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'fingerprint': fingerprint, 'rows': rows}, f)
+    os.replace(tmp_path, path)
+
+def as_written(df):
+    """df as it reads back from the cleaned CSV, so merged rows match the ones already on disk."""
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)), dtype=str, keep_default_na=False)
+
+def clean_dataset(path, output_path, parquet=False, full_rebuild=False):
+    df = load_dataset(path)
+    df = standardize_column_names(df)
+    df = validate_required_columns(df)
+    df = remove_duplicates(df)  # cleaning is row by row, so deduping first keeps the same rows
+
+    fingerprint = cleaning_fingerprint(df.columns)
+    keys = df['filename'].astype(str).tolist()
+    hashes = row_hashes(path).loc[df.index].tolist()
+    previous = None
+    if not full_rebuild and os.path.exists(output_path):
+        previous = load_clean_state(state_path(output_path), fingerprint)
+
+    if previous is None:
+        df = sort_dataset(clean_rows(df))
+    else:
+        existing = pd.read_csv(output_path, dtype=str, keep_default_na=False)
+        on_disk = set(existing['filename'])
+        stale = pd.Series([previous.get(k) != h or k not in on_disk for k, h in zip(keys, hashes)], index=df.index)
+        kept = existing[existing['filename'].isin(set(df.loc[~stale, 'filename'].astype(str)))]
+        parts = [kept]
+        if stale.any():
+            parts.append(as_written(clean_rows(df.loc[stale].copy())))
+        new = sum(1 for k in df.loc[stale, 'filename'].astype(str) if k not in previous)
+        removed = int((~existing['filename'].isin(set(keys))).sum())
+        print(f"Incremental clean: {new} new, {int(stale.sum()) - new} changed, {removed} removed, {len(kept)} unchanged rows.")
+        df = sort_dataset(pd.concat(parts, ignore_index=True))
 
     df.to_csv(output_path, index=False)
+    save_clean_state(state_path(output_path), fingerprint, dict(zip(keys, hashes)))
     print(f"Cleaned dataset saved to: {output_path}")
+    if parquet:
+        write_parquet(df, parquet_path(output_path))
+        print(f"Parquet copy saved to: {parquet_path(output_path)}")
 
 if __name__ == "__main__":
-    input_path = "../dataset/final/cloud_seeding_us_2000_2025.csv"
-    output_path = "../dataset/final/cleaned_cloud_seeding_us_2000_2025.csv"
-    clean_dataset(input_path, output_path)
+    parser = argparse.ArgumentParser(description="Clean and standardize the extracted dataset.")
+    parser.add_argument('--input', default="../dataset/final/cloud_seeding_us_2000_2025.csv",
+                        help="extracted dataset, .csv or .parquet (default: ../dataset/final/cloud_seeding_us_2000_2025.csv)")
+    parser.add_argument('--output', default="../dataset/final/cleaned_cloud_seeding_us_2000_2025.csv",
+                        help="cleaned CSV to write (default: ../dataset/final/cleaned_cloud_seeding_us_2000_2025.csv)")
+    parser.add_argument('--parquet', action='store_true',
+                        help="also write the cleaned dataset as Parquet with a typed schema, next to --output (needs pyarrow)")
+    parser.add_argument('--full-rebuild', action='store_true',
+                        help="clean every row again instead of only rows that are new or changed since the last run")
+    args = parser.parse_args()
+    clean_dataset(args.input, args.output, parquet=args.parquet, full_rebuild=args.full_rebuild)
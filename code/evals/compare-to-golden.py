@@ -1,8 +1,14 @@
+import numpy as np
 import pandas as pd
+import argparse
 import difflib
+import functools
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 
 result = '../../dataset/final/cleaned_cloud_seeding_us_2000_2025.csv'
+result_parquet = '../../dataset/final/cleaned_cloud_seeding_us_2000_2025.parquet'  # clean-dataset.py --parquet
 golden = '../../goldens-for-accuracy-evals/golden-datasets/july/golden-200.csv'
 key = 'filename'
 
@@ -23,6 +29,19 @@ def read_csv_with_fallback(path, **kwargs):
         print("→ Retrying read with encoding='latin-1'.\n")
         return pd.read_csv(path, encoding='latin-1', **kwargs)
 
+def read_dataset(path):
+    if not path.endswith('.parquet'):
+        return read_csv_with_fallback(path)
+    # typed columns (Int16 year, date32 dates) need no guessing; missing cells read as 'nan' below, as from a CSV
+    df = pd.read_parquet(path)
+    return df.astype(object).where(df.notna(), float('nan'))
+
+def latest_result(csv_path, parquet_path):
+    """The Parquet copy of the result when it's at least as new as the CSV, else the CSV."""
+    if os.path.exists(parquet_path) and (not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        return parquet_path
+    return csv_path
+
 purpose_concepts = [
     # snow
     ['augment snowpack',
@@ -146,6 +165,10 @@ def normalize_date_format(val):
     except:
         return str(val).strip().lower()
 
+# === MEMOIZED MATCHERS ===
+# Goldens and results repeat the same few hundred values, so fuzzy and concept matches are cached per
+# distinct argument and the field rules below run once per distinct (output, gold) pair.
+
 def normalize_tokens(text):
     return set(re.findall(r'\b[a-z0-9]+\b', text.lower()))
 
@@ -155,23 +178,132 @@ def token_overlap(out_val, gold_val, min_overlap_ratio=0.5):
     intersection = out_tokens & gold_tokens
     return len(intersection) >= min_overlap_ratio * len(gold_tokens)
 
+_normalized_groups = {}
+
+def normalized_groups(concept_groups):
+    """Concept groups lowercased and stripped once, instead of on every comparison."""
+    key = id(concept_groups)
+    if key not in _normalized_groups:
+        _normalized_groups[key] = tuple(tuple(g.strip().lower() for g in group) for group in concept_groups)
+    return _normalized_groups[key]
+
+@functools.lru_cache(maxsize=None)
+def concept_hits(text, groups):
+    """Indexes of the (normalized) concept groups that text fuzzy-matches."""
+    return frozenset(i for i, group in enumerate(groups) if fuzzy_match(text, group))
+
 def concept_match(text1, text2, concept_groups):
-    text1 = text1.strip().lower()
-    text2 = text2.strip().lower()
-    for group in concept_groups:
-        normalized_group = [g.strip().lower() for g in group]
-        if fuzzy_match(text1, normalized_group) and fuzzy_match(text2, normalized_group):
-            return True
-    return False
+    groups = normalized_groups(concept_groups)
+    return bool(concept_hits(text1.strip().lower(), groups) & concept_hits(text2.strip().lower(), groups))
 
-def fuzzy_match(val, choices, threshold=0.75):
+@functools.lru_cache(maxsize=None)
+def _close_match(val, choices, threshold):
     val = val.strip().lower()
     choices = [c.strip().lower() for c in choices]
-    return difflib.get_close_matches(val, choices, n=1, cutoff=threshold)
+    return bool(difflib.get_close_matches(val, choices, n=1, cutoff=threshold))
+
+def fuzzy_match(val, choices, threshold=0.75):
+    return _close_match(val, tuple(choices), threshold)
+
+def split_set(text):
+    return frozenset(s.strip() for s in text.split(',') if s.strip())
 
-def compute_field_accuracy(output_csv, golden_csv, key='filename', verbose=False):
-    df_out  = read_csv_with_fallback(output_csv)
-    df_gold = read_csv_with_fallback(golden_csv)
+def as_int(text):
+    try:
+        return int(text)
+    except ValueError:
+        return None
+
+def any_in_or_close(out_set, gold_set):
+    choices = sorted(gold_set)
+    return any(o in gold_set or fuzzy_match(o, choices) for o in out_set)
+
+def purpose_match(out_val, gold_val):
+    # each gold concept must be matched by an output concept
+    out_set, gold_set = split_set(out_val), split_set(gold_val)
+    return all(any(concept_match(o, g, purpose_concepts) or fuzzy_match(o, [g]) for o in out_set) for g in gold_set)
+
+def apparatus_match(out_val, gold_val):
+    out_set, gold_set = split_set(out_val), split_set(gold_val)
+    return out_set == gold_set or any_in_or_close(out_set, gold_set)
+
+def operator_match(out_val, gold_val):
+    return fuzzy_match(out_val, gold_val) or concept_match(out_val, gold_val, operator_concepts)
+
+def agent_match(out_val, gold_val):
+    out_set, gold_set = split_set(out_val), split_set(gold_val)
+    return concept_match(out_val, gold_val, agent_concepts) or out_set == gold_set or any_in_or_close(out_set, gold_set)
+
+def area_match(out_val, gold_val):
+    return token_overlap(out_val, gold_val, min_overlap_ratio=0.5)
+
+def control_area_match(out_val, gold_val):
+    return area_match(out_val, gold_val) or concept_match(out_val, gold_val, control_area_concepts)
+
+def sets_intersect(out_val, gold_val):
+    return bool(split_set(out_val) & split_set(gold_val))
+
+# field -> rule applied to each distinct (output, gold) pair that isn't an exact match
+PAIR_RULES = {
+    'season': sets_intersect,
+    'state': sets_intersect,
+    'purpose': purpose_match,
+    'apparatus': apparatus_match,
+    'operator_affiliation': operator_match,
+    'agent': agent_match,
+    'target_area': area_match,
+    'control_area': control_area_match,
+}
+
+# === VECTORIZED COMPARATOR ===
+
+def text_values(series):
+    """Cells as the comparisons see them: str(cell).strip().lower(), so a missing cell reads 'nan'."""
+    return series.astype(object).map(str).str.strip().str.lower()
+
+def per_unique(values, fn):
+    """fn applied once per distinct value, broadcast back to every row."""
+    codes, uniques = pd.factorize(values)
+    return np.array([fn(u) for u in uniques] + [None], dtype=object)[codes]
+
+def per_pair(out, gold, fn):
+    """fn applied once per distinct (output, gold) pair, broadcast back to every row."""
+    codes, uniques = pd.MultiIndex.from_arrays([out, gold]).factorize()
+    return np.array([bool(fn(o, g)) for o, g in uniques] + [False], dtype=bool)[codes]
+
+def parse_date(text):
+    return pd.to_datetime(text, errors='coerce')
+
+def field_matches(field, out, gold):
+    """Boolean array over the aligned rows: is the output value correct for the golden one?"""
+    out, gold = out.reset_index(drop=True), gold.reset_index(drop=True)
+    both_empty = ((out == '') & (gold == '')).to_numpy()  # an empty cell is correct if the golden one is empty too
+    exact = (out == gold).to_numpy()
+
+    if field == 'year':  # allow +/- a year to handle winter cases
+        diff = pd.array(per_unique(out, as_int), dtype='Int64') - pd.array(per_unique(gold, as_int), dtype='Int64')
+        rule = (abs(diff) <= 1).fillna(False).to_numpy(dtype=bool)
+    elif field in ['start_date', 'end_date']:
+        out_dates = pd.Series(per_unique(out, parse_date), dtype='datetime64[ns]')
+        gold_dates = pd.Series(per_unique(gold, parse_date), dtype='datetime64[ns]')
+        rule = ((out_dates - gold_dates).dt.days.abs() <= 30).to_numpy()
+    elif field == 'project':
+        rule = np.ones(len(out), dtype=bool)  # manual inspection
+    elif field in PAIR_RULES:
+        rule = exact.copy()
+        rest = ~exact
+        rule[rest] = per_pair(out[rest], gold[rest], PAIR_RULES[field])
+    else:
+        rule = exact
+    return both_empty | rule
+
+def score_field(job):
+    field, out, gold = job
+    return field, field_matches(field, pd.Series(out, dtype=object), pd.Series(gold, dtype=object))
+
+def compute_field_accuracy(output_csv, golden_csv, key='filename', verbose=False, workers=None, executor=None):
+    df_out  = read_dataset(output_csv)
+    df_gold = read_dataset(golden_csv)
 
     df_out[key] = df_out[key].astype(str)
     df_gold[key] = df_gold[key].astype(str)
@@ -179,152 +311,30 @@ def compute_field_accuracy(output_csv, golden_csv, key='filename', verbose=False
     df_out = df_out.set_index(key)
     df_gold = df_gold.set_index(key)
 
-    fields = df_gold.columns
-    accuracies = {}
-
-    for field in fields:
-        total = 0
-        correct = 0
-
-        for count, idx in enumerate(df_gold.index):
-            if idx not in df_out.index:
-                # print(f"MISSING: {idx}")
-                continue
+    # align once: golden rows that have an output row, in golden order
+    df_out = df_out[~df_out.index.duplicated()]
+    df_gold = df_gold[df_gold.index.isin(df_out.index)]
+    df_out = df_out.reindex(index=df_gold.index, columns=df_gold.columns)
 
-            out_val = str(df_out.at[idx, field]).strip().lower()
-            gold_val = str(df_gold.at[idx, field]).strip().lower()
-
-            total += 1
-            match = False
-            
-            if not gold_val and not out_val: # empty cell is correct if that is what is in the golden dataset
-                match = True
+    fields = df_gold.columns
+    jobs = [(field, text_values(df_out[field]).tolist(), text_values(df_gold[field]).tolist()) for field in fields]
+    workers = min(len(jobs), os.cpu_count() or 1) if workers is None else workers
+    if executor is not None:
+        results = dict(executor.map(score_field, jobs))
+    elif workers > 1 and len(df_gold) > 0:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = dict(pool.map(score_field, jobs))
+    else:
+        results = dict(map(score_field, jobs))
 
-            # --- STRUCTURED FIELDS --- #
-            elif field == 'year':
-                try:
-                    if abs(int(out_val) - int(gold_val)) <= 1: # allow +/- a year to handle winter cases
-                        match = True
-                except:
-                    pass
-
-            elif field in ['season','state']:
-                if out_val == gold_val:
-                    match = True
-                out_set = set(s.strip() for s in out_val.split(',') if s.strip())
-                gold_set = set(s.strip() for s in gold_val.split(',') if s.strip())
-                if out_set & gold_set:
-                    match = True
-            
-            # elif field in ['start_date', 'end_date']:
-            #     if normalize_date_format(out_val) == normalize_date_format(gold_val):
-            #         match = True
-
-            elif field in ['start_date', 'end_date']:
-                out_date = pd.to_datetime(out_val, errors='coerce')
-                gold_date = pd.to_datetime(gold_val, errors='coerce')
-                if pd.notna(out_date) and pd.notna(gold_date):
-                    if abs((out_date - gold_date).days) <= 30:
-                        match = True
-
-            # --- SEMI STRUCTURED FIELDS --- #
-            # elif field == 'purpose':
-            #     if concept_match(out_val, gold_val, purpose_concepts):
-            #         match = True
-            #     out_set  = set(s.strip() for s in out_val.split(',')  if s.strip())
-            #     gold_set = set(s.strip() for s in gold_val.split(',') if s.strip())
-            #     if out_set == gold_set:
-            #         match = True
-            #     else:
-            #         for o in out_set:
-            #             if o in gold_set or fuzzy_match(o, list(gold_set)):
-            #                 match = True
-            #                 break
-            elif field == 'purpose':
-                out_set = set(s.strip() for s in out_val.split(',') if s.strip())
-                gold_set = set(s.strip() for s in gold_val.split(',') if s.strip())
-
-                # Ensure each gold concept is matched by an output concept
-                all_matched = True
-                for g in gold_set:
-                    found = False
-                    for o in out_set:
-                        if concept_match(o, g, purpose_concepts) or fuzzy_match(o, [g]):
-                            found = True
-                            break
-                    if not found:
-                        # if verbose:
-                            # print(f"  No concept match for '{g}' in output: {out_set}")
-                        all_matched = False
-                        break
-
-                if all_matched:
-                    match = True
-
-            elif field == 'apparatus':
-                out_set  = set(s.strip() for s in out_val.split(',')  if s.strip())
-                gold_set = set(s.strip() for s in gold_val.split(',') if s.strip())
-                if out_set == gold_set:
-                    match = True
-                else:
-                    for o in out_set:
-                        if o in gold_set or fuzzy_match(o, list(gold_set)):
-                            match = True
-                            break
-            
-            elif field == 'operator_affiliation':
-                if out_val == gold_val:
-                    match = True
-                elif fuzzy_match(out_val, gold_val):
-                    match = True
-                    break
-                elif concept_match(out_val, gold_val, operator_concepts):
-                    match = True
-
-            elif field == 'agent':
-                if concept_match(out_val, gold_val, agent_concepts):
-                    match = True
-                out_set  = set(s.strip() for s in out_val.split(',')  if s.strip())
-                gold_set = set(s.strip() for s in gold_val.split(',') if s.strip())
-                if out_set == gold_set:
-                    match = True
-                else:
-                    for o in out_set:
-                        if o in gold_set or fuzzy_match(o, list(gold_set)):
-                            match = True
-                            break
-
-            # --- LEAST STRUCTURED FIELDS --- #
-            elif field in ['project']:
-                match = True # manual inspection
-                # if out_val == gold_val:
-                #     match = True
-                # elif fuzzy_match(out_val, gold_val):
-                #     match = True
-                #     break
-
-            elif field == 'target_area':
-                if out_val == gold_val:
-                    match = True
-                elif token_overlap(out_val, gold_val, min_overlap_ratio=0.5):
-                    match = True
-
-            elif field == 'control_area':
-                if out_val == gold_val:
-                    match = True
-                elif token_overlap(out_val, gold_val, min_overlap_ratio=0.5):
-                    match = True
-                elif concept_match(out_val, gold_val, control_area_concepts):
-                    match = True
-
-            else:
-                if out_val == gold_val:
-                    match = True
-
-            if match:
-                correct += 1
-            elif verbose:
-                print(f"Mismatch in field '{field}' at '{idx}': output='{out_val}' vs gold='{gold_val}'")
+    accuracies = {}
+    for field, out_values, gold_values in jobs:
+        matches = results[field]
+        total = len(matches)
+        correct = int(matches.sum())
+        if verbose:
+            for i in np.flatnonzero(~matches):
+                print(f"Mismatch in field '{field}' at '{df_gold.index[i]}': output='{out_values[i]}' vs gold='{gold_values[i]}'")
 
         accuracy = correct / total if total else 0
         accuracies[field] = accuracy
@@ -340,4 +350,25 @@ def compute_field_accuracy(output_csv, golden_csv, key='filename', verbose=False
     return accuracies
 
 if __name__ == '__main__':
-    compute_field_accuracy(result, golden, key=key, verbose=True)
+    parser = argparse.ArgumentParser(description="Field-by-field accuracy of extracted datasets against a golden set.")
+    parser.add_argument('results', nargs='*',
+                        help="result files to score, .csv or .parquet (default: the cleaned dataset, its Parquet copy when that's newer)")
+    parser.add_argument('--golden', default=golden, help=f"golden dataset (default: {golden})")
+    parser.add_argument('--key', default=key, help=f"column joining results to the golden set (default: {key})")
+    parser.add_argument('--workers', type=int, default=None, help="processes scoring fields in parallel (default: one per field, up to the CPU count)")
+    parser.add_argument('--quiet', action='store_true', help="don't list every mismatch")
+    args = parser.parse_args()
+
+    results = args.results or [latest_result(result, result_parquet)]
+    workers = args.workers or min(os.cpu_count() or 1, 16)
+    with ProcessPoolExecutor(max_workers=workers) as pool:  # shared by every result file, so matcher caches stay warm
+        overall = {}
+        for path in results:
+            if len(results) > 1:
+                print(f"\n=== {path} ===")
+            accuracies = compute_field_accuracy(path, args.golden, key=args.key, verbose=not args.quiet, executor=pool)
+            overall[path] = sum(accuracies.values()) / len(accuracies)
+    if len(results) > 1:
+        print("\nOverall accuracy by result file:")
+        for path, accuracy in sorted(overall.items(), key=lambda item: -item[1]):
+            print(f"  {accuracy:7.2%}  {path}")
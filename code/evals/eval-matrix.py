@@ -0,0 +1,234 @@
+# === PROMPT x MODEL EVALUATION MATRIX ===
+# Scores every prompt in prompts/ against every model on the golden set without re-extracting any PDF:
+#   1. the golden files' text comes from the extractor's text cache (fill it once with
+#      `python llm-extractor.py --warm-text-cache --input-dir <golden PDFs>`) and is formatted (and, with
+#      --compaction, compacted) exactly as the extractor does before its LLM call;
+#   2. every (prompt, model, file) request is fanned out over a thread pool behind the extractor's rate
+#      limiter, retry policy and circuit breaker. Responses go through the shared response cache, so a
+#      rerun, or a pair production already ran, costs nothing;
+#   3. as soon as all of a pair's requests are back, its rows are written as a raw CSV, cleaned with
+#      clean-dataset.py and scored with compare-to-golden.py while the other pairs are still in flight;
+#   4. one matrix CSV holds per-field and overall accuracy, tokens, latency percentiles and cost per pair.
+# Latency is the API call itself (rate-limit waits excluded); it is kept with the cached usage, so reruns
+# still report it.
+#
+# Run from code/evals/:
+#   python eval-matrix.py --pdf-dir ../../accuracy-evals/golden-200 --models o4-mini o3 --concurrency 32
+import argparse
+import csv
+import glob
+import importlib.util
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from dotenv import load_dotenv
+from openai import OpenAI
+
+sys.path.insert(0, '..')
+from extractor.cascade import MODEL_PRICES
+from extractor.rate_limit import CircuitBreaker, RateLimiter, RetryableError, RetryPolicy, estimate_tokens
+from extractor.response_cache import ResponseCache
+from extractor.text_cache import TextCache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def load_script(name, path):
+    """Import one of the hyphen-named scripts (llm-extractor.py, clean-dataset.py, ...) as a module."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+extractor = load_script('llm_extractor', '../llm-extractor.py')
+cleaner = load_script('clean_dataset', '../clean-dataset.py')
+comparator = load_script('compare_to_golden', 'compare-to-golden.py')
+
+# the model variants tried in llm-extractor.py's main()
+MODELS = ['gpt-4o-mini', 'gpt-4.1-mini', 'gpt-4.1', 'o4-mini', 'o3']
+
+def golden_texts(golden_path, pdf_dir, text_cache, key='filename'):
+    """{filename: LLM input} for every golden file whose text is in the cache, formatted as the extractor sends it."""
+    golden = comparator.read_dataset(golden_path)
+    texts, missing = {}, []
+    for file in golden[key].astype(str):
+        path = os.path.join(pdf_dir, file)
+        entry = text_cache.get(text_cache.key_for(path)) if os.path.exists(path) else None
+        if not entry or not entry.get('pdf_text'):
+            missing.append(file)
+            continue
+        texts[file] = extractor.format_llm_input(file, entry['pdf_text'])
+    if missing:
+        print(f"{len(missing)} golden files have no cached text and are left out: {', '.join(missing[:5])}{', ...' if len(missing) > 5 else ''}")
+        print(f"  fill the cache with: python llm-extractor.py --warm-text-cache --input-dir {pdf_dir}")
+    return texts
+
+def ask(client, response_cache, model, prompt, llm_input, label):
+    """One extraction request through the response cache. Returns (response text, usage, cached)."""
+    key = response_cache.key_for(model, prompt, llm_input) if response_cache else None
+    cached = response_cache.get(key) if response_cache else None
+    if cached:
+        return cached['response_text'], cached['usage'], True
+
+    timing = {}
+    def request():
+        started = time.time()
+        raw = client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": llm_input}
+            ]
+        )
+        timing['seconds'] = time.time() - started
+        extractor.openai_provider.limiter.update_from_headers(raw.headers)
+        response = raw.parse()
+        if not response.choices[0].message.content:
+            raise RetryableError("empty completion")
+        return response
+
+    response = extractor.openai_provider.call(request, tokens=estimate_tokens(prompt, llm_input) + extractor.EXPECTED_COMPLETION_TOKENS, label=label)
+    usage = dict(extractor.usage_dict(response) or {}, latency_seconds=round(timing['seconds'], 3))
+    response_text = response.choices[0].message.content
+    if response_cache:
+        response_cache.put(key, model, prompt, llm_input, response_text, usage)
+    return response_text, usage, False
+
+def write_rows(path, rows):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=extractor.FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(sorted(rows, key=lambda row: row['filename']))
+
+def score_pair(prompt_name, model, results, files, golden_path, out_dir):
+    """Clean and score one pair's answers; returns its matrix row."""
+    name = f"{prompt_name}__{model}"
+    raw_path = os.path.join(out_dir, 'raw', f"{name}.csv")
+    cleaned_path = os.path.join(out_dir, 'cleaned', f"{name}.csv")
+    answered = [r for r in results if r['row']]
+    write_rows(raw_path, [r['row'] for r in answered])
+    os.makedirs(os.path.dirname(cleaned_path), exist_ok=True)
+
+    print(f"\n=== {prompt_name} x {model} ===")
+    accuracies = {}
+    if answered:
+        cleaner.clean_dataset(raw_path, cleaned_path, full_rebuild=True)
+        accuracies = comparator.compute_field_accuracy(cleaned_path, golden_path, workers=1)
+
+    usages = [r['usage'] or {} for r in answered]
+    prompt_tokens = sum(u.get('prompt_tokens') or 0 for u in usages)
+    completion_tokens = sum(u.get('completion_tokens') or 0 for u in usages)
+    input_price, output_price = MODEL_PRICES.get(model, (0, 0))
+    latencies = [u['latency_seconds'] for u in usages if u.get('latency_seconds') is not None]
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) if latencies else (None, None, None)
+    row = {
+        'prompt': prompt_name,
+        'model': model,
+        'files': files,
+        'answered': len(answered),
+        'failed': files - len(answered),
+        'cached': sum(1 for r in answered if r['cached']),
+        'overall_accuracy': round(sum(accuracies.values()) / len(accuracies), 4) if accuracies else None,
+    }
+    row.update({f"{field}_accuracy": round(accuracy, 4) for field, accuracy in accuracies.items()})
+    row.update({
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'latency_p50': round(p50, 2) if latencies else None,
+        'latency_p90': round(p90, 2) if latencies else None,
+        'latency_p99': round(p99, 2) if latencies else None,
+        'cost_usd': round((prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000, 4),
+    })
+    return row
+
+def write_matrix(path, rows):
+    columns = []
+    for row in rows:
+        columns += [c for c in row if c not in columns]
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+def run_matrix(args):
+    load_dotenv()
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    provider = extractor.openai_provider
+    provider.limiter = RateLimiter(requests_per_minute=args.openai_rpm, tokens_per_minute=args.openai_tpm)
+    provider.breaker = CircuitBreaker(provider.name, failure_threshold=args.breaker_threshold, cooldown=args.breaker_cooldown)
+    provider.policy = RetryPolicy(max_attempts=args.max_attempts)
+    extractor.compactor.enabled = args.compaction
+    extractor.configure_region_ocr(args)  # looks up the texts the cache was warmed with under the same setting
+    extractor.compactor.token_budget = args.token_budget
+    response_cache = None if args.no_response_cache else ResponseCache(args.response_cache)
+
+    prompts = {os.path.splitext(os.path.basename(p))[0]: open(p, encoding='utf-8').read() for p in sorted(glob.glob(args.prompts))}
+    if not prompts:
+        sys.exit(f"No prompts match {args.prompts}")
+    texts = golden_texts(args.golden, args.pdf_dir, TextCache(args.text_cache_dir, extractor.EXTRACTOR_SETTINGS))
+    if not texts:
+        sys.exit("No golden file has cached text; nothing to evaluate")
+    pairs = [(prompt_name, model) for prompt_name in prompts for model in args.models]
+    print(f"\nEvaluating {len(prompts)} prompts x {len(args.models)} models on {len(texts)} golden files ({len(pairs) * len(texts)} requests)")
+
+    started = time.time()
+    results = defaultdict(list)
+    matrix = []
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = {
+            pool.submit(ask, client, response_cache, model, prompts[prompt_name], llm_input, f"{prompt_name} x {model}: {file}"): (prompt_name, model, file)
+            for prompt_name, model in pairs for file, llm_input in texts.items()
+        }
+        for future in as_completed(futures):
+            prompt_name, model, file = futures[future]
+            try:
+                response_text, usage, cached = future.result()
+                result = {'row': {'filename': file, **extractor.parse_gpt_response(response_text)}, 'usage': usage, 'cached': cached}
+            except Exception as e:
+                print(f"{prompt_name} x {model}: {file} failed: {e}")
+                result = {'row': None, 'usage': None, 'cached': False}
+            results[(prompt_name, model)].append(result)
+            if len(results[(prompt_name, model)]) == len(texts):  # pair complete: clean and score it while the rest run
+                matrix.append(score_pair(prompt_name, model, results.pop((prompt_name, model)), len(texts), args.golden, args.out_dir))
+
+    matrix.sort(key=lambda row: pairs.index((row['prompt'], row['model'])))
+    write_matrix(args.matrix, matrix)
+    print(f"\nEvaluation matrix ({len(matrix)} pairs, {time.time() - started:.0f}s) saved to {args.matrix}")
+    for row in sorted(matrix, key=lambda row: -(row['overall_accuracy'] or 0)):
+        accuracy = f"{row['overall_accuracy']:.2%}" if row['overall_accuracy'] is not None else 'n/a'
+        latency = f"p50 {row['latency_p50']}s p90 {row['latency_p90']}s" if row['latency_p50'] is not None else 'no latency recorded'
+        print(f"  {accuracy:>7}  {row['prompt']:32s} {row['model']:14s} ${row['cost_usd']:.3f}  {latency}  ({row['answered']}/{row['files']} answered, {row['cached']} cached)")
+    if response_cache:
+        print(response_cache.summary())
+    print(provider.summary())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score every prompt x model pair on the golden set from cached golden texts.")
+    parser.add_argument('--prompts', default='../../prompts/*.txt', help="glob of prompt files (default: ../../prompts/*.txt)")
+    parser.add_argument('--models', nargs='+', default=MODELS, help=f"models to evaluate (default: {' '.join(MODELS)})")
+    parser.add_argument('--golden', default=comparator.golden, help=f"golden dataset (default: {comparator.golden})")
+    parser.add_argument('--pdf-dir', default='../../noaa-files', help="directory holding the golden PDFs, for the text cache lookup (default: ../../noaa-files)")
+    parser.add_argument('--text-cache-dir', default='../../dataset/cache/text', help="extractor text cache (default: ../../dataset/cache/text)")
+    parser.add_argument('--response-cache', default='../../dataset/cache/llm-responses.sqlite', help="OpenAI response cache shared with the extractor (default: ../../dataset/cache/llm-responses.sqlite)")
+    parser.add_argument('--no-response-cache', action='store_true', help="call OpenAI for every request")
+    parser.add_argument('--out-dir', default='../../dataset/evals/matrix', help="raw and cleaned CSV per pair (default: ../../dataset/evals/matrix)")
+    parser.add_argument('--matrix', default='../../dataset/evals/eval-matrix.csv', help="matrix CSV to write (default: ../../dataset/evals/eval-matrix.csv)")
+    parser.add_argument('--concurrency', type=int, default=16, help="requests in flight at once (default: 16)")
+    parser.add_argument('--compaction', action='store_true',
+                        help="compact the golden text as the extractor does with --compaction; compare with a run without it (default: send the cached text as is)")
+    parser.add_argument('--token-budget', type=int, default=1000, help="maximum tokens of golden text per request with --compaction (default: 1000)")
+    parser.add_argument('--region-ocr', action='store_true',
+                        help="use the texts the cache was warmed with under the extractor's --region-ocr; compare with a run without it")
+    parser.add_argument('--max-attempts', type=int, default=6, help="attempts per request for retryable errors (default: 6)")
+    parser.add_argument('--openai-rpm', type=int, default=None, help="OpenAI requests per minute to start from")
+    parser.add_argument('--openai-tpm', type=int, default=None, help="OpenAI tokens per minute to start from")
+    parser.add_argument('--breaker-threshold', type=int, default=5, help="consecutive transient failures before the circuit opens (default: 5)")
+    parser.add_argument('--breaker-cooldown', type=float, default=60, help="seconds an open circuit waits (default: 60)")
+    run_matrix(parser.parse_args())
@@ -0,0 +1,101 @@
+# === OPENAI BATCH API HELPERS ===
+# Bulk corpus runs can go through the Batch API instead of one chat.completions.create call per file:
+# half the price and a separate, much larger rate limit, at the cost of waiting (up to 24h) for results.
+#
+# Every submitted batch is recorded in <batch_dir>/batch-state.json *before* polling starts, together
+# with the request file it was built from. A run that dies between submission and retrieval picks the
+# pending batches up from the state file on restart instead of paying for them again.
+import json
+import os
+import time
+import uuid
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+FINISHED_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+def build_batch_request(custom_id, model, system_prompt, user_content):
+    return {
+        'custom_id': custom_id,
+        'method': 'POST',
+        'url': BATCH_ENDPOINT,
+        'body': {
+            'model': model,
+            'messages': [
+                {'role': 'system', 'content': system_prompt},
+                {'role': 'user', 'content': user_content},
+            ],
+        },
+    }
+
+def load_batch_state(state_file):
+    if os.path.exists(state_file):
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'batches': []}
+
+def save_batch_state(state_file, state):
+    os.makedirs(os.path.dirname(state_file) or '.', exist_ok=True)
+    tmp_path = f"{state_file}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_file)
+
+def submit_batch(client, requests, batch_dir, model):
+    """Write requests as JSONL, upload it and create the batch. Returns the state entry for the batch."""
+    os.makedirs(batch_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    requests_file = os.path.join(batch_dir, f"requests-{stamp}-{uuid.uuid4().hex[:8]}.jsonl")
+    with open(requests_file, 'w', encoding='utf-8') as f:
+        for request in requests:
+            f.write(json.dumps(request) + '\n')
+
+    with open(requests_file, 'rb') as f:
+        uploaded = client.files.create(file=(os.path.basename(requests_file), f.read()), purpose='batch')
+    batch = client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window='24h'
+    )
+    print(f"Submitted batch {batch.id} with {len(requests)} requests ({requests_file})")
+    return {
+        'batch_id': batch.id,
+        'input_file_id': uploaded.id,
+        'requests_file': requests_file,
+        'custom_ids': [r['custom_id'] for r in requests],
+        'model': model,
+        'submitted': stamp,
+        'status': 'submitted',
+    }
+
+def wait_for_batch(client, batch_id, poll_interval=60):
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        progress = f" ({counts.completed}/{counts.total} done, {counts.failed} failed)" if counts else ''
+        print(f"Batch {batch_id}: {batch.status}{progress}")
+        if batch.status in FINISHED_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+def load_batch_requests(requests_file):
+    with open(requests_file, 'r', encoding='utf-8') as f:
+        return {r['custom_id']: r for r in map(json.loads, f)}
+
+def iter_batch_results(client, batch):
+    """Yield (custom_id, response_text, usage, error) for every line of the batch output and error files."""
+    if batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get('response') or {}
+            body = response.get('body') or {}
+            if response.get('status_code') == 200 and body.get('choices'):
+                yield record['custom_id'], body['choices'][0]['message']['content'], body.get('usage'), None
+            else:
+                yield record['custom_id'], None, None, record.get('error') or body.get('error') or f"HTTP {response.get('status_code')}"
+    if batch.error_file_id:
+        for line in client.files.content(batch.error_file_id).text.splitlines():
+            if line.strip():
+                record = json.loads(line)
+                yield record['custom_id'], None, None, record.get('error') or record.get('response')
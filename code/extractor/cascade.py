@@ -0,0 +1,136 @@
+# === MODEL CASCADE ===
+# Every document goes to a cheaper / faster model first; its parsed fields are checked by the validators
+# below (year range, state names, mm/dd/yyyy dates, apparatus vocabulary, required fields not blank) and
+# only documents that fail are sent again to the expensive model. UsageTracker records tokens and wall
+# time per model so the run summary can say what the mix cost compared to sending everything to the
+# expensive model.
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+
+# USD per 1M tokens (input, output), list prices; reasoning tokens are billed as output
+MODEL_PRICES = {
+    'o3': (2.00, 8.00),
+    'o4-mini': (1.10, 4.40),
+    'gpt-4.1': (2.00, 8.00),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4o-mini': (0.15, 0.60),
+}
+
+US_STATES = {
+    'alabama', 'alaska', 'arizona', 'arkansas', 'california', 'colorado', 'connecticut', 'delaware',
+    'florida', 'georgia', 'hawaii', 'idaho', 'illinois', 'indiana', 'iowa', 'kansas', 'kentucky',
+    'louisiana', 'maine', 'maryland', 'massachusetts', 'michigan', 'minnesota', 'mississippi',
+    'missouri', 'montana', 'nebraska', 'nevada', 'new hampshire', 'new jersey', 'new mexico',
+    'new york', 'north carolina', 'north dakota', 'ohio', 'oklahoma', 'oregon', 'pennsylvania',
+    'rhode island', 'south carolina', 'south dakota', 'tennessee', 'texas', 'utah', 'vermont',
+    'virginia', 'washington', 'west virginia', 'wisconsin', 'wyoming',
+}
+APPARATUS = {'ground', 'airborne'}
+REQUIRED_FIELDS = ['project', 'year', 'season', 'state', 'operator_affiliation', 'agent', 'apparatus', 'purpose', 'target_area', 'start_date', 'end_date']
+MIN_YEAR = 1950
+
+def parse_date(value):
+    if not re.fullmatch(r'\d{2}/\d{2}/\d{4}', value or ''):
+        return None
+    try:
+        return datetime.strptime(value, '%m/%d/%Y')
+    except ValueError:
+        return None
+
+def validate_fields(fields):
+    """Returns a list of problems with a parse_gpt_response() row; empty when the row looks right."""
+    problems = [f"{field} is blank" for field in REQUIRED_FIELDS if not fields.get(field, '').strip()]
+    max_year = datetime.now().year + 1
+
+    year = fields.get('year', '').strip()
+    if year and not (year.isdigit() and MIN_YEAR <= int(year) <= max_year):
+        problems.append(f"year {year!r} out of range {MIN_YEAR}-{max_year}")
+    state = fields.get('state', '').strip()
+    if state and state not in US_STATES:
+        problems.append(f"state {state!r} is not a U.S. state name")
+    apparatus = {a.strip() for a in fields.get('apparatus', '').split(',') if a.strip()}
+    if apparatus - APPARATUS:
+        problems.append(f"apparatus {fields['apparatus']!r} not in {sorted(APPARATUS)}")
+
+    dates = {}
+    for field in ('start_date', 'end_date'):
+        value = fields.get(field, '').strip()
+        if value:
+            dates[field] = parse_date(value)
+            if not dates[field]:
+                problems.append(f"{field} {value!r} is not mm/dd/yyyy")
+    start, end = dates.get('start_date'), dates.get('end_date')
+    if start and end and start > end:
+        problems.append("start_date is after end_date")
+    if year.isdigit() and start and end and int(year) not in (start.year, end.year):
+        problems.append(f"year {year} matches neither start nor end date")
+    return problems
+
+class UsageTracker:
+    """Requests, tokens and wall time of live (uncached) LLM calls, per model."""
+
+    def __init__(self):
+        self.models = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, usage, seconds):
+        usage = usage or {}
+        with self._lock:
+            entry = self.models.setdefault(model, Counter())
+            entry['requests'] += 1
+            entry['prompt_tokens'] += usage.get('prompt_tokens') or 0
+            entry['completion_tokens'] += usage.get('completion_tokens') or 0
+            entry['seconds'] += seconds
+
+    def cost(self, model, priced_as=None):
+        entry = self.models.get(model)
+        input_price, output_price = MODEL_PRICES.get(priced_as or model, (0, 0))
+        if not entry:
+            return 0.0
+        return (entry['prompt_tokens'] * input_price + entry['completion_tokens'] * output_price) / 1_000_000
+
+class Cascade:
+    """Cascade settings (cheap_model None = off) and escalation counts; shared across threads."""
+
+    def __init__(self, cheap_model=None, expensive_model='o3'):
+        self.cheap_model = cheap_model
+        self.expensive_model = expensive_model
+        self.documents = 0
+        self.escalated = 0
+        self.reasons = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, problems):
+        with self._lock:
+            self.documents += 1
+            if problems:
+                self.escalated += 1
+                self.reasons.update(problem.split(' ')[0] for problem in problems)
+
+    def summary(self, usage):
+        cheap = usage.models.get(self.cheap_model, Counter())
+        expensive = usage.models.get(self.expensive_model, Counter())
+        actual_cost = usage.cost(self.cheap_model) + usage.cost(self.expensive_model)
+        actual_seconds = cheap['seconds'] + expensive['seconds']
+        if expensive['requests']:
+            # what every document would have cost on the expensive model, from the escalated documents' average
+            all_expensive_cost = usage.cost(self.expensive_model) / expensive['requests'] * self.documents
+            all_expensive_seconds = expensive['seconds'] / expensive['requests'] * self.documents
+        else:
+            all_expensive_cost = usage.cost(self.cheap_model, priced_as=self.expensive_model)
+            all_expensive_seconds = None
+        lines = [
+            f"Cascade: {self.documents} documents to {self.cheap_model}, {self.escalated} escalated to {self.expensive_model}"
+            + (f" ({self.escalated / self.documents:.0%})" if self.documents else ''),
+            f"  - cost ${actual_cost:.3f} vs ~${all_expensive_cost:.3f} all-{self.expensive_model}"
+            + (f" ({'saved' if all_expensive_cost >= actual_cost else 'spent an extra'} ~${abs(all_expensive_cost - actual_cost):.3f})" if all_expensive_cost else ''),
+        ]
+        if all_expensive_seconds is not None:
+            lines.append(f"  - LLM time {actual_seconds:.0f}s vs ~{all_expensive_seconds:.0f}s all-{self.expensive_model}")
+        else:
+            lines.append(f"  - LLM time {actual_seconds:.0f}s (nothing escalated, no {self.expensive_model} timing to compare)")
+        if self.reasons:
+            lines.append("  - escalation reasons: " + ', '.join(f"{reason} {count}" for reason, count in self.reasons.most_common()))
+        return '\n'.join(lines)
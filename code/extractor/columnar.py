@@ -0,0 +1,85 @@
+# === COLUMNAR (PARQUET) DATASET FILES ===
+# The extracted and cleaned datasets can also be written as Parquet next to their CSV. The Parquet copy
+# carries a fixed schema, so readers get typed columns instead of pandas re-guessing types from text on
+# every load: season, state and apparatus are dictionary-encoded (pandas categoricals), year is an int16
+# and start/end dates are date32. Values that don't fit a typed column (year 'unknown', an unparseable
+# date) are stored as nulls; the CSV keeps them as written. Placeholder strings ('', 'nan', 'none', ...)
+# are nulls in every column. Reads pick the format from the file extension.
+# pyarrow is only needed for Parquet; CSV-only runs work without it.
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CATEGORICAL_COLUMNS = ('season', 'state', 'apparatus')
+INTEGER_COLUMNS = ('year',)
+DATE_COLUMNS = ('start_date', 'end_date')
+UNTOUCHED_COLUMNS = ('filename',)
+MISSING_STRINGS = ['', 'nan', 'none', 'n/a', 'na', 'null', '<na>', 'nat']
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+
+def parquet_path(path):
+    """The Parquet file written next to a CSV: data.csv -> data.parquet."""
+    return os.path.splitext(path)[0] + '.parquet'
+
+def column_type(column):
+    if column in CATEGORICAL_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    if column in INTEGER_COLUMNS:
+        return pa.int16()
+    if column in DATE_COLUMNS:
+        return pa.date32()
+    return pa.string()
+
+def dataset_schema(columns):
+    require_pyarrow()
+    return pa.schema([(column, column_type(column)) for column in columns])
+
+def to_typed_frame(df):
+    """A copy of df with the dataset schema's pandas types: categoricals, nullable Int16 and datetimes."""
+    typed = pd.DataFrame(index=df.index)
+    for column in df.columns:
+        values = df[column].astype('string').str.strip()
+        if column in UNTOUCHED_COLUMNS:
+            typed[column] = values
+            continue
+        values = values.mask(values.str.lower().isin(MISSING_STRINGS))
+        if column in INTEGER_COLUMNS:
+            numbers = pd.to_numeric(values, errors='coerce')
+            typed[column] = numbers.where(numbers % 1 == 0).astype('Int16')
+        elif column in DATE_COLUMNS:
+            typed[column] = pd.to_datetime(values, errors='coerce', format='mixed')
+        elif column in CATEGORICAL_COLUMNS:
+            typed[column] = values.astype('category')
+        else:
+            typed[column] = values
+    return typed
+
+def write_parquet(df, path):
+    """Write df to path as Parquet with the dataset schema (atomically, like the CSV export)."""
+    require_pyarrow()
+    table = pa.Table.from_pandas(to_typed_frame(df), schema=dataset_schema(df.columns), preserve_index=False)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return table.num_rows
+
+def write_parquet_rows(rows, fieldnames, path):
+    """Write row dicts (as exported from the job store) to path as Parquet."""
+    return write_parquet(pd.DataFrame.from_records(rows, columns=fieldnames), path)
+
+def read_dataset(path, **csv_kwargs):
+    """Load a dataset file: Parquet with its stored types (dates as datetime64), anything else as CSV."""
+    if path.endswith('.parquet'):
+        require_pyarrow()
+        return pq.read_table(path).to_pandas(date_as_object=False)
+    return pd.read_csv(path, **csv_kwargs)
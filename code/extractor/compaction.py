@@ -0,0 +1,180 @@
+# === TOKEN-BUDGETED TEXT COMPACTION ===
+# The extracted first page is sent to the LLM next to a ~2,000 token system prompt. Whisperer's layout
+# text in particular carries column padding, the form's printed instructions and sections that never
+# feed an output field. Before the LLM call the text is:
+#   1. whitespace-normalized (trailing space, blank lines, layout padding -> ' | ' column breaks),
+#   2. stripped of boilerplate (agency address, OMB notice, public law text, ...) column by column,
+#   3. split into numbered Form 17-4 sections; the safety checklist is dropped, and log books /
+#      optional remarks are kept only while the document is within its token budget,
+#   4. trimmed from the end of the longest section until it fits the budget.
+# Tokens are counted with tiktoken when it's installed and can load its encoding, and estimated at ~4
+# characters per token otherwise (with a warning). tiktoken isn't a requirement, and it downloads the BPE
+# file on first use: on a machine without network access, fetch it once elsewhere and point
+# TIKTOKEN_CACHE_DIR at a copy of the cache.
+# Off unless asked for (--compaction) until a golden-set comparison shows it costs no accuracy; run
+# evals/eval-matrix.py with and without --compaction to make one.
+import csv
+import re
+import threading
+import os
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+BOILERPLATE_PATTERNS = [
+    r'complete in accordance with instructions',
+    r'form approved',
+    r'omb no\.',
+    r'^\W*to:?\W*national oceanic and atmospheric administration\W*$',
+    r'national oceanic and atmospheric administration\W*$',
+    r'office of oceanic and atmospheric research',
+    r'east-west highway',
+    r'silver spring,? md',
+    r'noaa form 17-4',
+    r'u\.s\. department of commerce',
+    r"nat'l oceanic and atmospheric adm",
+    r'^\W*\(\d{1,2}-\d{2}\)\W*$',
+    r'p\.l\. 205',
+    r'public law 92',
+    r'u\.s\.c\. 330',
+    r'knowing and willful violation',
+    r'adopted under the authority',
+    r'shall subject the person',
+    r'not more than \$10,000',
+    r'^\W*reset\W*$',
+    r'^\W*<<<\W*$',
+]
+BOILERPLATE_RE = re.compile('|'.join(BOILERPLATE_PATTERNS), re.IGNORECASE)
+
+# Section titles (lowercase prefixes) that are always dropped / dropped first when over budget
+DROPPED_SECTIONS = ('safety and environment',)
+LOW_PRIORITY_SECTIONS = ('optional remarks', 'log books')
+
+SECTION_RE = re.compile(r'^\s*(\d{1,2})\.\s*(?:\([a-z]\)\s*)?([a-z][a-z ,/]+)', re.IGNORECASE)
+
+_encodings = {}  # model -> tiktoken encoding, or None when counts for it are estimated
+
+def load_encoding(model):
+    """The tiktoken encoding for model, or None (after a one-time warning) when token counts have to be estimated."""
+    if model in _encodings:
+        return _encodings[model]
+    encoding, reason = None, "tiktoken is not installed"
+    if tiktoken is not None:
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding('o200k_base')
+        except Exception as e:  # no cached BPE file and no network
+            reason = f"tiktoken couldn't load its encoding ({type(e).__name__}: {e})"
+    if encoding is None:
+        print(f"Warning: {reason}; estimating tokens as characters / 4 for compaction.")
+    _encodings[model] = encoding
+    return encoding
+
+def count_tokens(text, model='o3'):
+    encoding = load_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4
+
+def normalize_whitespace(text):
+    lines = []
+    for line in text.splitlines():
+        line = re.sub(r'[ \t]{3,}', ' | ', line.strip())
+        line = re.sub(r'[ \t]+', ' ', line)
+        line = re.sub(r'([_.\-=*])\1{3,}', '', line).strip(' |')  # fill-in lines and dot leaders
+        if line:
+            lines.append(line)
+    return lines
+
+def split_sections(lines):
+    """[(title or None, [lines])]; a line starting with 'N.' opens a new section."""
+    sections = [(None, [])]
+    for line in lines:
+        match = SECTION_RE.match(line)
+        if match:
+            sections.append((match.group(2).strip().lower(), [line]))
+        else:
+            sections[-1][1].append(line)
+    return [s for s in sections if s[1]]
+
+def join_sections(sections):
+    return '\n'.join(line for _, lines in sections for line in lines)
+
+def compact_text(text, token_budget=1000, model='o3'):
+    """Returns (compacted text, tokens before, tokens after)."""
+    tokens_before = count_tokens(text, model)
+    lines = []
+    for line in normalize_whitespace(text):
+        # boilerplate often shares a layout line with form data in the other column, so filter per column
+        cells = [cell for cell in line.split(' | ') if not BOILERPLATE_RE.search(cell)]
+        if cells:
+            lines.append(' | '.join(cells))
+    sections = [s for s in split_sections(lines) if not (s[0] and s[0].startswith(DROPPED_SECTIONS))]
+    compacted = join_sections(sections)
+
+    # over budget: drop low-priority sections, then trim the longest section from its end
+    for title in LOW_PRIORITY_SECTIONS:
+        if count_tokens(compacted, model) <= token_budget:
+            break
+        sections = [s for s in sections if not (s[0] and s[0].startswith(title))]
+        compacted = join_sections(sections)
+    tokens_after = count_tokens(compacted, model)
+    while tokens_after > token_budget:
+        # drop about as many characters as the excess tokens account for, then recount
+        excess_chars = (tokens_after - token_budget) * len(compacted) // tokens_after + 1
+        while excess_chars > 0:
+            trimmable = [s for s in sections if len(s[1]) > 1]
+            if not trimmable:
+                break
+            longest = max(trimmable, key=lambda s: sum(len(line) for line in s[1]))
+            excess_chars -= len(longest[1].pop()) + 1
+        if excess_chars > 0:
+            compacted = join_sections(sections)
+            compacted = compacted[:len(compacted) * token_budget // tokens_after]  # only section headers left: hard cut
+            return compacted, tokens_before, count_tokens(compacted, model)
+        compacted = join_sections(sections)
+        tokens_after = count_tokens(compacted, model)
+
+    return compacted, tokens_before, tokens_after
+
+class Compactor:
+    """compact_text plus a per-file report (tokens before/after) and run totals; shared across threads."""
+
+    def __init__(self, token_budget=1000, model='o3', report_file=None, enabled=False):
+        self.token_budget = token_budget
+        self.model = model
+        self.report_file = report_file
+        self.enabled = enabled
+        self.files = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self._lock = threading.Lock()
+
+    def compact(self, file, text):
+        if not self.enabled:
+            return text
+        compacted, before, after = compact_text(text, self.token_budget, self.model)
+        print(f"Compaction: {before} -> {after} tokens")
+        with self._lock:
+            self.files += 1
+            self.tokens_before += before
+            self.tokens_after += after
+            if self.report_file:
+                new_file = not os.path.exists(self.report_file)
+                os.makedirs(os.path.dirname(self.report_file) or '.', exist_ok=True)
+                with open(self.report_file, 'a', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    if new_file:
+                        writer.writerow(['filename', 'tokens_before', 'tokens_after', 'token_budget'])
+                    writer.writerow([file, before, after, self.token_budget])
+        return compacted
+
+    def summary(self):
+        saved = 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0
+        counter = 'tiktoken' if load_encoding(self.model) is not None else 'estimated'
+        return (f"Compaction: {self.files} files, {self.tokens_before} -> {self.tokens_after} document tokens "
+                f"({saved:.0%} fewer, {counter}, budget {self.token_budget} per file)")
@@ -0,0 +1,265 @@
+# === JOB STATE STORE ===
+# One SQLite row per PDF replaces processed-files.txt plus CSV appends (a crash between the two writes used
+# to duplicate or lose rows). Each row carries the file's state (pending, claimed, done, failed, dead), the last
+# stage it completed (text, llm, parsed) with the extraction method, stage timings, raw LLM response and
+# parsed fields, plus attempts and the last error. The output CSV is exported from the parsed rows, in
+# the order they were parsed, and can be regenerated at any time.
+#
+# A file that fails goes to the dead-letter queue instead of stopping the run: state 'failed' with the
+# error class and a next retry time (retry_delay, x4 per further attempt). Later runs pick it up again once
+# that time has passed; after max_attempts it is parked as 'dead' and only `retry-failed` reprocesses it.
+# A run of max_consecutive_failures failures in a row (bad API key, every provider down) still stops the run.
+#
+# Workers (threads of one run, or several runs against the same file) claim files atomically: a claim is
+# one BEGIN IMMEDIATE transaction, so two workers never get the same file. Claims held by a process that
+# has died on this host are released on the next claim; a clean run releases whatever it claimed but
+# didn't finish.
+import csv
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+STAGES = ('text', 'llm', 'parsed')
+RETRY_BACKOFF = 4
+
+# columns added after the first release of the table, for stores created before them
+LATER_COLUMNS = {'error_class': 'TEXT', 'next_retry_at': 'REAL'}
+
+def error_class(error):
+    return type(error).__name__ if isinstance(error, BaseException) else 'Error'
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # someone else's process
+    return True
+
+class JobStore:
+    def __init__(self, db_path, worker_id=None, retry_delay=600, max_attempts=4, max_consecutive_failures=10):
+        self.db_path = db_path
+        self.worker_id = worker_id or default_worker_id()
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.max_consecutive_failures = max_consecutive_failures
+        self.consecutive_failures = 0
+        self.opened_at = time.time()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                filename TEXT PRIMARY KEY,
+                state TEXT NOT NULL DEFAULT 'pending',
+                stage TEXT,
+                method TEXT,
+                timings TEXT,
+                response_text TEXT,
+                row TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                error_class TEXT,
+                next_retry_at REAL,
+                worker TEXT,
+                claimed_at REAL,
+                parsed_at REAL,
+                updated REAL NOT NULL
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(files)")}
+        for column, kind in LATER_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE files ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_state ON files (state)")
+
+    def _write(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 0
+
+    def add_files(self, filenames):
+        """Register files (new ones start pending; known ones are left as they are)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany("INSERT OR IGNORE INTO files (filename, updated) VALUES (?, ?)", [(f, now) for f in filenames])
+            self._conn.execute("COMMIT")
+
+    def claim(self, limit=None, retry_failed=False):
+        """Atomically claim up to `limit` (None = all) files for this worker; returns their names.
+        Normally that's pending files plus failed files whose retry time has come; with retry_failed, it's
+        every file in the dead-letter queue (failed or dead) regardless of its schedule. A file that fails
+        during this run isn't claimed again by it."""
+        self.release_dead_workers()
+        now = time.time()
+        if retry_failed:
+            where, params = "state IN ('failed', 'dead')", ()
+        else:
+            where, params = "(state = 'pending' OR (state = 'failed' AND COALESCE(next_retry_at, 0) <= ?))", (now,)
+        where, params = f"{where} AND COALESCE(claimed_at, 0) < ?", params + (self.opened_at,)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                files = [row[0] for row in self._conn.execute(
+                    f"SELECT filename FROM files WHERE {where} ORDER BY filename LIMIT ?",
+                    params + (-1 if limit is None else limit,)
+                )]
+                self._conn.executemany(
+                    "UPDATE files SET state = 'claimed', worker = ?, claimed_at = ?, attempts = attempts + 1, updated = ? WHERE filename = ?",
+                    [(self.worker_id, now, now, f) for f in files]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return files
+
+    def iter_claims(self, retry_failed=False):
+        """Claim files one at a time as the caller asks for them, so concurrent runs share the remaining work."""
+        while True:
+            files = self.claim(limit=1, retry_failed=retry_failed)
+            if not files:
+                return
+            yield files[0]
+
+    def release_dead_workers(self):
+        """Put files claimed by processes on this host that no longer exist back to pending."""
+        host = socket.gethostname()
+        with self._lock:
+            workers = [row[0] for row in self._conn.execute("SELECT DISTINCT worker FROM files WHERE state = 'claimed'")]
+        for worker in workers:
+            worker_host, _, pid = (worker or '').rpartition(':')
+            if worker_host == host and pid.isdigit() and not pid_alive(int(pid)):
+                released = self._write("UPDATE files SET state = 'pending', worker = NULL, updated = ? WHERE state = 'claimed' AND worker = ?", (time.time(), worker))
+                print(f"Job store: released {released} files claimed by {worker}, which is no longer running")
+
+    def release(self):
+        """Return this worker's unfinished claims to pending (end of run, or stopping early)."""
+        return self._write("UPDATE files SET state = 'pending', worker = NULL, updated = ? WHERE state = 'claimed' AND worker = ?", (time.time(), self.worker_id))
+
+    def record_text(self, filename, method, timings):
+        self._write("UPDATE files SET stage = 'text', method = ?, timings = ?, updated = ? WHERE filename = ?",
+                    (method, json.dumps(timings or {}), time.time(), filename))
+
+    def record_llm(self, filename, response_text):
+        self._write("UPDATE files SET stage = 'llm', response_text = ?, updated = ? WHERE filename = ?",
+                    (response_text, time.time(), filename))
+
+    def record_parsed(self, filename, row):
+        now = time.time()
+        self._write("UPDATE files SET stage = 'parsed', state = 'done', row = ?, last_error = NULL, error_class = NULL, next_retry_at = NULL, "
+                    "worker = NULL, parsed_at = ?, updated = ? WHERE filename = ?",
+                    (json.dumps(row), now, now, filename))
+        self.consecutive_failures = 0
+
+    def record_failure(self, filename, error):
+        """Move a file to the dead-letter queue. Returns (state, next retry time or None)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM files WHERE filename = ?", (filename,)).fetchone()
+            attempts = max(row[0] if row else 0, 1)
+            if attempts >= self.max_attempts:
+                state, next_retry_at = 'dead', None
+            else:
+                state, next_retry_at = 'failed', now + self.retry_delay * RETRY_BACKOFF ** (attempts - 1)
+            self._conn.execute(
+                "UPDATE files SET state = ?, last_error = ?, error_class = ?, next_retry_at = ?, worker = NULL, updated = ? WHERE filename = ?",
+                (state, str(error), error_class(error), next_retry_at, now, filename)
+            )
+            self.consecutive_failures += 1
+        return state, next_retry_at
+
+    def failing_everything(self):
+        return self.consecutive_failures >= self.max_consecutive_failures
+
+    def done_files(self):
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT filename FROM files WHERE state = 'done'")}
+
+    def import_checkpoint(self, checkpoint_file, output_file):
+        """One-off migration from processed-files.txt + the output CSV. Files listed as processed but missing
+        from the CSV (the crash window of the old scheme) are left pending so they're extracted again."""
+        rows = {}
+        if os.path.exists(output_file):
+            with open(output_file, newline='', encoding='utf-8') as f:
+                rows = {row['filename']: row for row in csv.DictReader(f)}
+        processed = set()
+        if os.path.exists(checkpoint_file):
+            with open(checkpoint_file, 'r') as f:
+                processed = set(f.read().splitlines())
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for i, (filename, row) in enumerate(rows.items()):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (filename, state, stage, row, parsed_at, updated) VALUES (?, 'done', 'parsed', ?, ?, ?)",
+                    (filename, json.dumps(row), now + i * 1e-6, now)  # parsed_at keeps the CSV's row order
+                )
+            self._conn.execute("COMMIT")
+        lost = processed - set(rows)
+        print(f"Job store: imported {len(rows)} rows from {output_file}; {len(lost)} checkpointed files had no row and will be extracted again")
+        return len(rows)
+
+    def rows(self):
+        """Every parsed row, in the order the rows were parsed."""
+        with self._lock:
+            return [json.loads(row[0]) for row in self._conn.execute("SELECT row FROM files WHERE state = 'done' ORDER BY parsed_at, filename")]
+
+    def export_csv(self, output_file, fieldnames):
+        """Write every parsed row to output_file (replacing it), in the order the rows were parsed."""
+        rows = self.rows()
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        tmp_path = f"{output_file}.tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, output_file)
+        return len(rows)
+
+    def counts(self):
+        with self._lock:
+            states = dict(self._conn.execute("SELECT state, COUNT(*) FROM files GROUP BY state").fetchall())
+            stages = dict(self._conn.execute("SELECT COALESCE(stage, 'none'), COUNT(*) FROM files WHERE state != 'done' GROUP BY stage").fetchall())
+        return states, stages
+
+    def failures(self):
+        """The dead-letter queue: [(filename, state, stage, attempts, error_class, last_error, next_retry_at)]."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT filename, state, stage, attempts, error_class, last_error, next_retry_at FROM files "
+                "WHERE state IN ('failed', 'dead') ORDER BY filename"
+            ).fetchall()
+
+    def dead_letter_summary(self):
+        failures = self.failures()
+        if not failures:
+            return "dead-letter queue: empty"
+        classes = Counter(f[4] for f in failures)
+        dead = sum(1 for f in failures if f[1] == 'dead')
+        upcoming = [f[6] for f in failures if f[6]]
+        next_retry = f", next retry {time.strftime('%Y-%m-%d %H:%M', time.localtime(min(upcoming)))}" if upcoming else ''
+        return (f"dead-letter queue: {len(failures)} files (" + ', '.join(f"{c} {n}" for c, n in classes.most_common()) + ")"
+                + f", {dead} out of attempts (python llm-extractor.py retry-failed){next_retry}")
+
+    def summary(self):
+        states, stages = self.counts()
+        unfinished = ', '.join(f"{stage} {count}" for stage, count in sorted(stages.items()))
+        return (f"job store: {sum(states.values())} files, " + ', '.join(f"{state} {count}" for state, count in sorted(states.items()))
+                + (f" (unfinished files by last completed stage: {unfinished})" if unfinished else ''))
+
+    def close(self):
+        self._conn.close()
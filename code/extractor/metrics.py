@@ -0,0 +1,178 @@
+# === PER-FILE STAGE TIMINGS AND METRICS ===
+# Every stage of every file is recorded as a span and appended to a JSONL file as soon as it ends:
+#   {"file": "2018UTNORT-1.pdf", "stage": "ocr", "start": 1718000000.123, "seconds": 2.41, "status": "ok", "method": "ocr-regions", ...}
+# Stages, in waterfall order:
+#   open, native-text, rasterize, ocr   the free extractors (timed in the worker process, recorded by the parent)
+#   text-cache                          a text cache hit; the stages above don't run
+#   whisper-submit, whisper-wait        uploading a Whisperer job; how long the file then waited for its text
+#   llm-request, parse, write           the OpenAI call (cache hits too, with cached=true), parsing, the job store write
+# Spans carry whatever attributes the stage knows (method, bytes, pages, chars, tokens, retries, model), and
+# a stage that raises is recorded with status "error" and the exception. Each stage's durations also go into
+# a fixed-bucket histogram, written out at the end of a run in the Prometheus text exposition format and
+# printed as p50/p95 per stage, so it is clear where the ~10-15 s per file goes.
+# `python -m extractor.metrics spans.jsonl` summarizes the spans file of any run (or several runs).
+import argparse
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+# Upper bounds (seconds) of the histogram buckets; +Inf is implied
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+METRIC_PREFIX = 'noaa_extractor'
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0-100) of a list of numbers; None when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+class Histogram:
+    """Cumulative-bucket latency histogram. Raw durations are kept too, for exact percentiles."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.values = []
+
+    def observe(self, seconds):
+        self.sum += seconds
+        self.values.append(seconds)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+
+    @property
+    def count(self):
+        return len(self.values)
+
+class Metrics:
+    """Stage spans (JSONL), per-stage histograms and error counts, shared by every thread of a run."""
+
+    def __init__(self, spans_file=None, prometheus_file=None, enabled=True):
+        self.spans_file = spans_file
+        self.prometheus_file = prometheus_file
+        self.enabled = enabled
+        self.histograms = {}    # stage -> Histogram
+        self.errors = Counter() # stage -> spans with status 'error'
+        self._out = None
+        self._lock = threading.Lock()
+
+    def record(self, file, stage, seconds, start=None, status='ok', error=None, **attrs):
+        """Record a finished span. start is its wall-clock start (defaults to now - seconds); None attributes are dropped."""
+        if not self.enabled:
+            return
+        span = {
+            'file': file,
+            'stage': stage,
+            'start': round(start if start is not None else time.time() - seconds, 3),
+            'seconds': round(seconds, 4),
+            'status': status,
+        }
+        if error is not None:
+            span['error'] = (error if isinstance(error, str) else f"{type(error).__name__}: {error}")[:500]
+        span.update((key, value) for key, value in attrs.items() if value is not None)
+        with self._lock:
+            self.histograms.setdefault(stage, Histogram()).observe(seconds)
+            if status != 'ok':
+                self.errors[stage] += 1
+            if self.spans_file:
+                if self._out is None:
+                    os.makedirs(os.path.dirname(self.spans_file) or '.', exist_ok=True)
+                    self._out = open(self.spans_file, 'a', encoding='utf-8')
+                self._out.write(json.dumps(span) + '\n')
+                self._out.flush()
+
+    @contextlib.contextmanager
+    def span(self, file, stage, **attrs):
+        """Time the with-block as one span. Yields the attribute dict, so the block can add what it learns (tokens, chars)."""
+        start, started = time.time(), time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            self.record(file, stage, time.perf_counter() - started, start, status='error', error=e, **attrs)
+            raise
+        self.record(file, stage, time.perf_counter() - started, start, **attrs)
+
+    def record_spans(self, file, spans):
+        """Record spans timed elsewhere (e.g. in a worker process) as (stage, start, seconds, status, attrs) tuples."""
+        for stage, start, seconds, status, attrs in spans:
+            self.record(file, stage, seconds, start, status=status, **attrs)
+
+    def prometheus(self):
+        """The histograms and error counts in the Prometheus text exposition format."""
+        name = f"{METRIC_PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Time spent in each extraction stage, per file.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+            errors = f"{METRIC_PREFIX}_stage_errors_total"
+            lines += [f"# HELP {errors} Spans that ended with an exception, per stage.", f"# TYPE {errors} counter"]
+            for stage in sorted(self.histograms):
+                lines.append(f'{errors}{{stage="{stage}"}} {self.errors[stage]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path=None):
+        """Write prometheus() to path (default: prometheus_file) atomically, for a textfile collector to pick up."""
+        path = path or self.prometheus_file
+        if not path or not self.histograms:
+            return None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+        return path
+
+    def summary(self):
+        """One line per stage (count, p50, p95, max, total, errors), the stages taking the most time first."""
+        with self._lock:
+            stages = sorted(self.histograms.items(), key=lambda item: -item[1].sum)
+            if not stages:
+                return "Stage timings: nothing recorded"
+            lines = [f"Stage timings ({sum(h.count for _, h in stages)} spans):",
+                     f"  {'stage':<15}{'count':>7}{'p50':>10}{'p95':>10}{'max':>10}{'total':>11}{'errors':>8}"]
+            for stage, h in stages:
+                lines.append(f"  {stage:<15}{h.count:>7}{percentile(h.values, 50):>9.3f}s{percentile(h.values, 95):>9.3f}s"
+                             f"{max(h.values):>9.3f}s{h.sum:>10.1f}s{self.errors[stage]:>8}")
+        return '\n'.join(lines)
+
+    def close(self):
+        with self._lock:
+            if self._out:
+                self._out.close()
+                self._out = None
+
+def load_spans(paths):
+    """Rebuild the histograms of one or more spans files (without writing spans again)."""
+    metrics = Metrics()
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    span = json.loads(line)
+                    metrics.record(span['file'], span['stage'], span['seconds'], span['start'], status=span.get('status', 'ok'))
+    return metrics
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize per-stage timings from llm-extractor spans files.")
+    parser.add_argument('spans', nargs='+', help="JSONL spans file(s) written with --metrics-file")
+    parser.add_argument('--prometheus', default=None, help="also write the histograms in Prometheus text format to this file")
+    args = parser.parse_args(argv)
+    metrics = load_spans(args.spans)
+    print(metrics.summary())
+    if args.prometheus:
+        print(f"Prometheus metrics saved to {metrics.write_prometheus(args.prometheus)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# === MULTI-DOCUMENT PACKING ===
+# Sends several forms in one chat completion so the ~2,000 token extraction prompt is paid once per pack
+# instead of once per file. Documents are wrapped in numbered delimiters and the model is asked for one
+# "### DOCUMENT k" block per document; the reply is split back into per-file field blocks, and any
+# document whose block is missing or doesn't carry all 12 field lines is returned as missing so the
+# caller can retry just those.
+import re
+
+FIELD_LABELS = [
+    'project', 'year', 'season', 'state', 'operator affiliation', 'agent', 'apparatus',
+    'purpose', 'target area', 'control area', 'start date', 'end date',
+]
+
+BLOCK_RE = re.compile(r'^\W*document\s+(\d+)\b.*$', re.IGNORECASE | re.MULTILINE)
+
+def packed_prompt(llm_prompt, count):
+    return llm_prompt + f"""
+## Multiple Reports
+
+This request contains {count} reports, each between `=== DOCUMENT k ===` and `=== END DOCUMENT k ===` lines (k = 1 to {count}). Extract the fields of every report independently: never carry information from one report into another.
+
+For each report output a line `### DOCUMENT k` followed by that report's 12 fields in the format above. Output exactly {count} blocks, in document order, with no other text.
+"""
+
+def pack_documents(llm_inputs):
+    """llm_inputs: the format_llm_input() text of each document, in pack order."""
+    return '\n'.join(
+        f"=== DOCUMENT {k} ===\n{text.strip()}\n=== END DOCUMENT {k} ==="
+        for k, text in enumerate(llm_inputs, 1)
+    )
+
+def is_complete_block(block):
+    labels = {line.split(':', 1)[0].strip(' *-#').lower() for line in block.splitlines() if ':' in line}
+    return all(label in labels for label in FIELD_LABELS)
+
+def split_packed_response(response_text, files):
+    """Returns {file: field block} for the documents whose block came back complete; the rest are left out."""
+    matches = list(BLOCK_RE.finditer(response_text or ''))
+    blocks = {}
+    for i, match in enumerate(matches):
+        k = int(match.group(1))
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(response_text)
+        block = response_text[match.end():end].strip()
+        if 1 <= k <= len(files) and files[k - 1] not in blocks and is_complete_block(block):
+            blocks[files[k - 1]] = block
+    return blocks
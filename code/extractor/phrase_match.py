@@ -0,0 +1,77 @@
+# === OCR-TOLERANT KEY PHRASE MATCHING ===
+# Decides whether first-page text is a complete Form 17-4 without failing the page over one OCR typo
+# ("sp0nsor", "targetarea", "dates 0f project").
+#   1. The text is lowercased and whitespace-collapsed, so phrases broken across lines still match.
+#   2. One regex pass (an alternation of every phrase) finds all exact occurrences.
+#   3. Phrases still missing are matched approximately in a second single pass over the text, updating one
+#      Myers bit-vector per phrase at each character. This gives the minimum edit distance between the
+#      phrase and any substring of the text in O(len(text)) per phrase.
+# Each phrase scores 1 - edits / len(phrase) (1.0 = exact). Confidence is the mean score; a page is
+# accepted when confidence >= min_confidence and every phrase scores at least min_phrase_score, so a few
+# OCR typos pass but a missing phrase fails the page however well the others match. Unrelated text scores
+# around 0.5.
+import re
+
+def normalize(text):
+    return re.sub(r'\s+', ' ', text.lower())
+
+def best_edit_distance(phrase, text):
+    """Minimum Levenshtein distance between phrase and any substring of text (Myers' bit-parallel algorithm)."""
+    return best_edit_distances([phrase], text)[phrase]
+
+def best_edit_distances(phrases, text):
+    """best_edit_distance for several phrases in one pass over text. Returns {phrase: distance}."""
+    states = []
+    for phrase in phrases:
+        m = len(phrase)
+        peq = {}
+        for i, c in enumerate(phrase):
+            peq[c] = peq.get(c, 0) | (1 << i)
+        # [phrase, peq, mask, high bit, Pv, Mv, current score, best score]
+        states.append([phrase, peq, (1 << m) - 1, 1 << (m - 1), (1 << m) - 1, 0, m, m])
+
+    for c in text:
+        for state in states:
+            _, peq, mask, high, pv, mv, score, best = state
+            eq = peq.get(c, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = (mv | ~(xh | pv)) & mask
+            mh = pv & xh
+            if ph & high:
+                score += 1
+            elif mh & high:
+                score -= 1
+            # a match may start anywhere in the text, so nothing is shifted in at the top row
+            ph = (ph << 1) & mask
+            mh = (mh << 1) & mask
+            state[4] = (mh | ~(xv | ph)) & mask
+            state[5] = ph & xv
+            state[6] = score
+            if score < best:
+                state[7] = score
+    return {state[0]: state[7] for state in states}
+
+class PhraseMatcher:
+    def __init__(self, phrases, min_confidence=0.9, min_phrase_score=0.8):
+        self.phrases = [normalize(p).strip() for p in phrases]
+        self.min_confidence = min_confidence
+        self.min_phrase_score = min_phrase_score
+        # longest first, so a phrase that starts like a shorter one wins the alternation; zero-width
+        # lookahead so overlapping phrases ("target and control areas" / "control area") are all found
+        ordered = sorted(self.phrases, key=len, reverse=True)
+        self.exact_pattern = re.compile('(?=(' + '|'.join(re.escape(p) for p in ordered) + '))')
+
+    def match(self, text):
+        """Returns {'scores': {phrase: 0..1}, 'confidence': mean score, 'accepted': bool}."""
+        text = normalize(text)
+        found = {m.group(1) for m in self.exact_pattern.finditer(text)}
+        scores = {p: 1.0 for p in self.phrases if p in found}
+        missing = [p for p in self.phrases if p not in found]
+        if missing:
+            for phrase, edits in best_edit_distances(missing, text).items():
+                scores[phrase] = round(1 - edits / len(phrase), 3)
+        scores = {p: scores[p] for p in self.phrases}
+        confidence = round(sum(scores.values()) / len(scores), 3) if scores else 0.0
+        accepted = confidence >= self.min_confidence and all(score >= self.min_phrase_score for score in scores.values())
+        return {'scores': scores, 'confidence': confidence, 'accepted': accepted}
@@ -0,0 +1,146 @@
+# === STAGED EXTRACTION PIPELINE ===
+# Runs the extractor as three stages connected by bounded queues:
+#   cpu   : a process pool for rasterization / OCR (PyMuPDF, pdf2image + pytesseract)
+#   io    : a thread pool for network calls (LLM Whisperer, OpenAI)
+#   write : a single writer thread (CSV + checkpoint)
+# A full queue blocks the stage feeding it, so a slow stage applies backpressure upstream
+# instead of letting work pile up in memory. Queue depths are reported while the run is going;
+# the stage whose input queue stays full is the bottleneck on this machine.
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+_DONE = object()  # end-of-stream marker passed down the queues
+
+def run_pipeline(items, cpu_stage, io_stage, write_stage, cpu_done=None, on_error=None, cpu_workers=4, io_workers=16, queue_size=32, report_interval=30):
+    """Push every item through cpu_stage -> io_stage -> write_stage.
+
+    cpu_stage(item) runs in a worker process and must be picklable (a module-level function).
+    io_stage(item, cpu_result) and write_stage(item, io_result) run in threads of this process.
+    cpu_done(item, cpu_result), if given, runs in this process as soon as an item leaves the cpu stage,
+    before it waits in the io queue (e.g. to start a remote job the io stage will collect).
+    An exception in any stage is passed to on_error(item, error) in the writer thread; the run goes on
+    while it returns True. Without on_error (or once it returns False) the first exception stops new work
+    from starting, and items already queued are drained without being processed.
+    Returns (ok, failed_item, error) and prints a queue depth summary.
+    """
+    queues = {
+        'cpu': queue.Queue(maxsize=queue_size),
+        'io': queue.Queue(maxsize=queue_size),
+        'write': queue.Queue(maxsize=queue_size),
+    }
+    depth_samples = {name: [] for name in queues}
+    stop = threading.Event()
+    finished = threading.Event()
+    failure = []
+    remaining = {'cpu': cpu_workers, 'io': io_workers}
+    remaining_lock = threading.Lock()
+
+    def worker_exited(stage, next_queue, sentinels):
+        # the last worker of a stage to exit passes end-of-stream on to the next stage
+        with remaining_lock:
+            remaining[stage] -= 1
+            last = remaining[stage] == 0
+        if last:
+            for _ in range(sentinels):
+                next_queue.put(_DONE)
+
+    def feed():
+        for item in items:
+            if stop.is_set():
+                break
+            queues['cpu'].put(item)
+        for _ in range(cpu_workers):
+            queues['cpu'].put(_DONE)
+
+    def cpu_worker(executor):
+        while True:
+            item = queues['cpu'].get()
+            if item is _DONE:
+                break
+            if stop.is_set():
+                continue
+            try:
+                cpu_result = executor.submit(cpu_stage, item).result()
+                if cpu_done:
+                    cpu_done(item, cpu_result)
+                queues['io'].put((item, cpu_result, None))
+            except Exception as e:
+                queues['io'].put((item, None, e))
+        worker_exited('cpu', queues['io'], io_workers)
+
+    def io_worker():
+        while True:
+            entry = queues['io'].get()
+            if entry is _DONE:
+                break
+            item, cpu_result, error = entry
+            if stop.is_set():
+                continue
+            if error is None:
+                try:
+                    queues['write'].put((item, io_stage(item, cpu_result), None))
+                    continue
+                except Exception as e:
+                    error = e
+            queues['write'].put((item, None, error))
+        worker_exited('io', queues['write'], 1)
+
+    def writer():
+        while True:
+            entry = queues['write'].get()
+            if entry is _DONE:
+                break
+            item, io_result, error = entry
+            if stop.is_set():
+                continue
+            if error is None:
+                try:
+                    write_stage(item, io_result)
+                    continue
+                except Exception as e:
+                    error = e
+            if on_error and on_error(item, error):
+                continue
+            failure.append((item, error))
+            stop.set()
+
+    def monitor():
+        while not finished.wait(report_interval):
+            print(f"[pipeline] queue depth: {format_depths(queues, queue_size)}")
+
+    def sample():
+        while not finished.wait(0.5):
+            for name, q in queues.items():
+                depth_samples[name].append(q.qsize())
+
+    with ProcessPoolExecutor(max_workers=cpu_workers) as executor:
+        threads = [threading.Thread(target=feed, name='pipeline-feed')]
+        threads += [threading.Thread(target=cpu_worker, args=(executor,), name=f'pipeline-cpu-{i}') for i in range(cpu_workers)]
+        threads += [threading.Thread(target=io_worker, name=f'pipeline-io-{i}') for i in range(io_workers)]
+        threads += [threading.Thread(target=writer, name='pipeline-write')]
+        watchers = [threading.Thread(target=monitor, daemon=True), threading.Thread(target=sample, daemon=True)]
+        started = time.time()
+        for t in threads + watchers:
+            t.start()
+        for t in threads:
+            t.join()
+        finished.set()
+
+    print(f"\n[pipeline] finished in {time.time() - started:.1f}s "
+          f"(cpu_workers={cpu_workers}, io_workers={io_workers}, queue_size={queue_size})")
+    print(f"[pipeline] {'stage input':<12} | {'avg depth':>9} | {'max depth':>9} | {'% full':>6}")
+    for name, samples in depth_samples.items():
+        avg = sum(samples) / len(samples) if samples else 0
+        peak = max(samples) if samples else 0
+        full = sum(1 for s in samples if s >= queue_size) / len(samples) if samples else 0
+        print(f"[pipeline] {name:<12} | {avg:9.1f} | {peak:9d} | {full:6.0%}")
+
+    if failure:
+        item, error = failure[0]
+        return False, item, error
+    return True, None, None
+
+def format_depths(queues, queue_size):
+    return ', '.join(f"{name}={q.qsize()}/{queue_size}" for name, q in queues.items())
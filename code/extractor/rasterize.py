@@ -0,0 +1,36 @@
+# === FIRST-PAGE RASTERIZATION FOR OCR ===
+# Backends that turn page 1 of a PDF into a PIL image for pytesseract:
+#   pymupdf   : renders in-process with a PyMuPDF pixmap at the requested DPI, directly in grayscale,
+#               and wraps the pixel buffer in a PIL image without re-encoding it
+#   pdf2image : the original path (a poppler pdftoppm subprocess per file, output decoded back into PIL)
+# The image is tagged PGM/PPM so pytesseract hands it to tesseract as an uncompressed temp file
+# instead of PNG-encoding it first.
+# tests/benchmark-rasterize.py compares the two on per-file latency and peak RSS.
+import pymupdf
+import pytesseract
+from pdf2image import convert_from_path
+from PIL import Image
+
+RASTER_BACKENDS = ('pymupdf', 'pdf2image')
+
+def render_first_page(file_path, dpi=200, grayscale=True, backend='pymupdf'):
+    if backend == 'pymupdf':
+        with pymupdf.open(file_path) as doc:
+            pix = doc[0].get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY if grayscale else pymupdf.csRGB, alpha=False)
+        mode = 'L' if grayscale else 'RGB'
+        image = Image.frombuffer(mode, (pix.width, pix.height), pix.samples, 'raw', mode, pix.stride, 1)
+    elif backend == 'pdf2image':
+        images = convert_from_path(file_path, dpi=dpi, first_page=1, last_page=1, grayscale=grayscale)
+        if not images:
+            return None
+        image = images[0]
+    else:
+        raise ValueError(f"unknown rasterization backend {backend!r} (expected one of {RASTER_BACKENDS})")
+    image.format = 'PGM' if image.mode == 'L' else 'PPM'
+    return image
+
+def ocr_first_page(file_path, lang='eng', dpi=200, grayscale=True, backend='pymupdf'):
+    image = render_first_page(file_path, dpi=dpi, grayscale=grayscale, backend=backend)
+    if image is None:
+        return None
+    return pytesseract.image_to_string(image, lang=lang)
@@ -0,0 +1,292 @@
+# === RATE LIMITING, RETRIES AND CIRCUIT BREAKING ===
+# One Provider per external API (OpenAI, LLM Whisperer), shared by every worker thread / coroutine:
+#   RateLimiter    : local request and token buckets sized from the x-ratelimit-* response headers,
+#                    so concurrent workers queue up locally instead of collecting 429s
+#   CircuitBreaker : after `failure_threshold` consecutive transient failures the provider is considered
+#                    down for `cooldown` seconds; callers wait it out instead of hammering it
+#   RetryPolicy    : exponential backoff with full jitter, honoring retry-after when the server sends it
+# Errors are classified as RATE_LIMITED (wait and retry, doesn't count against the breaker),
+# RETRYABLE (timeouts, connection errors, 5xx) or FATAL (bad request, auth, quota -> raise immediately).
+import asyncio
+import random
+import re
+import threading
+import time
+
+import openai
+import requests
+
+RATE_LIMITED = 'rate_limited'
+RETRYABLE = 'retryable'
+FATAL = 'fatal'
+
+class CircuitOpenError(Exception):
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} circuit open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class RetryableError(Exception):
+    """Raise from a guarded call to force a retry (e.g. an empty completion)."""
+
+def parse_duration(value):
+    """Parse OpenAI reset durations such as '1s', '6m0s', '59.5s', '20ms' or '1h2m3s' into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    return sum(float(n) * units[u] for n, u in parts) if parts else None
+
+def retry_after_seconds(headers):
+    if not headers:
+        return None
+    if headers.get('retry-after-ms'):
+        return float(headers['retry-after-ms']) / 1000
+    return parse_duration(headers.get('retry-after'))
+
+def classify_error(e):
+    """Return (kind, retry_after_seconds or None) for an exception raised by a provider call."""
+    if isinstance(e, CircuitOpenError):
+        return RETRYABLE, e.retry_after
+    if isinstance(e, RetryableError):
+        return RETRYABLE, None
+
+    # OpenAI
+    if isinstance(e, openai.RateLimitError):
+        if getattr(e, 'code', None) == 'insufficient_quota':
+            return FATAL, None  # retrying won't top the account up
+        return RATE_LIMITED, retry_after_seconds(e.response.headers)
+    if isinstance(e, openai.APIConnectionError):  # includes APITimeoutError
+        return RETRYABLE, None
+    if isinstance(e, openai.APIStatusError):
+        if e.status_code in (408, 409) or e.status_code >= 500:
+            return RETRYABLE, retry_after_seconds(e.response.headers)
+        return FATAL, None
+
+    # LLM Whisperer raises LLMWhispererClientException(value) with the HTTP status in value['status_code']
+    value = getattr(e, 'value', None)
+    if isinstance(value, dict) and 'status_code' in value:
+        status = value.get('status_code') or 0
+        if status == 429:
+            return RATE_LIMITED, None
+        if status in (408, 409) or status >= 500:
+            return RETRYABLE, None
+        return FATAL, None
+
+    if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError, TimeoutError)):
+        return RETRYABLE, None
+    return FATAL, None
+
+class RetryPolicy:
+    def __init__(self, max_attempts=6, base_delay=1.0, max_delay=120.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        # full jitter: spread retries of many workers over the whole backoff window
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after:
+            return min(self.max_delay, retry_after) + random.uniform(0, 1)
+        return backoff
+
+class RateLimiter:
+    """Request-per-minute and token-per-minute buckets. Limits start from the given values (None = unknown,
+    no limit) and are replaced by the x-ratelimit-* headers of every response passed to update_from_headers."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.limits = {'requests': requests_per_minute, 'tokens': tokens_per_minute}
+        self.available = {'requests': requests_per_minute, 'tokens': tokens_per_minute}
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waits = 0
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        for kind, limit in self.limits.items():
+            if limit:
+                self.available[kind] = min(limit, self.available[kind] + elapsed * limit / 60)
+
+    def _reserve(self, tokens):
+        """Take capacity for one request if it's there; otherwise return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.paused_until:
+                return self.paused_until - now
+            needed = {'requests': 1, 'tokens': tokens}
+            wait = 0.0
+            for kind, limit in self.limits.items():
+                if not limit:
+                    continue
+                amount = min(needed[kind], limit)  # a request bigger than the bucket waits for a full bucket
+                if self.available[kind] < amount:
+                    wait = max(wait, (amount - self.available[kind]) * 60 / limit)
+            if wait:
+                return wait
+            for kind, limit in self.limits.items():
+                if limit:
+                    self.available[kind] -= min(needed[kind], limit)
+            return 0.0
+
+    def acquire(self, tokens=0):
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                return
+            wait += random.uniform(0, 0.25)  # don't wake every waiter at the same instant
+            self.waits += 1
+            self.waited_seconds += wait
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=0):
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                return
+            wait += random.uniform(0, 0.25)
+            self.waits += 1
+            self.waited_seconds += wait
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers):
+        if not headers:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            for kind in ('requests', 'tokens'):
+                limit = headers.get(f'x-ratelimit-limit-{kind}')
+                remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+                if limit:
+                    self.limits[kind] = float(limit)
+                    if self.available[kind] is None:
+                        self.available[kind] = float(limit)
+                if remaining is not None and self.limits[kind]:
+                    # the server's count wins when it's lower (other clients share the same quota)
+                    self.available[kind] = min(self.available[kind], float(remaining))
+                    if float(remaining) <= 0:
+                        reset = parse_duration(headers.get(f'x-ratelimit-reset-{kind}')) or 1.0
+                        self.paused_until = max(self.paused_until, now + reset)
+
+    def pause(self, seconds):
+        """Hold every caller back for `seconds` (after a 429)."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, cooldown=60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Raise CircuitOpenError while the circuit is open. Once the cooldown is over a single trial call
+        is let through (half-open); its outcome closes or re-opens the circuit."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or self.trial_in_flight:
+                raise CircuitOpenError(self.name, max(remaining, 1.0))
+            self.trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print(f"{self.name}: circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                print(f"{self.name}: circuit opened after {self.failures} consecutive failures; pausing {self.cooldown:.0f}s")
+            self.trial_in_flight = False
+
+class Provider:
+    """Rate limiter + circuit breaker + retry policy for one external API."""
+
+    def __init__(self, name, limiter=None, breaker=None, policy=None):
+        self.name = name
+        self.limiter = limiter or RateLimiter()
+        self.breaker = breaker or CircuitBreaker(name)
+        self.policy = policy or RetryPolicy()
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _handle_failure(self, e, attempt, label):
+        kind, retry_after = classify_error(e)
+        if kind in (FATAL, RATE_LIMITED):
+            self.breaker.record_success()  # the provider answered, so it's up
+        if kind == FATAL:
+            print(f"{self.name} error{label} (fatal, not retrying): {e}")
+            raise e
+        if kind == RATE_LIMITED:
+            self.rate_limited += 1
+            self.limiter.pause(retry_after or self.policy.delay(attempt))
+        elif not isinstance(e, CircuitOpenError):
+            self.breaker.record_failure()
+        if attempt + 1 >= self.policy.max_attempts:
+            print(f"{self.name} error{label} (attempt {attempt + 1} of {self.policy.max_attempts}, giving up): {e}")
+            raise e
+        delay = self.policy.delay(attempt, retry_after)
+        self.retries += 1
+        print(f"{self.name} error{label} (attempt {attempt + 1} of {self.policy.max_attempts}, {kind}, retrying in {delay:.1f}s): {e}")
+        return delay
+
+    def call(self, fn, tokens=0, label='', stats=None):
+        """Call fn() under the limiter and breaker, retrying transient failures per the policy.
+        If given, stats['attempts'] is set to the number of attempts made (for per-call metrics)."""
+        label = f" for {label}" if label else ''
+        for attempt in range(self.policy.max_attempts):
+            if stats is not None:
+                stats['attempts'] = attempt + 1
+            try:
+                self.breaker.check()
+                self.limiter.acquire(tokens)
+                result = fn()
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                time.sleep(self._handle_failure(e, attempt, label))
+
+    async def call_async(self, fn, tokens=0, label='', stats=None):
+        """Async variant of call(); fn() must return an awaitable."""
+        label = f" for {label}" if label else ''
+        for attempt in range(self.policy.max_attempts):
+            if stats is not None:
+                stats['attempts'] = attempt + 1
+            try:
+                self.breaker.check()
+                await self.limiter.acquire_async(tokens)
+                result = await fn()
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                await asyncio.sleep(self._handle_failure(e, attempt, label))
+
+    def summary(self):
+        return (f"{self.name}: {self.retries} retries, {self.rate_limited} rate-limited responses, "
+                f"{self.limiter.waits} limiter waits ({self.limiter.waited_seconds:.0f}s), "
+                f"circuit opened {self.breaker.times_opened} times")
+
+def estimate_tokens(*texts):
+    """Rough pre-request token estimate (~4 characters per token)."""
+    return sum(len(t) for t in texts) // 4
@@ -0,0 +1,64 @@
+# === TEMPLATE-DRIVEN REGION OCR ===
+# Form 17-4 has a fixed layout, so instead of OCRing the whole first page as one block we crop the
+# numbered boxes (project designation, dates, purpose, sponsor, operator, target/control areas,
+# description) and OCR them in parallel, each with a page segmentation mode suited to its contents.
+# The result is a compact labeled field map that replaces the full page text sent to the LLM.
+#
+# Boxes are fractions of the page (x0, y0, x1, y1) and are padded generously; every box must contain
+# its printed label, which is how a page is checked against the template. Pages where fewer than
+# `min_fields` labels are found (other form revisions, rotated or badly skewed scans) return None and
+# the caller falls back to full-page OCR.
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytesseract
+
+from extractor.phrase_match import best_edit_distance, normalize
+
+# Tesseract page segmentation modes
+PSM_BLOCK = 6    # a single uniform block of text
+PSM_COLUMN = 4   # a single column of text of variable sizes
+PSM_SPARSE = 11  # scattered text, no particular order
+
+# Layout of the 4-81 revision: two columns for boxes 1-4 (designation | dates, purpose | dates,
+# sponsor | operator), then full-width target/control areas and description.
+FORM_17_4_TEMPLATE = [
+    {'field': 'project',     'label': 'project or activity designation',     'box': (0.00, 0.09, 0.56, 0.18), 'psm': PSM_BLOCK},
+    {'field': 'dates',       'label': 'dates of project',                    'box': (0.50, 0.09, 1.00, 0.24), 'psm': PSM_SPARSE},
+    {'field': 'purpose',     'label': 'purpose of project or activity',      'box': (0.00, 0.15, 0.56, 0.24), 'psm': PSM_BLOCK},
+    {'field': 'sponsor',     'label': 'sponsor',                             'box': (0.00, 0.21, 0.54, 0.38), 'psm': PSM_BLOCK},
+    {'field': 'operator',    'label': 'operator',                            'box': (0.46, 0.21, 1.00, 0.38), 'psm': PSM_BLOCK},
+    {'field': 'areas',       'label': 'target and control areas',            'box': (0.00, 0.35, 1.00, 0.45), 'psm': PSM_BLOCK},
+    {'field': 'description', 'label': 'description of weather modification', 'box': (0.00, 0.42, 1.00, 0.56), 'psm': PSM_COLUMN},
+]
+
+def crop_region(image, box):
+    width, height = image.size
+    x0, y0, x1, y1 = box
+    return image.crop((int(x0 * width), int(y0 * height), int(x1 * width), int(y1 * height)))
+
+def ocr_region(image, region, lang='eng'):
+    text = pytesseract.image_to_string(crop_region(image, region['box']), lang=lang, config=f"--psm {region['psm']}")
+    return normalize(text).strip()
+
+def label_score(label, text):
+    return 1 - best_edit_distance(label, text) / len(label)
+
+def strip_label(label, text):
+    """Drop the printed label (and a leading item number) from the region text when it was read cleanly."""
+    text = re.sub(r'^\W*\d*\W*', '', text.replace(label, '', 1)).strip()
+    return re.sub(r'^[\s:.\-]+', '', text)
+
+def ocr_form_regions(image, template=FORM_17_4_TEMPLATE, workers=4, min_fields=6, min_label_score=0.8, lang='eng'):
+    """OCR every template region of `image` in parallel. Returns {field: text}, or None when the page doesn't fit the template."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:  # tesseract runs as a subprocess, so threads overlap fully
+        texts = list(pool.map(lambda region: ocr_region(image, region, lang), template))
+    matched = sum(label_score(region['label'], text) >= min_label_score for region, text in zip(template, texts))
+    if matched < min_fields:
+        print(f"Region OCR: {matched} of {len(template)} template labels found; falling back to full-page OCR.")
+        return None
+    return {region['field']: strip_label(region['label'], text) for region, text in zip(template, texts)}
+
+def format_field_map(fields, template=FORM_17_4_TEMPLATE):
+    """One labeled line per region, in form order."""
+    return '\n'.join(f"{region['label'].upper()}: {fields.get(region['field'], '')}" for region in template)
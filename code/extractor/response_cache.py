@@ -0,0 +1,128 @@
+# === LLM RESPONSE CACHE ===
+# Persistent cache of OpenAI chat completions, so re-running golden-set evals or resuming after a
+# clean-dataset.py tweak doesn't pay for requests whose inputs haven't changed.
+#
+# The key is sha256 over (model, system prompt digest, document text digest, request parameters);
+# any change to the model, prompt, extracted text or parameters is a miss. Each row keeps the raw
+# completion text and the token usage reported by the API. Entries older than ttl_seconds are
+# treated as misses, and the least recently used rows are evicted once the stored text grows past
+# max_bytes. SQLite (WAL mode) lets threads and concurrent runs share one file.
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+def digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    def __init__(self, db_path, ttl_seconds=None, max_bytes=200 * 1024 * 1024):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_digest TEXT NOT NULL,
+                text_digest TEXT NOT NULL,
+                params TEXT NOT NULL,
+                response_text TEXT NOT NULL,
+                usage TEXT,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    def key_for(self, model, prompt, text, params=None):
+        parts = [model, digest(prompt), digest(text), json.dumps(params or {}, sort_keys=True)]
+        return digest('\n'.join(parts))
+
+    def get(self, key):
+        """Return {'response_text', 'usage'} for a live entry, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response_text, usage, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.ttl_seconds and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            usage = json.loads(row[1]) if row[1] else {}
+            self.tokens_saved += usage.get('total_tokens', 0)
+            return {'response_text': row[0], 'usage': usage}
+
+    def put(self, key, model, prompt, text, response_text, usage=None, params=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, digest(prompt), digest(text), json.dumps(params or {}, sort_keys=True),
+                 response_text, json.dumps(usage) if usage else None, len(response_text.encode('utf-8')), now, now)
+            )
+            self._conn.commit()
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            self.evict()
+
+    def evict(self, target_bytes=None):
+        """Drop expired rows, then least recently used rows until under target_bytes (default 90% of max_bytes)."""
+        if target_bytes is None:
+            target_bytes = int(self.max_bytes * 0.9)
+        with self._lock:
+            removed = 0
+            if self.ttl_seconds:
+                removed += self._conn.execute(
+                    "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,)
+                ).rowcount
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > target_bytes:
+                doomed = []
+                for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                    if total <= target_bytes:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                removed += len(doomed)
+            self._conn.commit()
+        if removed:
+            print(f"Response cache: evicted {removed} entries from {self.db_path}")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'tokens_saved': self.tokens_saved,
+            'entries': entries,
+            'bytes': size,
+        }
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        return (f"response cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate), "
+                f"{self.tokens_saved} tokens served from cache")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,103 @@
+# === PDF SCAN METRICS CACHE ===
+# Per-file text-layer metrics written by file-helpers/count-scanned-files.py. Entries live in SQLite (WAL),
+# keyed by the PDF's real path and checked against its size and mtime: a file that changed since it was
+# scanned is a miss, so rescanning a grown corpus only opens the new (or replaced) files. Each entry holds
+# the scanner's multi-page statistics and the first page's triage metrics and route (extractor/triage.py),
+# so triage_pdf can route a file the scanner has already seen without opening it.
+# The connection is opened lazily in each process, so a ScanCache can be handed to worker processes.
+# Without a database file (db_path None or not created yet) every lookup is a miss.
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Bump when the stored metrics change; older entries are then misses
+SCAN_VERSION = 2
+
+def file_key(path):
+    """(real path, size, mtime_ns) identifying the current contents of a file."""
+    stat = os.stat(path)
+    return os.path.realpath(path), stat.st_size, stat.st_mtime_ns
+
+class ScanCache:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'db_path': self.db_path, 'hits': 0, 'misses': 0}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, _conn=None, _lock=threading.Lock())
+
+    def _connection(self):
+        # caller holds self._lock
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS scans (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    version INTEGER NOT NULL,
+                    sample_pages INTEGER NOT NULL,
+                    route TEXT NOT NULL,
+                    first_page TEXT NOT NULL,
+                    stats TEXT NOT NULL,
+                    scanned_at REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, path, sample_pages=None):
+        """The entry for path if the file hasn't changed since it was scanned, else None:
+        {'route', 'first_page': triage metrics, 'stats': scanner statistics, 'sample_pages'}.
+        sample_pages (0 = every page) also has to match when given; triage only needs the first page."""
+        if not self.db_path or not os.path.exists(self.db_path):
+            return None
+        try:
+            real_path, size, mtime_ns = file_key(path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT size, mtime_ns, version, sample_pages, route, first_page, stats FROM scans WHERE path = ?", (real_path,)
+            ).fetchone()
+        if not row or row[:3] != (size, mtime_ns, SCAN_VERSION) or (sample_pages is not None and row[3] != sample_pages):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {'route': row[4], 'first_page': json.loads(row[5]), 'stats': json.loads(row[6]), 'sample_pages': row[3]}
+
+    def put_many(self, entries):
+        """entries: (path, size, mtime_ns, sample_pages, route, first_page, stats) tuples, as the scanner measured them."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(os.path.realpath(path), size, mtime_ns, SCAN_VERSION, sample_pages, route, json.dumps(first_page), json.dumps(stats), now)
+                 for path, size, mtime_ns, sample_pages, route, first_page, stats in entries]
+            )
+            conn.commit()
+
+    def forget_missing(self, directory):
+        """Drop entries for files under directory that no longer exist; returns how many were dropped."""
+        prefix = os.path.join(os.path.realpath(directory), '')
+        with self._lock:
+            conn = self._connection()
+            paths = [path for (path,) in conn.execute("SELECT path FROM scans WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))]
+            gone = [(path,) for path in paths if not os.path.exists(path)]
+            conn.executemany("DELETE FROM scans WHERE path = ?", gone)
+            conn.commit()
+        return len(gone)
+
+    def summary(self):
+        return f"Scan metrics cache: {self.hits} hits, {self.misses} misses ({self.db_path})"
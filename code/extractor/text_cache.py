@@ -0,0 +1,120 @@
+# === EXTRACTED TEXT CACHE ===
+# On-disk cache for extract_pdf_text results, so re-running with a new model or prompt doesn't repeat
+# PyMuPDF / tesseract / LLM Whisperer work on PDFs that haven't changed.
+#
+# Entries are content-addressed: the key is sha256(PDF bytes + extractor settings), so renaming a file
+# still hits and changing a threshold or the key phrase list misses. Each entry is one JSON file,
+# sharded by the first two hex digits of the key:
+#   <cache_dir>/ab/abcdef....json -> {'method', 'pdf_text', 'timings', 'source', 'created'}
+# Hits touch the file's mtime, and eviction removes least recently used entries once the cache
+# grows past max_bytes.
+import hashlib
+import json
+import os
+import time
+
+class TextCache:
+    def __init__(self, cache_dir, settings, max_bytes=500 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.settings_digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # total bytes on disk, computed on first put
+
+    def key_for(self, file_path):
+        h = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        h.update(self.settings_digest.encode('ascii'))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        # lookups may run in worker processes, so hit/miss counts are kept by the caller via record()
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return entry
+
+    def record(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def put(self, key, method, pdf_text, timings, source=''):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            'method': method,
+            'pdf_text': pdf_text,
+            'timings': timings,
+            'source': source,
+            'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)  # atomic, so concurrent workers never see half-written entries
+
+        if self._size is None:
+            self._size = self.size_on_disk()
+        else:
+            self._size += os.path.getsize(path)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.endswith('.json'):
+                    path = os.path.join(shard_dir, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue  # evicted by another worker
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def size_on_disk(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, target_bytes=None):
+        """Remove least recently used entries until the cache is under target_bytes (default 90% of max_bytes)."""
+        if target_bytes is None:
+            target_bytes = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._size = total
+        if removed:
+            print(f"Text cache: evicted {removed} entries ({total / 1024 / 1024:.1f} MB left in {self.cache_dir})")
+        return removed
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0
+        return f"text cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate)"
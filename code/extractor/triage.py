@@ -0,0 +1,130 @@
+# === FIRST-PAGE TRIAGE ===
+# Decides where each PDF enters the extraction waterfall (pymu -> ocr -> llm-whisper) from a quick look at
+# the first page's native text layer, using the same scan heuristics as analyze_pdf in
+# file-helpers/count-scanned-files.py:
+#   digital : a usable text layer          -> start at PyMuPDF
+#   scan    : no / garbled text layer      -> skip PyMuPDF, start at OCR
+# TriageStats records, per route, how often each stage was tried and how often it won. Once a stage has
+# enough samples and almost never wins for a route (e.g. tesseract on poor scans), start_stages() moves
+# that route's starting point past it, so known-bad stages stop costing time.
+# Files already measured by count-scanned-files.py are routed from its cache (extractor/scan_cache.py)
+# without being opened.
+import json
+import os
+import re
+
+import pymupdf
+
+WATERFALL = ['pymu', 'ocr', 'llm-whisper']
+DEFAULT_START = {'digital': 'pymu', 'scan': 'ocr'}
+METHOD_STAGES = {'ocr-regions': 'ocr'}  # extraction methods that are a variant of a waterfall stage
+
+# Shared with analyze_pdf in file-helpers/count-scanned-files.py, so a page gets the same ratios on both paths
+ALPHA_CHARS = re.compile(r"[a-zA-Z]")
+GARBLE_CHARS = re.compile(r"[^\x20-\x7E\n\r\t]")  # non-ASCII / control characters; line breaks and tabs aren't garble
+WORDS = re.compile(r'\w+')
+
+def text_metrics(text):
+    chars = len(text)
+    alpha = len(ALPHA_CHARS.findall(text))
+    weird = len(GARBLE_CHARS.findall(text))
+    words = WORDS.findall(text)
+    short_words = [w for w in words if len(w) <= 2]
+    lines = text.splitlines()
+    return {
+        'chars': chars,
+        'alpha': alpha,
+        'alpha_ratio': alpha / chars if chars else 0,
+        'garble_ratio': weird / chars if chars else 0,
+        'junk_word_ratio': len(short_words) / len(words) if words else 0,
+        'repeat_ratio': (len(lines) - len(set(lines))) / len(lines) if lines else 0,
+    }
+
+def looks_scanned(metrics):
+    return (
+        metrics['chars'] < 200
+        or metrics['alpha'] < 50
+        or metrics['alpha_ratio'] < 0.2
+        or metrics['garble_ratio'] > 0.05
+        or metrics['junk_word_ratio'] > 0.4
+        or metrics['repeat_ratio'] > 0.25
+    )
+
+def triage_text(text):
+    """Route and metrics for a first page's native text."""
+    metrics = text_metrics(text)
+    return {'route': 'scan' if looks_scanned(metrics) else 'digital', 'metrics': metrics}
+
+def triage_pdf(file_path, scan_cache=None):
+    """Classify a PDF from its first page. Returns {'route': 'digital' | 'scan', 'metrics': {...}}.
+    With a ScanCache, a file scanned since it last changed isn't opened."""
+    entry = scan_cache.get(file_path) if scan_cache else None
+    if entry:
+        return {'route': entry['route'], 'metrics': entry['first_page'], 'cached': True}
+    try:
+        with pymupdf.open(file_path) as doc:
+            text = doc[0].get_text() if len(doc) else ''
+    except Exception as e:
+        print(f"Triage failed to read {file_path}: {e}")
+        text = ''
+    return triage_text(text)
+
+class TriageStats:
+    def __init__(self, stats_file=None):
+        self.routes = {}  # route -> {'files': n, 'attempts': {stage: n}, 'wins': {stage: n}}
+        self.load(stats_file)
+
+    def load(self, stats_file):
+        """Continue from the counts saved by earlier runs (if stats_file exists); save() writes back to it."""
+        self.stats_file = stats_file
+        if stats_file and os.path.exists(stats_file):
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                self.routes = json.load(f)
+
+    def record(self, route, attempted, winner):
+        """attempted: the stages that ran for this file, in order; winner: the stage whose text was used (or None)."""
+        entry = self.routes.setdefault(route, {'files': 0, 'attempts': {}, 'wins': {}})
+        entry['files'] += 1
+        for stage in attempted:
+            entry['attempts'][stage] = entry['attempts'].get(stage, 0) + 1
+        if winner:
+            winner = METHOD_STAGES.get(winner, winner)
+            entry['wins'][winner] = entry['wins'].get(winner, 0) + 1
+
+    def hit_rate(self, route, stage):
+        entry = self.routes.get(route, {})
+        attempts = entry.get('attempts', {}).get(stage, 0)
+        return entry.get('wins', {}).get(stage, 0) / attempts if attempts else None
+
+    def start_stages(self, min_samples=20, min_hit_rate=0.1):
+        """Starting stage per route: the default, moved past any stage that has at least min_samples
+        attempts for the route and wins less than min_hit_rate of them. A stage that has never been
+        attempted is kept, whatever min_samples is. LLM Whisperer is never skipped."""
+        starts = {}
+        for route, default in DEFAULT_START.items():
+            index = WATERFALL.index(default)
+            while index < len(WATERFALL) - 1:
+                stage = WATERFALL[index]
+                attempts = self.routes.get(route, {}).get('attempts', {}).get(stage, 0)
+                if attempts == 0 or attempts < min_samples or self.hit_rate(route, stage) >= min_hit_rate:
+                    break
+                index += 1
+            starts[route] = WATERFALL[index]
+        return starts
+
+    def save(self):
+        if not self.stats_file:
+            return
+        os.makedirs(os.path.dirname(self.stats_file) or '.', exist_ok=True)
+        with open(self.stats_file, 'w', encoding='utf-8') as f:
+            json.dump(self.routes, f, indent=2)
+
+    def summary(self):
+        lines = ["Triage hit rates (wins / attempts per stage):"]
+        for route, entry in sorted(self.routes.items()):
+            rates = ', '.join(
+                f"{stage} {entry['wins'].get(stage, 0)}/{entry['attempts'][stage]}"
+                for stage in WATERFALL if stage in entry['attempts']
+            )
+            lines.append(f"  - {route:<8} ({entry['files']} files): {rates}")
+        return '\n'.join(lines)
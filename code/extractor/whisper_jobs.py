@@ -0,0 +1,201 @@
+# === LLM WHISPERER JOB MANAGER ===
+# Whisperer jobs run asynchronously on the server: POST /whisper answers with a whisper_hash straight away
+# and the text is ready seconds to minutes later. Rather than holding a thread (or coroutine) per file in
+# a wait-and-poll loop, the manager uploads a file as soon as the free extractors have failed on it and
+# hands back a Future. One poller thread checks every pending job's status through a small thread pool,
+# each job on its own backoff (poll_interval growing x1.5 up to max_poll_interval), and resolves the
+# Future with the retrieved text (None on failure) as each job finishes, in whatever order they finish.
+#
+# Job handles (file -> whisper_hash) are written to a JSON file as soon as a job is accepted, like
+# batch-state.json: a run that dies with jobs in flight picks them up on restart and polls them instead
+# of paying for them again. A resumed job the server no longer knows about is resubmitted once.
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+def load_jobs(jobs_file):
+    if jobs_file and os.path.exists(jobs_file):
+        with open(jobs_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def save_jobs(jobs_file, jobs):
+    os.makedirs(os.path.dirname(jobs_file) or '.', exist_ok=True)
+    tmp_path = f"{jobs_file}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(jobs, f, indent=2)
+    os.replace(tmp_path, jobs_file)
+
+class WhisperJobManager:
+    """Submits Whisperer jobs without waiting and polls them all from one thread; see the module comment."""
+
+    def __init__(self, provider, client=None, jobs_file=None, poll_interval=5.0, max_poll_interval=30.0, wait_timeout=600.0, workers=8):
+        self.provider = provider  # rate limiter / breaker / retries for every Whisperer call
+        self.client = client
+        self.jobs_file = jobs_file
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.wait_timeout = wait_timeout
+        self.workers = workers
+        self.jobs = {}       # file_path -> {'whisper_hash', 'submitted_at'}; persisted to jobs_file
+        self.futures = {}    # file_path -> Future resolved with the text or None (one job per file per run)
+        self.schedule = {}   # file_path -> (monotonic time of next status check, current interval); absent while a check runs
+        self.resumed = set() # jobs loaded from jobs_file that haven't been resubmitted
+        self.counts = {'submitted': 0, 'resumed': 0, 'finished': 0, 'failed': 0, 'polls': 0}
+        self.job_seconds = 0.0
+        self.metrics = None  # extractor.metrics.Metrics recording a 'whisper-submit' span per upload, if set
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pool = None
+        self._poller = None
+        self._closed = False
+
+    def load(self):
+        """Resume polling the jobs an earlier run left in jobs_file."""
+        jobs = load_jobs(self.jobs_file)
+        with self._lock:
+            for file_path, job in jobs.items():
+                if file_path in self.futures:
+                    continue
+                self.jobs[file_path] = job
+                self.futures[file_path] = Future()
+                self.schedule[file_path] = (time.monotonic(), self.poll_interval)
+                self.resumed.add(file_path)
+                self.counts['resumed'] += 1
+        if jobs:
+            print(f"LLM Whisperer: resuming {len(jobs)} jobs submitted by an earlier run")
+            self._start()
+
+    def submit(self, file_path):
+        """Start a job for file_path (or return the one already running) without waiting; returns a Future."""
+        with self._lock:
+            future = self.futures.get(file_path)
+            if future:
+                return future
+            future = self.futures[file_path] = Future()
+        self._start()
+        self._pool.submit(self._submit_job, file_path)
+        return future
+
+    def _start(self):
+        with self._lock:
+            if self._poller:
+                return
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='whisper-jobs')
+            self._poller = threading.Thread(target=self._run, name='whisper-poller', daemon=True)
+            self._poller.start()
+
+    def _submit_job(self, file_path):
+        started, stats = time.time(), {}
+        try:
+            job = self.provider.call(
+                lambda: self.client.whisper(
+                    file_path=file_path,
+                    pages_to_extract="1", # only process first page
+                    lang='eng',
+                    wait_for_completion=False
+                ),
+                label=os.path.basename(file_path),
+                stats=stats
+            )
+        except Exception as e:
+            self._record_submit(file_path, started, stats, e)
+            return self._finish(file_path, None, f"submission failed: {e}")
+        self._record_submit(file_path, started, stats)
+        with self._lock:
+            self.jobs[file_path] = {'whisper_hash': job['whisper_hash'], 'submitted_at': time.time()}
+            self.schedule[file_path] = (time.monotonic() + self.poll_interval, self.poll_interval)
+            self.counts['submitted'] += 1
+            self._save()
+        self._wake.set()
+
+    def _record_submit(self, file_path, started, stats, error=None):
+        if self.metrics:
+            self.metrics.record(
+                os.path.basename(file_path), 'whisper-submit', time.time() - started, started,
+                status='error' if error else 'ok', error=error,
+                bytes=os.path.getsize(file_path) if os.path.exists(file_path) else None,
+                retries=stats.get('attempts', 1) - 1
+            )
+
+    def _run(self):
+        while not self._closed:
+            now = time.monotonic()
+            with self._lock:
+                due = [(f, interval) for f, (at, interval) in self.schedule.items() if at <= now]
+                for file_path, _ in due:
+                    del self.schedule[file_path]
+                next_at = min((at for at, _ in self.schedule.values()), default=None)
+            try:
+                for file_path, interval in due:
+                    self._pool.submit(self._poll, file_path, interval)
+            except RuntimeError:
+                return  # close() shut the pool down
+            self._wake.wait(None if next_at is None else max(next_at - time.monotonic(), 0))
+            self._wake.clear()
+
+    def _poll(self, file_path, interval):
+        label = os.path.basename(file_path)
+        with self._lock:
+            job = dict(self.jobs[file_path])
+            self.counts['polls'] += 1
+        try:
+            status = self.provider.call(lambda: self.client.whisper_status(whisper_hash=job['whisper_hash']), label=label)
+            if status['status'] == 'processed':
+                result = self.provider.call(lambda: self.client.whisper_retrieve(whisper_hash=job['whisper_hash']), label=label)
+                return self._finish(file_path, result['extraction'].get('result_text', '[No result_text found]'))
+            if 'error' in status['status']:
+                return self._failed(file_path, f"job {job['whisper_hash']} failed: {status.get('message', status['status'])}")
+        except Exception as e:
+            return self._failed(file_path, e)
+        if time.time() - job['submitted_at'] > self.wait_timeout:
+            return self._failed(file_path, f"job {job['whisper_hash']} not finished after {self.wait_timeout:.0f}s")
+        interval = min(interval * 1.5, self.max_poll_interval)
+        with self._lock:
+            self.schedule[file_path] = (time.monotonic() + interval, interval)
+        self._wake.set()
+
+    def _failed(self, file_path, reason):
+        with self._lock:
+            resubmit = file_path in self.resumed
+            self.resumed.discard(file_path)
+        if resubmit:
+            # the hash came from an earlier run and may have expired on the server
+            print(f"LLM Whisperer job for {os.path.basename(file_path)} from an earlier run is unusable ({reason}); resubmitting.")
+            return self._submit_job(file_path)
+        self._finish(file_path, None, reason)
+
+    def _finish(self, file_path, text, reason=None):
+        with self._lock:
+            job = self.jobs.pop(file_path, None)
+            self.schedule.pop(file_path, None)
+            self.resumed.discard(file_path)
+            self.counts['failed' if text is None else 'finished'] += 1
+            if job and text is not None:
+                self.job_seconds += time.time() - job['submitted_at']
+            if job:
+                self._save()
+            future = self.futures[file_path]
+        if reason:
+            print(f"LLM Whisperer failed for {os.path.basename(file_path)}: {reason}")
+        future.set_result(text)
+
+    def _save(self):
+        # caller holds self._lock
+        if self.jobs_file:
+            save_jobs(self.jobs_file, self.jobs)
+
+    def close(self):
+        """Stop polling. Jobs still pending stay in jobs_file for the next run."""
+        self._closed = True
+        self._wake.set()
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self):
+        c = self.counts
+        average = f", {self.job_seconds / c['finished']:.1f}s average submission to result" if c['finished'] else ''
+        return (f"LLM Whisperer jobs: {c['submitted']} submitted, {c['resumed']} resumed from an earlier run, "
+                f"{c['finished']} finished, {c['failed']} failed, {len(self.jobs)} still pending, {c['polls']} status checks{average}")
@@ -1,12 +1,28 @@
 import os
-import re
 import csv
-import fitz  # PyMuPDF
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pymupdf
 
-def analyze_pdf(filepath):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from extractor.scan_cache import ScanCache, file_key
+from extractor.triage import ALPHA_CHARS, GARBLE_CHARS, WORDS, triage_text
+
+# Per-file metrics are cached in SQLite keyed by path, size and mtime (see extractor/scan_cache.py), so a
+# rescan only opens new or changed files. The extractor's triage reads the same cache to route files
+# without opening them.
+# Usage (from code/): python ./file-helpers/count-scanned-files.py [--pages 3] [--workers 8]
+
+FIELDNAMES = ['filename', 'status', 'avg_chars', 'avg_alpha', 'alpha_ratio', 'garble_ratio', 'junk_word_ratio', 'repeat_ratio', 'pages']
+
+def analyze_pdf(filepath, max_pages=None):
+    """Scan heuristics over the first max_pages pages (all pages when None), plus the first page's triage route."""
     try:
-        doc = fitz.open(filepath)
+        doc = pymupdf.open(filepath)
         num_pages = len(doc)
+        sampled_pages = min(num_pages, max_pages) if max_pages else num_pages
+        first_page_text = ''
         total_chars = 0
         total_alpha_chars = 0
         total_weird_chars = 0
@@ -15,18 +31,20 @@ def analyze_pdf(filepath):
         total_lines = 0
         total_repeat_lines = 0
 
-        for page in doc:
-            text = page.get_text()
+        for page_number in range(sampled_pages):
+            text = doc[page_number].get_text()
+            if page_number == 0:
+                first_page_text = text
             if not text.strip():
                 continue
 
             total_chars += len(text)
-            total_alpha_chars += len(re.findall(r"[a-zA-Z]", text))
-            total_weird_chars += len(re.findall(r"[^\x20-\x7E]", text))  # non-ASCII
+            total_alpha_chars += len(ALPHA_CHARS.findall(text))
+            total_weird_chars += len(GARBLE_CHARS.findall(text))
 
-            words = re.findall(r'\w+', text)
+            words = WORDS.findall(text)
             total_words += len(words)
-            total_short_words += len([w for w in words if len(w) <= 2])
+            total_short_words += sum(1 for w in words if len(w) <= 2)
 
             lines = text.splitlines()
             total_lines += len(lines)
@@ -35,8 +53,8 @@ def analyze_pdf(filepath):
         doc.close()
 
         # Avoid divide-by-zero
-        avg_chars_per_page = total_chars / num_pages if num_pages > 0 else 0
-        avg_alpha_per_page = total_alpha_chars / num_pages if num_pages > 0 else 0
+        avg_chars_per_page = total_chars / sampled_pages if sampled_pages > 0 else 0
+        avg_alpha_per_page = total_alpha_chars / sampled_pages if sampled_pages > 0 else 0
         alpha_ratio = total_alpha_chars / total_chars if total_chars > 0 else 0
         garble_ratio = total_weird_chars / total_chars if total_chars > 0 else 0
         junk_word_ratio = total_short_words / total_words if total_words > 0 else 0
@@ -60,7 +78,9 @@ def analyze_pdf(filepath):
             'garble_ratio': garble_ratio,
             'junk_word_ratio': junk_word_ratio,
             'repeat_ratio': repeat_ratio,
-            'pages': num_pages
+            'pages': num_pages,
+            'pages_sampled': sampled_pages,
+            'triage': triage_text(first_page_text)
         }
 
     except Exception as e:
@@ -73,23 +93,55 @@ def analyze_pdf(filepath):
             'garble_ratio': 1,
             'junk_word_ratio': 1,
             'repeat_ratio': 1,
-            'pages': 0
+            'pages': 0,
+            'pages_sampled': 0,
+            'triage': triage_text('')
         }
 
-def scan_check(directory, output_csv="scan_results.csv"):
+# Runs in a worker process. The file's size and mtime are read before it is opened, so a file replaced
+# during the scan doesn't match its cache entry and is scanned again next time.
+def scan_file(job):
+    path, max_pages = job
+    _, size, mtime_ns = file_key(path)
+    return size, mtime_ns, analyze_pdf(path, max_pages)
+
+def scan_check(directory, output_csv="scan_results.csv", workers=None, max_pages=None, cache=None):
+    pdfs = sorted(f for f in os.listdir(directory) if f.lower().endswith(".pdf"))
+    sample_pages = max_pages or 0  # cache entries are only reused for the same sample size
+
+    results = {}
+    for filename in pdfs:
+        entry = cache.get(os.path.join(directory, filename), sample_pages) if cache else None
+        if entry:
+            results[filename] = entry['stats']
+    to_scan = [f for f in pdfs if f not in results]
+    print(f"\nChecking PDFs in directory: {directory} ({len(pdfs)} files, {len(results)} unchanged since the last scan)\n")
+
+    if to_scan:
+        jobs = [(os.path.join(directory, f), max_pages) for f in to_scan]
+        if workers == 1 or len(jobs) == 1:
+            scanned = list(map(scan_file, jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                scanned = list(pool.map(scan_file, jobs, chunksize=4))
+        entries = []
+        for (path, _), filename, (size, mtime_ns, stats) in zip(jobs, to_scan, scanned):
+            triage = stats.pop('triage')
+            results[filename] = stats
+            entries.append((path, size, mtime_ns, sample_pages, triage['route'], triage['metrics'], stats))
+        if cache:
+            cache.put_many(entries)
+    if cache:
+        removed = cache.forget_missing(directory)
+        if removed:
+            print(f"Dropped {removed} cached files no longer in {directory}")
+
     summary = []
     total_files = 0
     scan_count = 0
-
-    print(f"\nChecking PDFs in directory: {directory}\n")
     print(f"{'Filename':<50} | {'Status':<6} | {'Chars':>6} | {'Alpha':>6} | {'Alpha%':>6} | {'Garble':>6} | {'Junk':>6} | {'Repeat':>6} | {'Pg':>3}")
-
-    for filename in sorted(os.listdir(directory)):
-        if not filename.lower().endswith(".pdf"):
-            continue
-        full_path = os.path.join(directory, filename)
-        stats = analyze_pdf(full_path)
-
+    for filename in pdfs:
+        stats = results[filename]
         status = "SCAN" if stats['is_scan'] else "OK"
         print(f"{filename[:50]:<50} | {status:<6} | {stats['avg_chars']:6.1f} | {stats['avg_alpha']:6.1f} | {stats['alpha_ratio']:6.2f} | {stats['garble_ratio']:6.2f} | {stats['junk_word_ratio']:6.2f} | {stats['repeat_ratio']:6.2f} | {stats['pages']:>3}")
 
@@ -113,14 +165,23 @@ def scan_check(directory, output_csv="scan_results.csv"):
     print(f"Total PDF files:    {total_files}")
     print(f"Likely scans:       {scan_count}")
     print(f"Likely digital:     {total_files - scan_count}")
+    print(f"Scanned this run:   {len(to_scan)}" + (f" (first {max_pages} pages)" if max_pages else ''))
 
     # Save to CSV
     with open(output_csv, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=summary[0].keys())
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         writer.writeheader()
         writer.writerows(summary)
     print(f"\nResults saved to: {output_csv}")
 
-# Run it
-scan_check("../noaa-files")
-
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Flag PDFs that are likely scans (no usable text layer).")
+    parser.add_argument('directory', nargs='?', default='../noaa-files', help="directory of PDFs (default: ../noaa-files)")
+    parser.add_argument('--output', default='scan_results.csv', help="CSV of per-file results (default: scan_results.csv)")
+    parser.add_argument('--workers', type=int, default=None, help="processes opening PDFs (default: CPU count)")
+    parser.add_argument('--pages', type=int, default=None, help="only look at the first N pages of each PDF (default: all pages)")
+    parser.add_argument('--cache', default='../dataset/final/scan-metrics.sqlite',
+                        help="per-file metrics cache, also read by the extractor's triage (default: ../dataset/final/scan-metrics.sqlite)")
+    parser.add_argument('--no-cache', action='store_true', help="rescan every file and don't write the cache")
+    args = parser.parse_args()
+    scan_check(args.directory, args.output, args.workers, args.pages, None if args.no_cache else ScanCache(args.cache))
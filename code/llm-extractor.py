@@ -4,26 +4,118 @@ import random
 
 # File System
 import os
-import csv
 import time
 import sys
+import argparse
+import asyncio
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 
 # PDF to Text
 import pymupdf
 import pytesseract 
-from pdf2image import convert_from_path
 from unstract.llmwhisperer import LLMWhispererClientV2
 
 # OpenAI
-from openai import OpenAI, OpenAIError
+from openai import OpenAI, AsyncOpenAI
+
+# Staged pipeline
+from extractor.pipeline import run_pipeline
+
+# Rate limiting, retries and circuit breaking
+from extractor.rate_limit import (
+    CircuitBreaker,
+    Provider,
+    RateLimiter,
+    RetryableError,
+    RetryPolicy,
+    estimate_tokens,
+)
+
+# OpenAI Batch API
+from extractor.batch import (
+    build_batch_request,
+    iter_batch_results,
+    load_batch_requests,
+    load_batch_state,
+    save_batch_state,
+    submit_batch,
+    wait_for_batch,
+)
+
+# Model cascade (cheap model first, escalate documents that fail validation)
+from extractor.cascade import Cascade, UsageTracker, validate_fields
+
+# Non-blocking LLM Whisperer jobs (submit early, poll concurrently, resume after a restart)
+from extractor.whisper_jobs import WhisperJobManager
+
+# Multi-document packing
+from extractor.packing import pack_documents, packed_prompt, split_packed_response
+
+# Per-file job state (claims, stage progress, parsed rows); the output CSV is exported from it
+from extractor.job_store import JobStore
+
+# Typed Parquet copy of the output dataset
+from extractor.columnar import parquet_path, require_pyarrow, write_parquet_rows
+
+# Extracted text and LLM response caches
+from extractor.text_cache import TextCache
+from extractor.response_cache import ResponseCache
+
+# First-page triage (where each PDF enters the waterfall), and the per-file metrics of count-scanned-files.py
+from extractor.triage import WATERFALL, TriageStats, triage_pdf
+from extractor.scan_cache import ScanCache
+
+# First-page rasterization for OCR
+from extractor.rasterize import render_first_page
+
+# Template-driven region OCR for the Form 17-4 boxes
+from extractor.regions import FORM_17_4_TEMPLATE, format_field_map, ocr_form_regions
+
+# Token-budgeted compaction of the extracted text
+from extractor.compaction import Compactor
+
+# Per-file stage spans (JSONL), latency histograms and Prometheus text exposition
+from extractor.metrics import Metrics
+
+# OCR-tolerant key phrase matching
+from extractor.phrase_match import PhraseMatcher
 
 # Count PDF conversion usage
 from collections import Counter
 method_counter = Counter()
 
-# Form 17-4 Key Phrases. All must be present to proceed with PyMuPDF or pytesseract as the text extraction method. 
+# Shared limiter / breaker / retry policy per external API, configured from the command line in main()
+openai_provider = Provider('openai')
+whisper_provider = Provider('llm-whisper')
+
+# Pending Whisperer jobs and their poller; client, job file and poll settings are configured in main()
+whisper_jobs = WhisperJobManager(whisper_provider)
+
+# Per-route hit rates and the stage each triage route starts at (empty = no triage, always start at PyMuPDF); set in main()
+triage_stats = TriageStats()
+triage_start_stages = {}
+
+# Routes of files count-scanned-files.py has already measured, so triage doesn't reopen them; file set in main()
+scan_cache = ScanCache(None)
+
+# Tokens and time of live LLM calls per model, and the cascade settings / escalation counts; configured in main()
+usage_tracker = UsageTracker()
+cascade = Cascade()
+
+# Shrinks each document to its token budget before the LLM call (opt-in with --compaction); configured in main()
+compactor = Compactor()
+
+# Stage spans and latency histograms; output files configured in main()
+metrics = Metrics()
+
+# Completion budget added to the prompt estimate when reserving tokens-per-minute capacity (reasoning models think out loud)
+EXPECTED_COMPLETION_TOKENS = 2000
+
+# Form 17-4 Key Phrases. All must be present (allowing for OCR typos) to proceed with PyMuPDF or pytesseract as the text extraction method. 
 FORM_17_4_KEY_PHRASES = [
     "initial report on weather modification",
     "project or activity designation",
@@ -40,6 +132,60 @@ FORM_17_4_KEY_PHRASES = [
     "affiliation"
 ]
 
+# Mean per-phrase match score (1.0 = every phrase found verbatim) needed to accept PyMuPDF or OCR text.
+# Near-miss OCR output scores ~0.95; text from other documents scores ~0.5.
+MIN_PHRASE_CONFIDENCE = 0.9
+# Lowest score any single phrase may have: one typo in "sponsor" (0.86) passes, a missing phrase doesn't
+MIN_PHRASE_SCORE = 0.8
+FORM_17_4_MATCHER = PhraseMatcher(FORM_17_4_KEY_PHRASES, min_confidence=MIN_PHRASE_CONFIDENCE, min_phrase_score=MIN_PHRASE_SCORE)
+
+# Minimum first-page text length accepted from each extractor
+MIN_LOCAL_TEXT_CHARS = 1000
+MIN_WHISPER_TEXT_CHARS = 500
+
+# How page 1 is rasterized for tesseract: 'pymupdf' (in-process pixmap) or 'pdf2image' (poppler subprocess)
+OCR_RASTER_BACKEND = 'pymupdf'
+OCR_DPI = 200
+OCR_GRAYSCALE = True
+
+# OCR the Form 17-4 boxes separately (in parallel threads) and send the LLM a labeled field map instead of
+# the whole page. Pages that don't fit the template fall back to full-page OCR. The field map skips the length
+# and key phrase checks, so it stays off (--region-ocr) until it has been scored against the golden set.
+REGION_OCR = False
+REGION_OCR_WORKERS = 4
+
+# Everything that changes what extract_pdf_text returns for a given PDF. Hashed into the text cache key,
+# so bump 'version' whenever the waterfall logic itself changes.
+EXTRACTOR_SETTINGS = {
+    'version': 6,
+    'pages': '1',
+    'lang': 'eng',
+    'min_local_text_chars': MIN_LOCAL_TEXT_CHARS,
+    'min_whisper_text_chars': MIN_WHISPER_TEXT_CHARS,
+    'key_phrases': FORM_17_4_KEY_PHRASES,
+    'min_phrase_confidence': MIN_PHRASE_CONFIDENCE,
+    'min_phrase_score': MIN_PHRASE_SCORE,
+    'ocr_raster': {'backend': OCR_RASTER_BACKEND, 'dpi': OCR_DPI, 'grayscale': OCR_GRAYSCALE},
+    'region_ocr': FORM_17_4_TEMPLATE if REGION_OCR else None,
+}
+
+# Columns of the output CSV, in order
+FIELDNAMES = [
+    'filename',
+    'project',
+    'year',
+    'season',
+    'state',
+    'operator_affiliation',
+    'agent',
+    'apparatus',
+    'purpose',
+    'target_area',
+    'control_area',
+    'start_date',
+    'end_date'
+]
+
 def select_all_files(directory_path):
     all_files = [f for f in os.listdir(directory_path) if os.path.isfile(os.path.join(directory_path, f))]
     n = len(all_files)
@@ -48,26 +194,12 @@ def select_all_files(directory_path):
         print(f"{i}. {file}")
     return all_files
 
-def load_processed_files(checkpoint_file):
-    if os.path.exists(checkpoint_file):
-        with open(checkpoint_file, "r") as f:
-            return set(f.read().splitlines())
-    return set()
-
-def save_processed_file(checkpoint_file, file_name):
-    with open(checkpoint_file, "a") as f:
-        f.write(file_name + "\n")
-
-def save_to_csv(results, output_file, fieldnames):
-    file_exists = os.path.isfile(output_file)
-    with open(output_file, mode='a', newline='', encoding='utf-8') as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerows(results)
-
-def save_method_counts(counter, file_path):
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+# File the extraction method counts are appended to during and after a run; set from --method-counts-file in main()
+METHOD_COUNTS_FILE = '../dataset/final/pdf_method_counts.txt'
+
+def save_method_counts(counter, file_path=None):
+    file_path = file_path or METHOD_COUNTS_FILE
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
     with open(file_path, "a") as f:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         f.write(f"\n--- Method counts at {timestamp} ---\n")
@@ -75,69 +207,179 @@ def save_method_counts(counter, file_path):
             f.write(f"{method}: {count}\n")
     print(f"Method counts appended to {file_path}")
 
-def contains_all_phrases(text):
-    text_lower = text.lower()
-    missing_phrases = [phrase for phrase in FORM_17_4_KEY_PHRASES if phrase not in text_lower]
-    if missing_phrases:
-        print("Missing phrases:")
-        for phrase in missing_phrases:
-            print(f"  - {phrase}")
-        return False
-    return True
+# Returns the matcher result ({'scores', 'confidence', 'accepted'}) and prints any phrase that wasn't found verbatim.
+def match_key_phrases(text):
+    result = FORM_17_4_MATCHER.match(text)
+    inexact = {phrase: score for phrase, score in result['scores'].items() if score < 1}
+    if inexact:
+        print(f"Key phrase confidence {result['confidence']:.3f} ({'accepted' if result['accepted'] else 'rejected'}); inexact phrases:")
+        for phrase, score in inexact.items():
+            print(f"  - {phrase} ({score:.2f})")
+    return result
+
+# Try the two free extractors on the first page: (1) PyMuPDF (native text) --> (2) pytesseract (OCR, by template region first),
+# starting at `start` ('pymu', 'ocr' or 'llm-whisper' to skip both, as chosen by triage).
+# Returns (method, text, timings), with method and text None when neither produced a complete Form 17-4.
+# timings['spans'] holds a (stage, start, seconds, status, attributes) tuple per stage, recorded by complete_extraction.
+def extract_local_text(file_path, start='pymu', region_ocr=False):
+    timings = {}
+    spans = timings['spans'] = []
+    stages = WATERFALL[WATERFALL.index(start):]
+
+    def span(stage, started, error=None, **attrs):
+        spans.append((stage, started, round(time.time() - started, 4), 'error' if error else 'ok', dict(attrs, error=str(error) if error else None)))
 
-# Extract pdf text using three text extraction technologies via waterfall: (1) PyMuPDF (free, native text) --> (2) pytesseract (free, OCR) --> LLM Whisperer (paid, OCR+native)
-def extract_pdf_text(file_path, llm_whisper_client):
     # PyMuPDF
-    try:
-        doc = pymupdf.open(file_path)
-        text = doc[0].get_text().strip() # only process first page
-        # DEBUG TEXT LENGTH
-        print(len(text))
-        if len(text) > 1000 and contains_all_phrases(text):
-            method_counter['pymu'] += 1
-            return {'pdf_text': text}
-        else:
-            print('PyMuPDF Failed. Trying OCR.')
-    except Exception as e:
-        print(f"pymupdf extraction failed: {e}")
-
-    # OCR
-    try:
-        images = convert_from_path(file_path, first_page=1, last_page=1)
-        if images:
-            text = pytesseract.image_to_string(images[0], lang='eng').strip() # only process first page
+    if 'pymu' in stages:
+        started = time.time()
+        stage_started, stage = started, 'open'
+        try:
+            doc = pymupdf.open(file_path)
+            span('open', started, bytes=os.path.getsize(file_path), pages=doc.page_count)
+            stage_started, stage = time.time(), 'native-text'
+            text = doc[0].get_text().strip() # only process first page
+            timings['pymu'] = round(time.time() - started, 3)
             # DEBUG TEXT LENGTH
             print(len(text))
-            if len(text) > 1000 and contains_all_phrases(text):
-                method_counter['ocr'] += 1
-                return {'pdf_text': text}
+            accepted = len(text) > MIN_LOCAL_TEXT_CHARS and match_key_phrases(text)['accepted']
+            span('native-text', stage_started, method='pymu', chars=len(text), accepted=accepted)
+            if accepted:
+                return 'pymu', text, timings
             else:
-                print('OCR Failed. Trying LLM Whisperer.')
-    except Exception as e:
-        print(f"OCR failed: {e}")
+                print('PyMuPDF Failed. Trying OCR.')
+        except Exception as e:
+            timings['pymu'] = round(time.time() - started, 3)
+            span(stage, stage_started, e, method='pymu')
+            print(f"pymupdf extraction failed: {e}")
 
-    # LLM Whisperer
-    try:
-        result = llm_whisper_client.whisper(
-            file_path=file_path,
-            pages_to_extract="1", # only process first page
-            lang='eng',
-            wait_for_completion=True,
-            wait_timeout=200
-        )
-        text = result['extraction'].get('result_text', '[No result_text found]')
-        # DEBUG TEXT LENGTH
-        print(len(text))
-        if len(text) > 500:
-            method_counter['llm-whisper'] += 1
-            return {'pdf_text': text}
-        else:
-            print('LLM Whisperer Failed. [No content extracted].')
-            method_counter['failed'] += 1
-    except Exception as e:
-        print(f"LLM Whisperer failed: {e}")
+    # OCR
+    if 'ocr' in stages:
+        started = time.time()
+        stage_started, stage = started, 'rasterize'
+        try:
+            image = render_first_page(file_path, dpi=OCR_DPI, grayscale=OCR_GRAYSCALE, backend=OCR_RASTER_BACKEND) # only process first page
+            span('rasterize', started, dpi=OCR_DPI, backend=OCR_RASTER_BACKEND, rendered=image is not None)
+            stage_started, stage = time.time(), 'ocr'
+            if image is not None and region_ocr:
+                fields = ocr_form_regions(image, workers=REGION_OCR_WORKERS, lang='eng')
+                if fields:
+                    timings['ocr'] = round(time.time() - started, 3)
+                    span('ocr', stage_started, method='ocr-regions', fields=len(fields), accepted=True)
+                    return 'ocr-regions', format_field_map(fields), timings
+            if image is not None:
+                text = pytesseract.image_to_string(image, lang='eng').strip()
+                timings['ocr'] = round(time.time() - started, 3)
+                # DEBUG TEXT LENGTH
+                print(len(text))
+                accepted = len(text) > MIN_LOCAL_TEXT_CHARS and match_key_phrases(text)['accepted']
+                span('ocr', stage_started, method='ocr', chars=len(text), accepted=accepted)
+                if accepted:
+                    return 'ocr', text, timings
+                else:
+                    print('OCR Failed. Trying LLM Whisperer.')
+        except Exception as e:
+            timings['ocr'] = round(time.time() - started, 3)
+            span(stage, stage_started, e, method='ocr')
+            print(f"OCR failed: {e}")
+
+    return None, None, timings
+
+# Text cache lookup, then triage and the free extractors on a miss. Runs inside a worker process in --async and --staged modes.
+# start_stages maps a triage route to the waterfall stage it starts at; None skips triage. Settings the workers need
+# (start_stages, region_ocr) are passed in rather than read from globals set in main(), which a spawned process wouldn't see.
+def extract_local_text_cached(file_path, text_cache=None, start_stages=None, scan_cache=None, region_ocr=False):
+    started = time.time()
+    key = text_cache.key_for(file_path) if text_cache else None
+    entry = text_cache.get(key) if key else None
+    if entry:
+        print(f"Text cache hit ({entry['method']}).")
+        timings = dict(entry['timings'], spans=[('text-cache', started, round(time.time() - started, 4), 'ok', {'method': entry['method']})])
+        return {'pdf_text': entry['pdf_text'], 'method': entry['method'], 'timings': timings, 'key': key, 'cached': True, 'route': None}
+    route, start = None, 'pymu'
+    if start_stages:
+        started = time.time()
+        triage = triage_pdf(file_path, scan_cache)
+        route = triage['route']
+        start = start_stages.get(route, 'pymu')
+        triage_seconds = round(time.time() - started, 4)
+        print(f"Triage: {route} (starting at {start}, {triage_seconds:.3f}s{', from the scan cache' if triage.get('cached') else ''})")
+    method, text, timings = extract_local_text(file_path, start, region_ocr)
+    if route:
+        timings['spans'].insert(0, ('triage', started, triage_seconds, 'ok', {'route': route, 'start_stage': start, 'cached': triage.get('cached', False)}))
+    return {'pdf_text': text, 'method': method, 'timings': timings, 'key': key, 'cached': False, 'route': route}
+
+def extract_local_text_in(input_directory, text_cache, start_stages, scan_cache, region_ocr, file):
+    return extract_local_text_cached(os.path.join(input_directory, file), text_cache, start_stages, scan_cache, region_ocr)
+
+# Record the worker's stage spans, count the method that won the waterfall, record the triage outcome and
+# cache a freshly extracted text. Raises if every method failed.
+def complete_extraction(file_path, text_data, text_cache=None):
+    metrics.record_spans(os.path.basename(file_path), text_data['timings'].pop('spans', []))
+    if text_cache:
+        text_cache.record(text_data['cached'])
+    if text_data.get('route'):
+        triage_stats.record(text_data['route'], [stage for stage in WATERFALL if stage in text_data['timings']], text_data['method'])
+    if not text_data['method']:
+        method_counter['failed'] += 1
+        raise RuntimeError("All PDF text extraction methods failed (PyMuPDF, OCR, LLM Whisperer)")
+    method_counter[text_data['method']] += 1
+    if text_cache and not text_data['cached']:
+        text_cache.put(text_data['key'], text_data['method'], text_data['pdf_text'], text_data['timings'], source=os.path.basename(file_path))
+    return text_data
+
+# LLM Whisperer (paid, OCR+native). Submits the job (or picks up the one already submitted for this file) and
+# waits for its text; returns the text, or None if nothing usable came back. See extractor/whisper_jobs.py.
+def extract_whisper_text(file_path, llm_whisper_client):
+    with metrics.span(os.path.basename(file_path), 'whisper-wait', method='llm-whisper') as attrs:
+        text = usable_whisper_text(whisper_jobs.submit(file_path).result())
+        attrs.update(chars=len(text) if text else 0, accepted=text is not None)
+    return text
+
+# Same as extract_whisper_text, but awaits the job's future instead of blocking the event loop.
+async def extract_whisper_text_async(file_path, llm_whisper_client):
+    with metrics.span(os.path.basename(file_path), 'whisper-wait', method='llm-whisper') as attrs:
+        text = usable_whisper_text(await asyncio.wrap_future(whisper_jobs.submit(file_path)))
+        attrs.update(chars=len(text) if text else 0, accepted=text is not None)
+    return text
+
+def usable_whisper_text(text):
+    if text is None:
+        return None
+    # DEBUG TEXT LENGTH
+    print(len(text))
+    if len(text) > MIN_WHISPER_TEXT_CHARS:
+        return text
+    print('LLM Whisperer Failed. [No content extracted].')
+    return None
+
+# Pipeline hook: submit the Whisperer job as soon as the free extractors fail on a file, so it is processing
+# on the server while the file waits in the io queue; the io stage then only collects the result.
+def start_whisper_job(input_directory, file, text_data):
+    if not text_data['method']:
+        whisper_jobs.submit(os.path.join(input_directory, file))
 
-    raise RuntimeError("All PDF text extraction methods failed (PyMuPDF, OCR, LLM Whisperer)")
+# Extract pdf text using three text extraction technologies via waterfall: (1) PyMuPDF (free, native text) --> (2) pytesseract (free, OCR) --> LLM Whisperer (paid, OCR+native)
+def extract_pdf_text(file_path, llm_whisper_client, text_cache=None):
+    text_data = extract_local_text_cached(file_path, text_cache, triage_start_stages or None, scan_cache, REGION_OCR)
+    if not text_data['method']:
+        started = time.time()
+        text = extract_whisper_text(file_path, llm_whisper_client)
+        text_data['timings']['llm-whisper'] = round(time.time() - started, 3)
+        if text:
+            text_data.update(pdf_text=text, method='llm-whisper')
+    return complete_extraction(file_path, text_data, text_cache)
+
+# Async waterfall: the cache lookup and free extractors run in `executor` (a process pool) so they don't block the event loop.
+async def extract_pdf_text_async(file_path, llm_whisper_client, executor, text_cache=None):
+    loop = asyncio.get_running_loop()
+    text_data = await loop.run_in_executor(executor, extract_local_text_cached, file_path, text_cache, triage_start_stages or None, scan_cache, REGION_OCR)
+    if not text_data['method']:
+        started = time.time()
+        text = await extract_whisper_text_async(file_path, llm_whisper_client)
+        text_data['timings']['llm-whisper'] = round(time.time() - started, 3)
+        if text:
+            text_data.update(pdf_text=text, method='llm-whisper')
+    return complete_extraction(file_path, text_data, text_cache)
 
 def parse_gpt_response(response_text):
     data = {
@@ -184,20 +426,152 @@ def parse_gpt_response(response_text):
 
     return data
 
-def process_file(file, file_path, llm_whisper_client, gpt_client, llm_variant, llm_prompt):
-    print(f"\n=== PROCESSING: {file} ===")
-    # STEP 1: CONVERT PDF TO TEXT FOR LLM
-    try:
-        text_data = extract_pdf_text(file_path, llm_whisper_client)
-        pdf_text = f"""
+# Parse an LLM response into an output row, timed as the file's 'parse' span
+def parse_response(file, response_text):
+    with metrics.span(file, 'parse') as attrs:
+        parsed_data = parse_gpt_response(response_text)
+        attrs['fields'] = sum(1 for value in parsed_data.values() if value)
+    parsed_data['filename'] = file
+    return parsed_data
+
+# Store a parsed row in the job store, timed as the file's 'write' span
+def write_row(job_store, file, parsed_data):
+    with metrics.span(file, 'write'):
+        job_store.record_parsed(file, parsed_data)
+
+# The compaction stage runs here, so every mode (serial, async, staged, batch) sends the same compacted text
+def format_llm_input(file, pdf_text):
+    pdf_text = compactor.compact(file, pdf_text)
+    return f"""
         
         FILENAME: {file}
 
         === NOAA FORM 17-4: INITIAL REPORT ON WEATHER MODIFICATION ACTIVITIES ===
 
-        {text_data['pdf_text']}
+        {pdf_text}
 
         """
+
+def usage_dict(response):
+    usage = getattr(response, 'usage', None)
+    return usage.model_dump() if usage else None
+
+def record_llm_span(file, llm_variant, started, usage, stats):
+    usage = usage or {}
+    metrics.record(file, 'llm-request', time.time() - started, started, model=llm_variant, cached=False,
+                   prompt_tokens=usage.get('prompt_tokens'), completion_tokens=usage.get('completion_tokens'),
+                   retries=stats.get('attempts', 1) - 1)
+
+def call_llm(gpt_client, llm_variant, llm_prompt, pdf_text, file_path, response_cache=None):
+    file = os.path.basename(file_path)
+    started = time.time()
+    cache_key = None
+    if response_cache:
+        cache_key = response_cache.key_for(llm_variant, llm_prompt, pdf_text)
+        cached = response_cache.get(cache_key)
+        if cached:
+            print("Response cache hit.")
+            metrics.record(file, 'llm-request', time.time() - started, started, model=llm_variant, cached=True)
+            return cached['response_text']
+
+    def request():
+        raw = gpt_client.chat.completions.with_raw_response.create(
+            model=llm_variant,
+            messages=[
+                {"role": "system", "content": llm_prompt},
+                {"role": "user", "content": pdf_text}
+            ]
+        )
+        openai_provider.limiter.update_from_headers(raw.headers)
+        response = raw.parse()
+        if not response.choices[0].message.content:
+            raise RetryableError("empty completion")
+        return response
+
+    started, stats = time.time(), {}
+    try:
+        response = openai_provider.call(request, tokens=estimate_tokens(llm_prompt, pdf_text) + EXPECTED_COMPLETION_TOKENS, label=file, stats=stats)
+    except Exception as e:
+        metrics.record(file, 'llm-request', time.time() - started, started, status='error', error=e, model=llm_variant, retries=stats.get('attempts', 1) - 1)
+        raise RuntimeError(f"OpenAI failed for {file_path}: {e}") from e
+    usage_tracker.record(llm_variant, usage_dict(response), time.time() - started)
+    record_llm_span(file, llm_variant, started, usage_dict(response), stats)
+    response_text = response.choices[0].message.content
+
+    if response_cache:
+        response_cache.put(cache_key, llm_variant, llm_prompt, pdf_text, response_text, usage_dict(response))
+    return response_text
+
+async def call_llm_async(gpt_client, llm_variant, llm_prompt, pdf_text, file_path, response_cache=None):
+    file = os.path.basename(file_path)
+    started = time.time()
+    cache_key = None
+    if response_cache:
+        cache_key = response_cache.key_for(llm_variant, llm_prompt, pdf_text)
+        cached = response_cache.get(cache_key)
+        if cached:
+            print("Response cache hit.")
+            metrics.record(file, 'llm-request', time.time() - started, started, model=llm_variant, cached=True)
+            return cached['response_text']
+
+    async def request():
+        raw = await gpt_client.chat.completions.with_raw_response.create(
+            model=llm_variant,
+            messages=[
+                {"role": "system", "content": llm_prompt},
+                {"role": "user", "content": pdf_text}
+            ]
+        )
+        openai_provider.limiter.update_from_headers(raw.headers)
+        response = raw.parse()
+        if not response.choices[0].message.content:
+            raise RetryableError("empty completion")
+        return response
+
+    started, stats = time.time(), {}
+    try:
+        response = await openai_provider.call_async(request, tokens=estimate_tokens(llm_prompt, pdf_text) + EXPECTED_COMPLETION_TOKENS, label=file, stats=stats)
+    except Exception as e:
+        metrics.record(file, 'llm-request', time.time() - started, started, status='error', error=e, model=llm_variant, retries=stats.get('attempts', 1) - 1)
+        raise RuntimeError(f"OpenAI failed for {file_path}: {e}") from e
+    usage_tracker.record(llm_variant, usage_dict(response), time.time() - started)
+    record_llm_span(file, llm_variant, started, usage_dict(response), stats)
+    response_text = response.choices[0].message.content
+
+    if response_cache:
+        response_cache.put(cache_key, llm_variant, llm_prompt, pdf_text, response_text, usage_dict(response))
+    return response_text
+
+# Cascade: ask cascade.cheap_model first and keep its answer if the parsed fields validate; otherwise
+# (or when the cascade is off) the document goes to llm_variant.
+def call_llm_cascade(gpt_client, llm_variant, llm_prompt, pdf_text, file_path, response_cache=None):
+    if cascade.cheap_model:
+        response_text = call_llm(gpt_client, cascade.cheap_model, llm_prompt, pdf_text, file_path, response_cache)
+        problems = validate_fields(parse_gpt_response(response_text))
+        cascade.record(problems)
+        if not problems:
+            return response_text
+        print(f"Escalating to {llm_variant}: {'; '.join(problems)}")
+    return call_llm(gpt_client, llm_variant, llm_prompt, pdf_text, file_path, response_cache)
+
+async def call_llm_cascade_async(gpt_client, llm_variant, llm_prompt, pdf_text, file_path, response_cache=None):
+    if cascade.cheap_model:
+        response_text = await call_llm_async(gpt_client, cascade.cheap_model, llm_prompt, pdf_text, file_path, response_cache)
+        problems = validate_fields(parse_gpt_response(response_text))
+        cascade.record(problems)
+        if not problems:
+            return response_text
+        print(f"Escalating to {llm_variant}: {'; '.join(problems)}")
+    return await call_llm_async(gpt_client, llm_variant, llm_prompt, pdf_text, file_path, response_cache)
+
+def process_file(file, file_path, llm_whisper_client, gpt_client, llm_variant, llm_prompt, text_cache=None, response_cache=None, job_store=None):
+    print(f"\n=== PROCESSING: {file} ===")
+    # STEP 1: CONVERT PDF TO TEXT FOR LLM
+    try:
+        text_data = extract_pdf_text(file_path, llm_whisper_client, text_cache)
+        if job_store:
+            job_store.record_text(file, text_data['method'], text_data['timings'])
+        pdf_text = format_llm_input(file, text_data['pdf_text'])
     except Exception as e:
         print(f"Error extracting text from PDF : {str(e)}")
         raise e
@@ -206,78 +580,588 @@ def process_file(file, file_path, llm_whisper_client, gpt_client, llm_variant, l
     # print(pdf_text)
 
     # STEP 2: CALL OPEN AI TO EXTRACT KEY INFORMATION
-    retries = 2
-    backoff = 10
-    response_text = None
-    for attempt in range(retries):
-        try:
-            response = gpt_client.chat.completions.create(
-                model=llm_variant,
-                messages=[
-                    {"role": "system", "content": llm_prompt},
-                    {"role": "user", "content": pdf_text}
-                ]
-            )
-            response_text = response.choices[0].message.content
-            break 
-        except OpenAIError as e:
-            last_error = e
-            print(f"OpenAI API error (attempt {attempt + 1} of {retries}): {str(e)}")
-        except Exception as e:
-            last_error = e
-            print(f"Unexpected error calling OpenAI (attempt {attempt + 1} of {retries}): {str(e)}")
-        time.sleep(backoff)
-        backoff *= 2 
-
-    if not response_text:
-        raise RuntimeError(f"OpenAI failed after {retries} attempts for {file_path}: {last_error}")
+    response_text = call_llm_cascade(gpt_client, llm_variant, llm_prompt, pdf_text, file_path, response_cache)
+    if job_store:
+        job_store.record_llm(file, response_text)
 
-    
     # DEBUG LLM RESPONSE
     # print(response_text)
 
     # STEP 3: PARSE LLM RESPONSE INTO STRUCTURED DATA
-    parsed_data = parse_gpt_response(response_text)
-    parsed_data['filename'] = os.path.basename(file_path)
+    parsed_data = parse_response(os.path.basename(file_path), response_text)
     
     # DEBUG PARSED DATA
     # print(parsed_data)
 
+    if job_store:
+        write_row(job_store, file, parsed_data)
     return parsed_data
 
+# Same steps as process_file, but every wait (OCR worker, Whisperer job, OpenAI request, retry backoff)
+# yields to the event loop so many files can be in flight at once.
+async def process_file_async(file, file_path, llm_whisper_client, gpt_client, llm_variant, llm_prompt, executor, text_cache=None, response_cache=None, job_store=None):
+    print(f"\n=== PROCESSING: {file} ===")
+    # STEP 1: CONVERT PDF TO TEXT FOR LLM
+    try:
+        text_data = await extract_pdf_text_async(file_path, llm_whisper_client, executor, text_cache)
+        if job_store:
+            job_store.record_text(file, text_data['method'], text_data['timings'])
+        pdf_text = format_llm_input(file, text_data['pdf_text'])
+    except Exception as e:
+        print(f"Error extracting text from PDF : {str(e)}")
+        raise e
+
+    # STEP 2: CALL OPEN AI TO EXTRACT KEY INFORMATION
+    response_text = await call_llm_cascade_async(gpt_client, llm_variant, llm_prompt, pdf_text, file_path, response_cache)
+    if job_store:
+        job_store.record_llm(file, response_text)
+
+    # STEP 3: PARSE LLM RESPONSE INTO STRUCTURED DATA
+    parsed_data = parse_response(os.path.basename(file_path), response_text)
+    if job_store:
+        write_row(job_store, file, parsed_data)
+    return parsed_data
+
+# A file that fails is moved to the job store's dead-letter queue and the run goes on with the next one.
+# Returns False once so many files have failed in a row that every file is probably going to (bad API key,
+# all providers down), in which case the run should stop.
+def dead_letter(job_store, file, error):
+    state, next_retry_at = job_store.record_failure(file, error)
+    when = f"retry after {datetime.fromtimestamp(next_retry_at):%Y-%m-%d %H:%M}" if next_retry_at else "out of attempts, see retry-failed"
+    print(f"\n⚠️ {file} failed ({type(error).__name__}: {error}); moved to the dead-letter queue ({when})")
+    if job_store.failing_everything():
+        print(f"\n🛑 {job_store.consecutive_failures} files failed in a row; stopping the run.")
+        return False
+    return True
+
+# Every stage a file completes is recorded in the job store as it happens, so there is nothing to flush:
+# a crash loses at most the file in progress, which is still claimed and goes back to pending.
+def run_serial(files_to_process, input_directory, job_store, llm_whisper_client, gpt_client, llm_variant, llm_prompt, text_cache=None, response_cache=None):
+    for i, file in enumerate(files_to_process, 1):
+        full_path = os.path.join(input_directory, file)
+        try:
+            process_file(file, full_path, llm_whisper_client, gpt_client, llm_variant, llm_prompt, text_cache, response_cache, job_store)
+        except Exception as e:
+            if not dead_letter(job_store, file, e):
+                return False
+
+        if i % 5 == 0:
+            print(f"Processed {i} files")
+            print(f"PDF extraction methods used: {dict(method_counter)}")
+            save_method_counts(method_counter)
+    return True
+
+# Keeps up to `concurrency` files in flight. Results are handled on the event loop as they complete
+# (in completion order, not directory order); each file's stages are recorded in the job store as they finish.
+async def run_async(files_to_process, input_directory, job_store, llm_whisper_client, gpt_client, llm_variant, llm_prompt, concurrency, text_cache=None, response_cache=None):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with ProcessPoolExecutor(max_workers=min(concurrency, os.cpu_count() or 1)) as executor:
+        async def run_one(file):
+            async with semaphore:
+                full_path = os.path.join(input_directory, file)
+                try:
+                    return file, await process_file_async(file, full_path, llm_whisper_client, gpt_client, llm_variant, llm_prompt, executor, text_cache, response_cache, job_store), None
+                except Exception as e:
+                    return file, None, e
+
+        tasks = [asyncio.create_task(run_one(file)) for file in files_to_process]
+        for i, next_done in enumerate(asyncio.as_completed(tasks), 1):
+            file, result, error = await next_done
+            if error and not dead_letter(job_store, file, error):
+                print("→ Cancelling in-flight files and exiting...")
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                return False
+
+            if i % 5 == 0:
+                print(f"Processed {i} files")
+                print(f"PDF extraction methods used: {dict(method_counter)}")
+                save_method_counts(method_counter)
+    return True
+
+# Staged mode: OCR in a process pool, Whisperer + OpenAI in I/O threads, a single writer thread.
+# See extractor/pipeline.py for how the stages are connected.
+def run_staged(files_to_process, input_directory, job_store, llm_whisper_client, gpt_client, llm_variant, llm_prompt, ocr_workers, io_workers, queue_size, text_cache=None, response_cache=None):
+    written = []
+    extraction_lock = threading.Lock()  # method_counter and text_cache are shared by the io threads
+
+    def io_stage(file, text_data):
+        full_path = os.path.join(input_directory, file)
+        if not text_data['method']:
+            started = time.time()
+            text = extract_whisper_text(full_path, llm_whisper_client)
+            text_data['timings']['llm-whisper'] = round(time.time() - started, 3)
+            if text:
+                text_data.update(pdf_text=text, method='llm-whisper')
+        with extraction_lock:
+            complete_extraction(full_path, text_data, text_cache)
+        job_store.record_text(file, text_data['method'], text_data['timings'])
+        response_text = call_llm_cascade(gpt_client, llm_variant, llm_prompt, format_llm_input(file, text_data['pdf_text']), full_path, response_cache)
+        job_store.record_llm(file, response_text)
+        return parse_response(file, response_text)
+
+    def write_stage(file, parsed_data):
+        write_row(job_store, file, parsed_data)
+        written.append(file)
+        if len(written) % 5 == 0:
+            print(f"Processed {len(written)} files")
+            print(f"PDF extraction methods used: {dict(method_counter)}")
+            save_method_counts(method_counter)
+
+    ok, _, _ = run_pipeline(
+        files_to_process,
+        functools.partial(extract_local_text_in, input_directory, text_cache, triage_start_stages or None, scan_cache, REGION_OCR),
+        io_stage,
+        write_stage,
+        cpu_done=functools.partial(start_whisper_job, input_directory),
+        on_error=functools.partial(dead_letter, job_store),
+        cpu_workers=ocr_workers,
+        io_workers=io_workers,
+        queue_size=queue_size
+    )
+    return ok
+
+# Run only the extraction waterfall (no OpenAI calls) over `files`. Files where every method fails are
+# reported and skipped rather than stopping the run. Returns ({file: text_data}, [failed files]).
+def extract_texts(files, input_directory, llm_whisper_client, text_cache, ocr_workers, io_workers, queue_size):
+    extraction_lock = threading.Lock()
+    texts = {}
+    failed = []
+
+    def io_stage(file, text_data):
+        full_path = os.path.join(input_directory, file)
+        if not text_data['method']:
+            started = time.time()
+            text = extract_whisper_text(full_path, llm_whisper_client)
+            text_data['timings']['llm-whisper'] = round(time.time() - started, 3)
+            if text:
+                text_data.update(pdf_text=text, method='llm-whisper')
+        with extraction_lock:
+            try:
+                return complete_extraction(full_path, text_data, text_cache)
+            except RuntimeError:
+                failed.append(file)
+                return None
+
+    def write_stage(file, text_data):
+        if text_data:
+            texts[file] = text_data
+
+    run_pipeline(
+        files,
+        functools.partial(extract_local_text_in, input_directory, text_cache, triage_start_stages or None, scan_cache, REGION_OCR),
+        io_stage,
+        write_stage,
+        cpu_done=functools.partial(start_whisper_job, input_directory),
+        cpu_workers=ocr_workers,
+        io_workers=io_workers,
+        queue_size=queue_size
+    )
+    if failed:
+        print(f"Text extraction failed for {len(failed)} files: {failed}")
+    return texts, failed
+
+# Fill the text cache for every PDF in input_directory without calling OpenAI, e.g. before a prompt/model sweep.
+def warm_text_cache(all_files, input_directory, llm_whisper_client, text_cache, ocr_workers, io_workers, queue_size):
+    texts, failed = extract_texts(all_files, input_directory, llm_whisper_client, text_cache, ocr_workers, io_workers, queue_size)
+    print(f"Warmed {text_cache.summary()}; {len(failed)} files failed extraction.")
+    print(f"PDF extraction methods used: {dict(method_counter)}")
+
+def record_extractions(job_store, texts, failed):
+    for file, text_data in texts.items():
+        job_store.record_text(file, text_data['method'], text_data['timings'])
+    for file in failed:
+        job_store.record_failure(file, RuntimeError("All PDF text extraction methods failed (PyMuPDF, OCR, LLM Whisperer)"))
+
+# Batch mode: extract text for every pending file, submit the OpenAI requests through the Batch API,
+# then stream results through parse_gpt_response into the job store. Batches already submitted
+# by an earlier (interrupted) run are resumed from <batch_dir>/batch-state.json instead of resubmitted.
+def run_batch(files_to_process, input_directory, job_store, llm_whisper_client, gpt_client, llm_variant, llm_prompt, batch_dir, max_batch_requests, poll_interval, ocr_workers, io_workers, queue_size, text_cache=None, response_cache=None):
+    state_file = os.path.join(batch_dir, 'batch-state.json')
+    state = load_batch_state(state_file)
+    pending = [b for b in state['batches'] if b['status'] != 'retrieved']
+    in_flight = {custom_id for b in pending for custom_id in b['custom_ids']}
+    if pending:
+        print(f"Resuming {len(pending)} submitted batches ({len(in_flight)} files) from {state_file}")
+
+    written = []
+    def write_result(file, response_text):
+        job_store.record_llm(file, response_text)
+        write_row(job_store, file, parse_response(file, response_text))
+        written.append(file)
+
+    # STEP 1: EXTRACT TEXT AND SUBMIT EVERYTHING THAT ISN'T ALREADY IN A BATCH
+    to_submit = [f for f in files_to_process if f not in in_flight]
+    if to_submit:
+        texts, failed = extract_texts(to_submit, input_directory, llm_whisper_client, text_cache, ocr_workers, io_workers, queue_size)
+        record_extractions(job_store, texts, failed)
+        requests = []
+        for file in to_submit:
+            if file not in texts:
+                continue
+            pdf_text = format_llm_input(file, texts[file]['pdf_text'])
+            if response_cache:
+                cached = response_cache.get(response_cache.key_for(llm_variant, llm_prompt, pdf_text))
+                if cached:
+                    write_result(file, cached['response_text'])
+                    continue
+            requests.append(build_batch_request(file, llm_variant, llm_prompt, pdf_text))
+
+        for start in range(0, len(requests), max_batch_requests):
+            batch = submit_batch(gpt_client, requests[start:start + max_batch_requests], batch_dir, llm_variant)
+            state['batches'].append(batch)
+            save_batch_state(state_file, state)
+            pending.append(batch)
+
+    # STEP 2: WAIT FOR EACH BATCH AND STREAM ITS RESULTS INTO THE CSV
+    processed_files = job_store.done_files()
+    errors = {}
+    for batch in pending:
+        finished = wait_for_batch(gpt_client, batch['batch_id'], poll_interval)
+        requests = load_batch_requests(batch['requests_file'])
+        for file, response_text, usage, error in iter_batch_results(gpt_client, finished):
+            if file in processed_files:
+                continue  # already written before an earlier run was interrupted
+            if error or not response_text:
+                errors[file] = error
+                job_store.record_failure(file, RuntimeError(f"batch request failed: {error}"))
+                continue
+            if response_cache:
+                messages = requests[file]['body']['messages']
+                response_cache.put(
+                    response_cache.key_for(batch['model'], messages[0]['content'], messages[1]['content']),
+                    batch['model'], messages[0]['content'], messages[1]['content'], response_text, usage
+                )
+            write_result(file, response_text)
+        batch['status'] = 'retrieved'
+        batch['batch_status'] = finished.status
+        save_batch_state(state_file, state)
+
+    if errors:
+        print(f"\n{len(errors)} batch requests failed and were left unprocessed (rerun to resubmit them):")
+        for file, error in errors.items():
+            print(f"  - {file}: {error}")
+    print(f"Batch mode parsed {len(written)} files")
+    return True
+
+# Packed mode: extract text for every pending file, then send `pack_size` documents per OpenAI request.
+# Documents whose block is missing or malformed in the reply are re-packed and retried up to
+# `pack_retries` times; whatever is still missing after that is sent on its own through call_llm.
+def run_packed(files_to_process, input_directory, job_store, llm_whisper_client, gpt_client, llm_variant, llm_prompt, pack_size, pack_retries, ocr_workers, io_workers, queue_size, text_cache=None, response_cache=None):
+    written = []
+    def write_result(file, response_text):
+        job_store.record_llm(file, response_text)
+        write_row(job_store, file, parse_response(file, response_text))
+        written.append(file)
+
+    # packed answers are cached per document, apart from single-document answers
+    packed_params = {'packed': True}
+
+    # STEP 1: EXTRACT TEXT
+    texts, failed = extract_texts(files_to_process, input_directory, llm_whisper_client, text_cache, ocr_workers, io_workers, queue_size)
+    record_extractions(job_store, texts, failed)
+    llm_inputs = {file: format_llm_input(file, texts[file]['pdf_text']) for file in files_to_process if file in texts}
+    pending = []
+    for file, pdf_text in llm_inputs.items():
+        cached = response_cache.get(response_cache.key_for(llm_variant, llm_prompt, pdf_text, packed_params)) if response_cache else None
+        if cached:
+            write_result(file, cached['response_text'])
+        else:
+            pending.append(file)
+
+    # STEP 2: SEND PACKS, RETRYING ONLY THE DOCUMENTS THAT DIDN'T COME BACK
+    def request_pack(pack):
+        try:
+            response_text = call_llm(gpt_client, llm_variant, packed_prompt(llm_prompt, len(pack)), pack_documents([llm_inputs[f] for f in pack]), f"pack of {len(pack)} ({pack[0]}, ...)")
+        except Exception as e:
+            print(e)
+            return {}
+        return split_packed_response(response_text, pack)
+
+    packs_sent = 0
+    for attempt in range(pack_retries + 1):
+        if not pending:
+            break
+        packs = [pending[i:i + pack_size] for i in range(0, len(pending), pack_size)]
+        packs_sent += len(packs)
+        with ThreadPoolExecutor(max_workers=io_workers) as pool:
+            answers = list(pool.map(request_pack, packs))
+        missing = []
+        for pack, blocks in zip(packs, answers):
+            for file in pack:
+                if file not in blocks:
+                    missing.append(file)
+                    continue
+                if response_cache:
+                    response_cache.put(response_cache.key_for(llm_variant, llm_prompt, llm_inputs[file], packed_params), llm_variant, llm_prompt, llm_inputs[file], blocks[file], params=packed_params)
+                write_result(file, blocks[file])
+        if missing:
+            print(f"{len(missing)} documents missing or malformed in packed replies{' (retrying)' if attempt < pack_retries else ''}: {missing}")
+        pending = missing
+
+    # STEP 3: LAST RESORT, ONE DOCUMENT PER REQUEST
+    for file in pending:
+        try:
+            write_result(file, call_llm(gpt_client, llm_variant, llm_prompt, llm_inputs[file], os.path.join(input_directory, file), response_cache))
+        except Exception as e:
+            if not dead_letter(job_store, file, e):
+                return False
+
+    print(f"Packed mode parsed {len(written)} files ({packs_sent} packed requests, {len(pending)} single-document fallbacks)")
+    return True
+
+def configure_providers(args):
+    for provider, rpm, tpm in ((openai_provider, args.openai_rpm, args.openai_tpm), (whisper_provider, args.whisper_rpm, None)):
+        provider.limiter = RateLimiter(requests_per_minute=rpm, tokens_per_minute=tpm)
+        provider.breaker = CircuitBreaker(provider.name, failure_threshold=args.breaker_threshold, cooldown=args.breaker_cooldown)
+        provider.policy = RetryPolicy(max_attempts=args.max_attempts)
+
+def configure_triage(args):
+    if args.no_triage:
+        return
+    triage_stats.load(args.triage_stats)
+    scan_cache.db_path = args.scan_cache
+    triage_start_stages.update(triage_stats.start_stages(min_samples=args.triage_min_samples, min_hit_rate=args.triage_min_hit_rate))
+    print(f"Triage start stages: {triage_start_stages}")
+
+def configure_method_counts(args):
+    global METHOD_COUNTS_FILE
+    METHOD_COUNTS_FILE = args.method_counts_file
+
+# Region OCR changes what the waterfall returns, so it is part of the text cache key
+def configure_region_ocr(args):
+    global REGION_OCR
+    REGION_OCR = args.region_ocr
+    EXTRACTOR_SETTINGS['region_ocr'] = FORM_17_4_TEMPLATE if REGION_OCR else None
+
+def configure_whisper_jobs(args, llm_whisper_client):
+    whisper_jobs.client = llm_whisper_client
+    whisper_jobs.jobs_file = args.whisper_jobs
+    whisper_jobs.poll_interval = args.whisper_poll_interval
+    whisper_jobs.max_poll_interval = args.whisper_max_poll_interval
+    whisper_jobs.wait_timeout = args.whisper_timeout
+    whisper_jobs.workers = args.whisper_workers
+    whisper_jobs.load()
+
+def configure_compaction(args, llm_variant):
+    compactor.enabled = args.compaction
+    compactor.token_budget = args.token_budget
+    compactor.model = llm_variant
+    compactor.report_file = args.compaction_report
+
+def configure_metrics(args):
+    metrics.enabled = not args.no_metrics
+    metrics.spans_file = args.metrics_file
+    metrics.prometheus_file = args.prometheus_file
+    whisper_jobs.metrics = metrics
+
+# Print p50/p95 per stage and write the Prometheus histograms
+def finish_metrics():
+    if not metrics.enabled:
+        return
+    print(metrics.summary())
+    if metrics.write_prometheus():
+        print(f"Stage spans appended to {metrics.spans_file}; latency histograms saved to {metrics.prometheus_file}")
+    metrics.close()
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = argparse.ArgumentParser(description="Extract structured fields from NOAA Form 17-4 PDFs.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    # options shared by `extract` and `retry-failed`
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('--input-dir', default='../noaa-files',
+                         help="directory of NOAA PDFs to process (default: ../noaa-files)")
+    options.add_argument('--output-file', default='../dataset/final/cloud_seeding_us_2000_2025.csv',
+                         help="CSV exported from the job store at the end of the run (default: ../dataset/final/cloud_seeding_us_2000_2025.csv)")
+    options.add_argument('--parquet', action='store_true',
+                         help="also export the dataset as Parquet with a typed schema, next to --output-file (needs pyarrow)")
+    options.add_argument('--job-store', default='../dataset/final/jobs.sqlite',
+                         help="SQLite file tracking every file's claim, stage, attempts and parsed row (default: ../dataset/final/jobs.sqlite)")
+    options.add_argument('--retry-delay', type=float, default=10,
+                         help="minutes before a failed file is retried; x4 for each further attempt (default: 10)")
+    options.add_argument('--max-file-attempts', type=int, default=4,
+                         help="attempts before a failing file is parked until `retry-failed` (default: 4)")
+    options.add_argument('--max-consecutive-failures', type=int, default=10,
+                         help="stop the run after this many files fail in a row (default: 10)")
+    options.add_argument('--checkpoint-file', default='../dataset/final/processed-files.txt',
+                         help="old-style list of processed files, imported with --output-file into a new, empty job store (default: ../dataset/final/processed-files.txt)")
+    options.add_argument('--async', dest='use_async', action='store_true',
+                         help="process files concurrently with asyncio instead of one at a time")
+    options.add_argument('--concurrency', type=int, default=16,
+                         help="maximum number of files in flight in --async mode (default: 16)")
+    options.add_argument('--staged', action='store_true',
+                         help="run as a staged pipeline: OCR process pool -> Whisperer/OpenAI threads -> CSV writer")
+    options.add_argument('--ocr-workers', type=int, default=os.cpu_count() or 1,
+                         help="processes for PyMuPDF/OCR in --staged, --batch and --warm-text-cache modes (default: CPU count)")
+    options.add_argument('--region-ocr', action='store_true',
+                         help="OCR scanned pages box by box with the Form 17-4 template and send the LLM the labeled fields (default: full-page OCR)")
+    options.add_argument('--io-workers', type=int, default=16,
+                         help="threads for Whisperer/OpenAI calls in --staged, --batch and --warm-text-cache modes (default: 16)")
+    options.add_argument('--queue-size', type=int, default=32,
+                         help="capacity of each queue between pipeline stages (default: 32)")
+    options.add_argument('--text-cache-dir', default='../dataset/cache/text',
+                         help="directory of the extracted text cache (default: ../dataset/cache/text)")
+    options.add_argument('--text-cache-max-mb', type=int, default=500,
+                         help="evict least recently used cache entries beyond this size (default: 500)")
+    options.add_argument('--no-text-cache', action='store_true',
+                         help="always re-extract PDF text instead of reading and writing the cache")
+    options.add_argument('--warm-text-cache', action='store_true',
+                         help="extract text for every PDF into the cache (no OpenAI calls), then exit")
+    options.add_argument('--response-cache', default='../dataset/cache/llm-responses.sqlite',
+                         help="SQLite file caching OpenAI responses (default: ../dataset/cache/llm-responses.sqlite)")
+    options.add_argument('--response-cache-ttl-days', type=float, default=0,
+                         help="treat cached responses older than this as misses; 0 keeps them forever (default: 0)")
+    options.add_argument('--response-cache-max-mb', type=int, default=200,
+                         help="evict least recently used responses beyond this size (default: 200)")
+    options.add_argument('--no-response-cache', action='store_true',
+                         help="always call OpenAI instead of reading and writing the response cache")
+    options.add_argument('--max-attempts', type=int, default=6,
+                         help="attempts per OpenAI / Whisperer call for retryable and rate-limited errors (default: 6)")
+    options.add_argument('--openai-rpm', type=int, default=None,
+                         help="OpenAI requests per minute to start from, until x-ratelimit headers say otherwise")
+    options.add_argument('--openai-tpm', type=int, default=None,
+                         help="OpenAI tokens per minute to start from, until x-ratelimit headers say otherwise")
+    options.add_argument('--whisper-rpm', type=int, default=None,
+                         help="LLM Whisperer requests per minute (default: unlimited)")
+    options.add_argument('--whisper-jobs', default='../dataset/final/whisper-jobs.json',
+                         help="pending LLM Whisperer jobs, resumed by the next run if this one stops (default: ../dataset/final/whisper-jobs.json)")
+    options.add_argument('--whisper-poll-interval', type=float, default=5,
+                         help="seconds before a Whisperer job's first status check; grows x1.5 per check (default: 5)")
+    options.add_argument('--whisper-max-poll-interval', type=float, default=30,
+                         help="longest wait between status checks of one Whisperer job (default: 30)")
+    options.add_argument('--whisper-timeout', type=float, default=600,
+                         help="give up on a Whisperer job this many seconds after submission (default: 600)")
+    options.add_argument('--whisper-workers', type=int, default=8,
+                         help="threads uploading files and checking Whisperer job status (default: 8)")
+    options.add_argument('--breaker-threshold', type=int, default=5,
+                         help="consecutive transient failures before a provider's circuit opens (default: 5)")
+    options.add_argument('--breaker-cooldown', type=float, default=60,
+                         help="seconds an open circuit waits before letting a trial call through (default: 60)")
+    options.add_argument('--batch', action='store_true',
+                         help="submit the OpenAI requests through the Batch API and wait for the results")
+    options.add_argument('--batch-dir', default='../dataset/final/batches',
+                         help="where batch request files and batch-state.json are kept (default: ../dataset/final/batches)")
+    options.add_argument('--max-batch-requests', type=int, default=1000,
+                         help="maximum number of requests per submitted batch (default: 1000)")
+    options.add_argument('--batch-poll-interval', type=int, default=60,
+                         help="seconds between batch status checks (default: 60)")
+    options.add_argument('--no-triage', action='store_true',
+                         help="always start the waterfall at PyMuPDF instead of routing each PDF from a first-page triage")
+    options.add_argument('--triage-stats', default='../dataset/final/triage-stats.json',
+                         help="per-route stage hit rates, carried across runs (default: ../dataset/final/triage-stats.json)")
+    options.add_argument('--scan-cache', default='../dataset/final/scan-metrics.sqlite',
+                         help="per-file metrics from file-helpers/count-scanned-files.py; triage routes files found there without opening them (default: ../dataset/final/scan-metrics.sqlite)")
+    options.add_argument('--triage-min-samples', type=int, default=20,
+                         help="attempts a stage needs on a route before triage may skip it (default: 20)")
+    options.add_argument('--triage-min-hit-rate', type=float, default=0.1,
+                         help="skip a stage for a route when it wins less often than this (default: 0.1)")
+    options.add_argument('--cascade-model', default=None,
+                         help="send every document to this cheaper model first (e.g. o4-mini) and escalate only those whose fields fail validation")
+    options.add_argument('--pack-size', type=int, default=1,
+                         help="documents per OpenAI request; above 1 the extraction prompt is shared by the pack (default: 1)")
+    options.add_argument('--pack-retries', type=int, default=2,
+                         help="times documents missing from a packed reply are re-packed before being sent alone (default: 2)")
+    options.add_argument('--compaction', action='store_true',
+                         help="compact the extracted text to --token-budget before the LLM call (default: send it as is). "
+                              "Tokens are counted with tiktoken if it is installed and has its encoding cached, else estimated at ~4 characters per token")
+    options.add_argument('--token-budget', type=int, default=1000,
+                         help="maximum tokens of extracted text sent to the LLM per file with --compaction (default: 1000)")
+    options.add_argument('--compaction-report', default='../dataset/final/compaction-report.csv',
+                         help="CSV of tokens before/after compaction per file (default: ../dataset/final/compaction-report.csv)")
+    options.add_argument('--method-counts-file', default='../dataset/final/pdf_method_counts.txt',
+                         help="text file the extraction method counts are appended to (default: ../dataset/final/pdf_method_counts.txt)")
+    options.add_argument('--metrics-file', default='../dataset/final/metrics/spans.jsonl',
+                         help="JSONL file each stage's timing span is appended to (default: ../dataset/final/metrics/spans.jsonl)")
+    options.add_argument('--prometheus-file', default='../dataset/final/metrics/stage-latency.prom',
+                         help="per-stage latency histograms in Prometheus text format, written at the end of the run (default: ../dataset/final/metrics/stage-latency.prom)")
+    options.add_argument('--no-metrics', action='store_true',
+                         help="don't record stage spans or latency histograms")
+
+    subparsers.add_parser('extract', parents=[options],
+                          help="extract fields from every PDF not yet done, plus failed files that are due a retry (default)")
+    subparsers.add_parser('retry-failed', parents=[options],
+                          help="reprocess only the files in the dead-letter queue, whatever their retry schedule")
+
+    export = subparsers.add_parser('export', help="write the output CSV from the job store and list failed files")
+    export.add_argument('--job-store', default='../dataset/final/jobs.sqlite',
+                        help="SQLite job store to export (default: ../dataset/final/jobs.sqlite)")
+    export.add_argument('--output-file', default='../dataset/final/cloud_seeding_us_2000_2025.csv',
+                        help="CSV to write (default: ../dataset/final/cloud_seeding_us_2000_2025.csv)")
+    export.add_argument('--parquet', action='store_true',
+                        help="also write the dataset as Parquet with a typed schema, next to --output-file (needs pyarrow)")
+    export.add_argument('--checkpoint-file', default='../dataset/final/processed-files.txt',
+                        help="old-style list of processed files, imported into a new, empty job store (default: ../dataset/final/processed-files.txt)")
+
+    # `python llm-extractor.py [options]` is shorthand for `python llm-extractor.py extract [options]`
+    if not argv or (argv[0].startswith('-') and argv[0] not in ('-h', '--help')):
+        argv = ['extract'] + argv
+    return parser.parse_args(argv)
+
+def open_job_store(args):
+    job_store = JobStore(args.job_store)
+    if args.command != 'export':
+        job_store.retry_delay = args.retry_delay * 60
+        job_store.max_attempts = args.max_file_attempts
+        job_store.max_consecutive_failures = args.max_consecutive_failures
+    if job_store.is_empty() and (os.path.exists(args.checkpoint_file) or os.path.exists(args.output_file)):
+        job_store.import_checkpoint(args.checkpoint_file, args.output_file)
+    return job_store
+
+def export_outputs(job_store, args):
+    """Write the output CSV (and with --parquet its typed Parquet copy) from the job store."""
+    rows = job_store.export_csv(args.output_file, FIELDNAMES)
+    if args.parquet:
+        write_parquet_rows(job_store.rows(), FIELDNAMES, parquet_path(args.output_file))
+        print(f"Parquet copy saved to {parquet_path(args.output_file)}")
+    return rows
+
+def export_dataset(args):
+    job_store = open_job_store(args)
+    rows = export_outputs(job_store, args)
+    print(f"Exported {rows} rows to {args.output_file}")
+    print(job_store.summary())
+    print(job_store.dead_letter_summary())
+    for filename, state, stage, attempts, error_class, error, next_retry_at in job_store.failures():
+        when = f"retry after {datetime.fromtimestamp(next_retry_at):%Y-%m-%d %H:%M}" if next_retry_at else "out of attempts"
+        print(f"  - {filename}: {error_class} after stage {stage or 'none'}, {attempts} attempts, {when}: {error}")
+
 def main():
+    args = parse_args()
+    if args.parquet:
+        require_pyarrow()  # fail now rather than after the run
+    if args.command == 'export':
+        return export_dataset(args)
+
     # INPUT FILES
-    input_directory = "../noaa-files"
-    output_file = "../dataset/final/cloud_seeding_us_2000_2025.csv"
-    checkpoint_file = "../dataset/final/processed-files.txt"
+    input_directory = args.input_dir
+    output_file = args.output_file
 
     # LOAD NOAA FILES TO PROCESS
-    processed_files = load_processed_files(checkpoint_file)
+    job_store = open_job_store(args)
     all_files = [
         f for f in os.listdir(input_directory)
         if os.path.isfile(os.path.join(input_directory, f)) and f.lower().endswith('.pdf')
     ]
-    files_to_process = [f for f in all_files if f not in processed_files]
-    fieldnames = [
-        'filename', 
-        'project', 
-        'year', 
-        'season', 
-        'state', 
-        'operator_affiliation',
-        'agent', 
-        'apparatus', 
-        'purpose', 
-        'target_area', 
-        'control_area', 
-        'start_date', 
-        'end_date'
-    ]
+    job_store.add_files(all_files)
+    # serial and staged runs claim one file at a time, so several runs can share one job store;
+    # the other modes need their whole work list up front. retry-failed claims only the dead-letter queue.
+    retry_failed = args.command == 'retry-failed'
+    if not (args.batch or args.pack_size > 1) and (args.staged or not args.use_async):
+        files_to_process = job_store.iter_claims(retry_failed)
+    else:
+        files_to_process = job_store.claim(retry_failed=retry_failed)
 
     # OPEN AI
     load_dotenv()  
     api_key = os.getenv("OPENAI_API_KEY")
-    gpt_client = OpenAI(api_key=api_key)
+    gpt_client = OpenAI(api_key=api_key, max_retries=0) # retries are handled by openai_provider
+    configure_providers(args)
+    configure_triage(args)
+    configure_region_ocr(args)
 
     # ORDERED BY PERFORMANCE (notes on cost)
     # llm_variant = 'gpt-4o-mini' # 91.67% accuracy
@@ -285,6 +1169,13 @@ def main():
     # llm_variant = 'gpt-4.1' # 93.33% accuracy
     # llm_variant = 'o4-mini' # 95.00% accuracy (BEST VALUE) (~$0.005 per document)
     llm_variant = 'o3' # 96.33% accuracy (BEST ACCURACY) (~$0.01 per document)
+    configure_compaction(args, llm_variant)
+    configure_metrics(args)
+    configure_method_counts(args)
+    if args.cascade_model and (args.batch or args.pack_size > 1):
+        sys.exit("--cascade-model works with the serial, --async and --staged modes")
+    cascade.cheap_model = args.cascade_model
+    cascade.expensive_model = llm_variant
 
     llm_prompt = f"""
 # NOAA Weather Modification Report Extraction Expert
@@ -405,40 +1296,74 @@ END DATE: [extracted value]
     
     # LLM Whisperer Client
     llm_whisper_client = LLMWhispererClientV2()
+    configure_whisper_jobs(args, llm_whisper_client)
+
+    # EXTRACTED TEXT CACHE
+    text_cache = None
+    if not args.no_text_cache:
+        text_cache = TextCache(args.text_cache_dir, EXTRACTOR_SETTINGS, max_bytes=args.text_cache_max_mb * 1024 * 1024)
+    if args.warm_text_cache:
+        if not text_cache:
+            sys.exit("--warm-text-cache cannot be combined with --no-text-cache")
+        warm_text_cache(all_files, input_directory, llm_whisper_client, text_cache, args.ocr_workers, args.io_workers, args.queue_size)
+        triage_stats.save()
+        whisper_jobs.close()
+        print(whisper_jobs.summary())
+        finish_metrics()
+        return
+
+    # LLM RESPONSE CACHE
+    response_cache = None
+    if not args.no_response_cache:
+        os.makedirs(os.path.dirname(args.response_cache) or '.', exist_ok=True)
+        response_cache = ResponseCache(
+            args.response_cache,
+            ttl_seconds=args.response_cache_ttl_days * 86400 or None,
+            max_bytes=args.response_cache_max_mb * 1024 * 1024
+        )
 
     # MAIN LOOP
-    results = []
-    for i, file in enumerate(files_to_process, 1):
-        full_path = os.path.join(input_directory, file)
-        try:
-            result = process_file(file, full_path, llm_whisper_client, gpt_client, llm_variant, llm_prompt)
-            if result:
-                results.append(result)
-                save_processed_file(checkpoint_file, file)
-        except Exception as e:
-            print(f"\n🛑 Critical error processing {file}: {e}")
-            print("→ Saving progress and exiting safely...")
-            # Save current batch before exit
-            if results:
-                save_to_csv(results, output_file, fieldnames)
-                print(f"Partial batch saved ({len(results)} files) to {output_file}")
-            save_method_counts(method_counter, '../dataset/final/pdf_method_counts.txt')
-            sys.exit(1)
-        
-        if i % 5 == 0 or i == len(files_to_process):
-            save_to_csv(results, output_file, fieldnames)
-            print(f"Saved {i} processed files to {output_file}")
-            print(f"PDF extraction methods used: {dict(method_counter)}")
-            save_method_counts(method_counter, '../dataset/final/pdf_method_counts.txt')
-            results = []
-
-    if results:
-        save_to_csv(results, output_file, fieldnames)
-        print(f"Final batch saved ({len(results)} files) to {output_file}")
-
-    print(f"Processing complete. Final results saved to {output_file}")
+    if args.batch:
+        completed = run_batch(files_to_process, input_directory, job_store, llm_whisper_client, gpt_client, llm_variant, llm_prompt, args.batch_dir, args.max_batch_requests, args.batch_poll_interval, args.ocr_workers, args.io_workers, args.queue_size, text_cache, response_cache)
+    elif args.pack_size > 1:
+        completed = run_packed(files_to_process, input_directory, job_store, llm_whisper_client, gpt_client, llm_variant, llm_prompt, args.pack_size, args.pack_retries, args.ocr_workers, args.io_workers, args.queue_size, text_cache, response_cache)
+    elif args.staged:
+        completed = run_staged(files_to_process, input_directory, job_store, llm_whisper_client, gpt_client, llm_variant, llm_prompt, args.ocr_workers, args.io_workers, args.queue_size, text_cache, response_cache)
+    elif args.use_async:
+        async_gpt_client = AsyncOpenAI(api_key=api_key, max_retries=0)
+        completed = asyncio.run(run_async(files_to_process, input_directory, job_store, llm_whisper_client, async_gpt_client, llm_variant, llm_prompt, args.concurrency, text_cache, response_cache))
+    else:
+        completed = run_serial(files_to_process, input_directory, job_store, llm_whisper_client, gpt_client, llm_variant, llm_prompt, text_cache, response_cache)
+
+    triage_stats.save()
+    whisper_jobs.close()
+    job_store.release()
+    rows = export_outputs(job_store, args)
+    if not completed:
+        print(f"Exported {rows} rows to {output_file}")
+        save_method_counts(method_counter)
+        finish_metrics()
+        sys.exit(1)
+
+    print(f"Processing complete. Final results ({rows} rows) saved to {output_file}")
+    print(job_store.summary())
+    print(job_store.dead_letter_summary())
     print(f"PDF extraction methods used: {dict(method_counter)}")
-    save_method_counts(method_counter, '../dataset/final/pdf_method_counts.txt')
+    if text_cache:
+        print(text_cache.summary())
+    if response_cache:
+        print(response_cache.summary())
+    print(openai_provider.summary())
+    print(whisper_provider.summary())
+    print(whisper_jobs.summary())
+    if triage_start_stages:
+        print(triage_stats.summary())
+    if compactor.enabled:
+        print(compactor.summary())
+    if cascade.cheap_model:
+        print(cascade.summary(usage_tracker))
+    save_method_counts(method_counter)
+    finish_metrics()
 
 if __name__ == "__main__":
     main()
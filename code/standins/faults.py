@@ -0,0 +1,138 @@
+# === LATENCY AND FAULT INJECTION FOR THE STAND-INS ===
+# Shared by the OpenAI and LLM Whisperer stand-ins, so a load test meets slow answers, quotas and errors
+# like the real APIs produce instead of instant, perfect responses:
+#   Latency        delay drawn from a distribution, written as a spec string:
+#                    '0.5' or 'fixed:0.5'   always 0.5 s
+#                    'uniform:2:0.5'        2 s +/- 50%
+#                    'lognormal:2:0.6'      median 2 s, sigma 0.6 (a long right tail, like LLM latencies)
+#                    'exponential:2'        mean 2 s
+#   QuotaWindow    requests and tokens per minute over a sliding 60 s window. Requests over the quota get a
+#                  429, and every answer carries x-ratelimit-{limit,remaining,reset}-{requests,tokens} headers.
+#   FaultInjector  the quota, plus random 429s (with retry-after) and 5xx errors at set rates, and the
+#                  latency; counts what it served so a driver can compare it with what the client saw.
+import math
+import random
+import threading
+import time
+from collections import Counter, deque
+
+class Latency:
+    DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal', 'exponential')
+
+    def __init__(self, distribution='fixed', median=0.0, spread=0.5):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"unknown latency distribution {distribution!r}; expected one of {', '.join(self.DISTRIBUTIONS)}")
+        self.distribution = distribution
+        self.median = float(median)
+        self.spread = float(spread)
+
+    @classmethod
+    def parse(cls, spec):
+        """'0.5', 'fixed:0.5', 'uniform:2:0.5', 'lognormal:2:0.6' or 'exponential:2' (see the module comment)."""
+        parts = str(spec).split(':')
+        if len(parts) == 1:
+            return cls('fixed', float(parts[0]))
+        return cls(parts[0], *(float(p) for p in parts[1:]))
+
+    def sample(self):
+        if self.median <= 0:
+            return 0.0
+        if self.distribution == 'uniform':
+            return self.median * random.uniform(1 - self.spread, 1 + self.spread)
+        if self.distribution == 'lognormal':
+            return self.median * math.exp(random.gauss(0, self.spread))
+        if self.distribution == 'exponential':
+            return random.expovariate(1 / self.median)
+        return self.median
+
+    def __str__(self):
+        if self.distribution == 'fixed':
+            return f"{self.median:g}s"
+        if self.distribution == 'exponential':
+            return f"exponential, mean {self.median:g}s"
+        return f"{self.distribution}, median {self.median:g}s, spread {self.spread:g}"
+
+class QuotaWindow:
+    """Requests and tokens admitted in the last 60 seconds, against per-minute limits (None = unlimited)."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.limits = {'requests': requests_per_minute, 'tokens': tokens_per_minute}
+        self.admitted = deque()  # (time, tokens)
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def admit(self, tokens=0):
+        """Count a request against the window if it fits. Returns (admitted, seconds until capacity frees up, x-ratelimit-* headers)."""
+        with self._lock:
+            now = time.time()
+            while self.admitted and self.admitted[0][0] <= now - 60:
+                self.tokens -= self.admitted.popleft()[1]
+            used = {'requests': len(self.admitted), 'tokens': self.tokens}
+            needed = {'requests': 1, 'tokens': tokens}
+            fits = all(not limit or used[kind] + needed[kind] <= limit for kind, limit in self.limits.items())
+            if fits:
+                self.admitted.append((now, tokens))
+                self.tokens += tokens
+                used = {kind: used[kind] + needed[kind] for kind in used}
+            # capacity comes back as the oldest admitted request leaves the window
+            reset = max(self.admitted[0][0] + 60 - now, 0) if self.admitted else 0
+            headers = {}
+            for kind, limit in self.limits.items():
+                if limit:
+                    headers[f'x-ratelimit-limit-{kind}'] = str(limit)
+                    headers[f'x-ratelimit-remaining-{kind}'] = str(max(limit - used[kind], 0))
+                    headers[f'x-ratelimit-reset-{kind}'] = f"{reset:.3f}s"
+            return fits, reset, headers
+
+class FaultInjector:
+    """Decides how a stand-in answers each request; see the module comment."""
+
+    def __init__(self, latency=None, error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0, quota=None):
+        self.latency = latency or Latency()
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.quota = quota or QuotaWindow()
+        self.counts = Counter()  # requests, ok, quota_429, injected_429, injected_5xx
+        self._lock = threading.Lock()
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts['requests'] += 1
+            self.counts[outcome] += 1
+
+    def check(self, tokens=0):
+        """Sleep for the request's latency and return (status, headers): 200 to answer normally, or the
+        429 / 5xx to send instead. 429s are answered straight away, as the real APIs do."""
+        admitted, reset, headers = self.quota.admit(tokens)
+        if not admitted:
+            self._count('quota_429')
+            return 429, dict(headers, **retry_after_headers(max(reset, 0.05)))
+        if random.random() < self.rate_limit_rate:
+            self._count('injected_429')
+            return 429, dict(headers, **retry_after_headers(self.retry_after))
+        time.sleep(self.latency.sample())
+        if random.random() < self.error_rate:
+            self._count('injected_5xx')
+            return random.choice((500, 503)), headers
+        self._count('ok')
+        return 200, headers
+
+    def summary(self):
+        c = self.counts
+        return (f"{c['requests']} requests: {c['ok']} answered, {c['quota_429'] + c['injected_429']} 429s "
+                f"({c['quota_429']} over quota, {c['injected_429']} injected), {c['injected_5xx']} injected 5xx")
+
+def retry_after_headers(seconds):
+    return {'retry-after': f"{seconds:.3f}", 'retry-after-ms': str(int(seconds * 1000))}
+
+def add_fault_arguments(parser, latency_help="latency of every answer, e.g. 0.5 or lognormal:2:0.6 (default: 0)"):
+    parser.add_argument('--latency', type=Latency.parse, default=Latency(), help=latency_help)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with a 500/503 (default: 0)")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="fraction of requests answered with a 429 regardless of quota (default: 0)")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="retry-after seconds sent with injected 429s (default: 1)")
+    parser.add_argument('--rpm', type=int, default=None, help="requests per minute before answering 429 (default: unlimited)")
+    parser.add_argument('--tpm', type=int, default=None, help="tokens per minute before answering 429 (default: unlimited)")
+
+def faults_from_args(args):
+    return FaultInjector(args.latency, args.error_rate, args.rate_limit_rate, args.retry_after, QuotaWindow(args.rpm, args.tpm))
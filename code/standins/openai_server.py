@@ -0,0 +1,284 @@
+# === LOCAL OPENAI STAND-IN ===
+# A small HTTP server that mimics the OpenAI endpoints llm-extractor.py uses, so batch mode and
+# concurrency changes can be exercised without spending money:
+#   POST /v1/files                 upload a batch request file (multipart)
+#   GET  /v1/files/{id}/content    download an uploaded, output or error file
+#   POST /v1/batches               create a batch from an uploaded file
+#   GET  /v1/batches/{id}          batch status; completes `batch_latency` seconds after creation
+#   POST /v1/chat/completions      canned extraction response (one block per document when packed)
+# Chat completions go through a FaultInjector (standins/faults.py): configurable latency distribution,
+# 5xx and 429 rates, and a requests/tokens-per-minute quota reported in x-ratelimit-* headers. Answers can
+# be canned per file with --responses, a JSON object of {filename: answer text} ("*" for every other file).
+#
+# Usage (from code/):
+#   python -m standins.openai_server --port 8123 --batch-latency 5
+#   python -m standins.openai_server --latency lognormal:2:0.6 --error-rate 0.02 --rate-limit-rate 0.02 --rpm 500
+#   OPENAI_BASE_URL=http://127.0.0.1:8123/v1 OPENAI_API_KEY=test python llm-extractor.py --batch --batch-poll-interval 2
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from standins.faults import FaultInjector, add_fault_arguments, faults_from_args
+
+def load_responses(path):
+    """Canned answers from a JSON file of {filename: answer text}; None when no file is given."""
+    if not path:
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def canned_extraction(user_content, responses=None):
+    """The answer canned for the document's filename if there is one; otherwise a well-formed 12-field answer
+    whose year and dates follow the filename when it starts with a year."""
+    if responses:
+        filename = re.search(r'FILENAME:\s*(.+)', user_content)
+        answer = responses.get(filename.group(1).strip() if filename else '', responses.get('*'))
+        if answer is not None:
+            return answer
+    match = re.search(r'FILENAME:\s*(\d{4})', user_content)
+    year = match.group(1) if match else '2020'
+    return '\n'.join([
+        'PROJECT: stand-in cloud seeding program',
+        f'YEAR: {year}',
+        'SEASON: winter',
+        'STATE: utah',
+        'OPERATOR AFFILIATION: north american weather consultants',
+        'AGENT: silver iodide',
+        'APPARATUS: ground',
+        'PURPOSE: augment snowpack',
+        'TARGET AREA: wasatch mountains',
+        'CONTROL AREA: ',
+        f'START DATE: 11/01/{int(year) - 1}',
+        f'END DATE: 04/15/{year}',
+    ])
+
+def canned_answer(user_content, responses=None):
+    """One field block, or one '### DOCUMENT k' block per document for packed requests."""
+    documents = re.findall(r'=== DOCUMENT (\d+) ===\n(.*?)\n=== END DOCUMENT \1 ===', user_content, re.DOTALL)
+    if not documents:
+        return canned_extraction(user_content, responses)
+    return '\n\n'.join(f'### DOCUMENT {k}\n{canned_extraction(text, responses)}' for k, text in documents)
+
+def prompt_tokens_of(messages):
+    return sum(len(m.get('content', '')) for m in messages) // 4
+
+def completion_body(model, messages, responses=None):
+    content = canned_answer(messages[-1]['content'] if messages else '', responses)
+    prompt_tokens = prompt_tokens_of(messages)
+    completion_tokens = len(content) // 4
+    return {
+        'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop',
+        }],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        },
+    }
+
+class StandInState:
+    def __init__(self, batch_latency=5.0, batch_failure_rate=0.0, faults=None, responses=None):
+        self.batch_latency = batch_latency
+        self.batch_failure_rate = batch_failure_rate
+        self.faults = faults or FaultInjector()  # applied to chat completions
+        self.responses = responses
+        self.files = {}    # id -> {'meta': {...}, 'content': bytes}
+        self.batches = {}  # id -> batch dict
+        self.lock = threading.Lock()
+
+    def add_file(self, filename, content, purpose):
+        file_id = f'file-{uuid.uuid4().hex[:24]}'
+        meta = {
+            'id': file_id,
+            'object': 'file',
+            'bytes': len(content),
+            'created_at': int(time.time()),
+            'filename': filename,
+            'purpose': purpose,
+            'status': 'processed',
+        }
+        with self.lock:
+            self.files[file_id] = {'meta': meta, 'content': content}
+        return meta
+
+    def create_batch(self, input_file_id, endpoint, completion_window):
+        with self.lock:
+            if input_file_id not in self.files:
+                return None
+            total = sum(1 for line in self.files[input_file_id]['content'].splitlines() if line.strip())
+        batch_id = f'batch_{uuid.uuid4().hex[:24]}'
+        batch = {
+            'id': batch_id,
+            'object': 'batch',
+            'endpoint': endpoint,
+            'input_file_id': input_file_id,
+            'completion_window': completion_window,
+            'status': 'validating',
+            'output_file_id': None,
+            'error_file_id': None,
+            'created_at': int(time.time()),
+            'request_counts': {'total': total, 'completed': 0, 'failed': 0},
+        }
+        with self.lock:
+            self.batches[batch_id] = batch
+        return batch
+
+    def refresh_batch(self, batch_id):
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if not batch or batch['status'] == 'completed':
+                return batch
+            elapsed = time.time() - batch['created_at']
+            if elapsed < self.batch_latency:
+                batch['status'] = 'in_progress' if elapsed > self.batch_latency / 4 else 'validating'
+                return batch
+            requests = [json.loads(line) for line in self.files[batch['input_file_id']]['content'].splitlines() if line.strip()]
+
+        outputs, errors = [], []
+        for request in requests:
+            if random.random() < self.batch_failure_rate:
+                errors.append({
+                    'id': f'batch_req_{uuid.uuid4().hex[:12]}',
+                    'custom_id': request['custom_id'],
+                    'response': None,
+                    'error': {'code': 'server_error', 'message': 'stand-in injected failure'},
+                })
+                continue
+            body = completion_body(request['body']['model'], request['body']['messages'], self.responses)
+            outputs.append({
+                'id': f'batch_req_{uuid.uuid4().hex[:12]}',
+                'custom_id': request['custom_id'],
+                'response': {'status_code': 200, 'request_id': uuid.uuid4().hex, 'body': body},
+                'error': None,
+            })
+
+        def to_jsonl(records):
+            return ''.join(json.dumps(r) + '\n' for r in records).encode('utf-8')
+
+        output_meta = self.add_file(f'{batch_id}_output.jsonl', to_jsonl(outputs), 'batch_output')
+        error_meta = self.add_file(f'{batch_id}_error.jsonl', to_jsonl(errors), 'batch_output') if errors else None
+        with self.lock:
+            batch.update(
+                status='completed',
+                completed_at=int(time.time()),
+                output_file_id=output_meta['id'],
+                error_file_id=error_meta['id'] if error_meta else None,
+                request_counts={'total': len(requests), 'completed': len(outputs), 'failed': len(errors)},
+            )
+            return batch
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # keep the console quiet under load
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _not_found(self):
+            self._send_json(404, {'error': {'message': f'no route for {self.command} {self.path}', 'type': 'invalid_request_error'}})
+
+        def _read_body(self):
+            return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        def do_POST(self):
+            path = self.path.split('?')[0]
+            if path == '/v1/files':
+                raw = self._read_body()
+                message = BytesParser(policy=default_policy).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8') + raw
+                )
+                fields = {}
+                for part in message.iter_parts():
+                    name = part.get_param('name', header='content-disposition')
+                    fields[name] = (part.get_filename(), part.get_payload(decode=True))
+                filename, content = fields.get('file', ('upload.jsonl', b''))
+                purpose = fields.get('purpose', (None, b'batch'))[1].decode('utf-8')
+                self._send_json(200, state.add_file(filename, content, purpose))
+            elif path == '/v1/batches':
+                payload = json.loads(self._read_body() or b'{}')
+                batch = state.create_batch(payload.get('input_file_id'), payload.get('endpoint'), payload.get('completion_window', '24h'))
+                if batch is None:
+                    self._send_json(400, {'error': {'message': 'unknown input_file_id', 'type': 'invalid_request_error'}})
+                else:
+                    self._send_json(200, batch)
+            elif path == '/v1/chat/completions':
+                payload = json.loads(self._read_body() or b'{}')
+                messages = payload.get('messages', [])
+                status, headers = state.faults.check(prompt_tokens_of(messages))
+                if status == 429:
+                    error = {'message': 'Rate limit reached (stand-in)', 'type': 'requests', 'code': 'rate_limit_exceeded'}
+                    self._send_json(429, {'error': error}, headers)
+                elif status != 200:
+                    self._send_json(status, {'error': {'message': 'stand-in injected server error', 'type': 'server_error', 'code': None}}, headers)
+                else:
+                    self._send_json(200, completion_body(payload.get('model', ''), messages, state.responses), headers)
+            else:
+                self._not_found()
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            match = re.fullmatch(r'/v1/batches/([\w-]+)', path)
+            if match:
+                batch = state.refresh_batch(match.group(1))
+                return self._send_json(200, batch) if batch else self._not_found()
+            match = re.fullmatch(r'/v1/files/([\w-]+)/content', path)
+            if match and match.group(1) in state.files:
+                content = state.files[match.group(1)]['content']
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+                return
+            match = re.fullmatch(r'/v1/files/([\w-]+)', path)
+            if match and match.group(1) in state.files:
+                return self._send_json(200, state.files[match.group(1)]['meta'])
+            self._not_found()
+
+    return Handler
+
+def serve(port=8123, batch_latency=5.0, batch_failure_rate=0.0, host='127.0.0.1', faults=None, responses=None):
+    """Start the stand-in in a background thread and return the server (call .shutdown() to stop it); its state is server.state."""
+    state = StandInState(batch_latency, batch_failure_rate, faults, responses)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI files, batches and chat completions endpoints.")
+    parser.add_argument('--port', type=int, default=8123)
+    parser.add_argument('--batch-latency', type=float, default=5.0, help="seconds before a batch completes (default: 5)")
+    parser.add_argument('--batch-failure-rate', type=float, default=0.0, help="fraction of batch requests that fail (default: 0)")
+    parser.add_argument('--responses', default=None, help="JSON file of canned answers, {filename: answer text}; \"*\" answers every other file")
+    add_fault_arguments(parser, latency_help="latency of each chat completion, e.g. 2 or lognormal:2:0.6 (default: 0)")
+    args = parser.parse_args()
+    state = StandInState(args.batch_latency, args.batch_failure_rate, faults_from_args(args), load_responses(args.responses))
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(state))
+    print(f"OpenAI stand-in listening on http://127.0.0.1:{args.port}/v1 (latency {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nChat completions: {state.faults.summary()}")
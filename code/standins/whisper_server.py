@@ -0,0 +1,174 @@
+# === LOCAL LLM WHISPERER STAND-IN ===
+# A small HTTP server that mimics the LLM Whisperer v2 endpoints the extractor uses, with job latency,
+# so the job manager (extractor/whisper_jobs.py) can be exercised without spending credits:
+#   POST /whisper               accept a file (raw body), answer 202 with a whisper_hash
+#   GET  /whisper-status        'processing' until the job's latency has passed, then 'processed' (or 'error')
+#   GET  /whisper-retrieve      {'result_text': ...}: the PDF's native text, or a canned Form 17-4 page
+# Any path prefix is accepted, so point LLMWHISPERER_BASE_URL_V2 at http://127.0.0.1:<port>/api/v2.
+# Job latency follows --job-latency-distribution (uniform, lognormal, exponential; see standins/faults.py).
+# Every request also goes through a FaultInjector: HTTP latency, 5xx and 429 rates and a requests-per-minute
+# quota. --canned-text answers every job with the text of one file instead of the uploaded PDF's text.
+#
+# Usage (from code/):
+#   python -m standins.whisper_server --port 8126 --job-latency 10
+#   python -m standins.whisper_server --job-latency 20 --job-latency-distribution lognormal --latency-jitter 0.8 --rate-limit-rate 0.05
+#   LLMWHISPERER_BASE_URL_V2=http://127.0.0.1:8126/api/v2 LLMWHISPERER_API_KEY=test python llm-extractor.py --staged
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pymupdf
+
+from standins.faults import FaultInjector, Latency, add_fault_arguments, faults_from_args
+
+CANNED_TEXT = "\n".join([
+    "U.S. DEPARTMENT OF COMMERCE                         NOAA FORM 17-4",
+    "INITIAL REPORT ON WEATHER MODIFICATION ACTIVITIES",
+    "1. PROJECT OR ACTIVITY DESIGNATION:                 6. DATES OF PROJECT",
+    "   Stand-in Cloud Seeding Program                   DATE FIRST ACTUAL WEATHER MODIFICATION 11/01/2019",
+    "2. PURPOSE OF PROJECT OR ACTIVITY:                  EXPECTED TERMINATION DATE 04/15/2020",
+    "   Augment snowpack",
+    "3. SPONSOR:                                         4. OPERATOR:",
+    "   Stand-in Water Conservancy District              North American Weather Consultants",
+    "5. TARGET AND CONTROL AREAS:",
+    "   TARGET AREA: Wasatch Mountains                   CONTROL AREA: None",
+    "7. DESCRIPTION OF WEATHER MODIFICATION APPARATUS, MODIFICATION AGENTS AND THEIR DISPERSAL RATES:",
+    "   Ground based silver iodide generators operated during winter storm periods.",
+])
+
+def page_text(content):
+    """First-page text of an uploaded PDF, or the canned page when it has none (scans, images)."""
+    try:
+        with pymupdf.open(stream=content, filetype='pdf') as doc:
+            text = doc[0].get_text() if doc.page_count else ''
+    except Exception:
+        text = ''
+    return text if len(text.strip()) > 100 else CANNED_TEXT
+
+class StandInState:
+    def __init__(self, job_latency=5.0, latency_jitter=0.5, failure_rate=0.0, faults=None, job_latency_distribution='uniform', canned_text=None):
+        # uniform: each job takes job_latency * uniform(1 - jitter, 1 + jitter); lognormal: jitter is sigma
+        self.job_latency = Latency(job_latency_distribution, job_latency, latency_jitter)
+        self.failure_rate = failure_rate
+        self.faults = faults or FaultInjector()  # applied to every request
+        self.canned_text = canned_text
+        self.jobs = {}  # whisper_hash -> {'ready_at', 'failed', 'text'}
+        self.submissions = 0
+        self.status_checks = 0
+        self.lock = threading.Lock()
+
+    def submit(self, content):
+        latency = self.job_latency.sample()
+        whisper_hash = uuid.uuid4().hex
+        with self.lock:
+            self.submissions += 1
+            self.jobs[whisper_hash] = {
+                'ready_at': time.time() + latency,
+                'failed': random.random() < self.failure_rate,
+                'text': self.canned_text or page_text(content),
+            }
+        return whisper_hash
+
+    def status(self, whisper_hash):
+        with self.lock:
+            self.status_checks += 1
+            job = self.jobs.get(whisper_hash)
+        if not job:
+            return None
+        if time.time() < job['ready_at']:
+            return {'status': 'processing', 'message': 'Whisper Job is being processed'}
+        if job['failed']:
+            return {'status': 'error', 'message': 'stand-in injected failure'}
+        return {'status': 'processed', 'message': 'Whisper Job processed'}
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # keep the console quiet under load
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _fault(self):
+            """Answer with an injected 429 / 5xx and return True, or return False to answer normally."""
+            status, headers = state.faults.check()
+            if status == 200:
+                return False
+            message = 'Rate limit exceeded (stand-in)' if status == 429 else 'stand-in injected server error'
+            self._send_json(status, {'message': message}, headers)
+            return True
+
+        def _unknown_hash(self):
+            self._send_json(400, {'message': 'Invalid whisper_hash'})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if not url.path.endswith('/whisper'):
+                return self._send_json(404, {'message': f'no route for POST {url.path}'})
+            content = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self._fault():
+                return
+            whisper_hash = state.submit(content)
+            self._send_json(202, {'message': 'Whisper Job Accepted', 'status': 'processing', 'whisper_hash': whisper_hash})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            whisper_hash = parse_qs(url.query).get('whisper_hash', [''])[0]
+            if url.path.endswith(('/whisper-status', '/whisper-retrieve')) and self._fault():
+                return
+            if url.path.endswith('/whisper-status'):
+                status = state.status(whisper_hash)
+                return self._send_json(200, status) if status else self._unknown_hash()
+            if url.path.endswith('/whisper-retrieve'):
+                status = state.status(whisper_hash)
+                if not status:
+                    return self._unknown_hash()
+                if status['status'] != 'processed':
+                    return self._send_json(400, {'message': f"Whisper job is {status['status']}"})
+                return self._send_json(200, {'result_text': state.jobs[whisper_hash]['text'], 'confidence_metadata': [], 'metadata': {}})
+            self._send_json(404, {'message': f'no route for GET {url.path}'})
+
+    return Handler
+
+def serve(port=8126, job_latency=5.0, latency_jitter=0.5, failure_rate=0.0, host='127.0.0.1', faults=None, job_latency_distribution='uniform', canned_text=None):
+    """Start the stand-in in a background thread and return the server (call .shutdown() to stop it); its state is server.state."""
+    state = StandInState(job_latency, latency_jitter, failure_rate, faults, job_latency_distribution, canned_text)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in for the LLM Whisperer v2 whisper, status and retrieve endpoints.")
+    parser.add_argument('--port', type=int, default=8126)
+    parser.add_argument('--job-latency', type=float, default=5.0, help="average seconds before a job is processed (default: 5)")
+    parser.add_argument('--latency-jitter', type=float, default=0.5, help="relative spread of job latency (default: 0.5)")
+    parser.add_argument('--job-latency-distribution', choices=Latency.DISTRIBUTIONS, default='uniform',
+                        help="distribution of job latency; --latency-jitter is the relative spread (uniform) or sigma (lognormal) (default: uniform)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="fraction of jobs that end in an error (default: 0)")
+    parser.add_argument('--canned-text', default=None, help="text file returned by every job instead of the uploaded PDF's text")
+    add_fault_arguments(parser, latency_help="latency of every HTTP request (upload, status, retrieve), e.g. 0.2 or lognormal:0.3:0.5 (default: 0)")
+    args = parser.parse_args()
+    canned_text = None
+    if args.canned_text:
+        with open(args.canned_text, encoding='utf-8') as f:
+            canned_text = f.read()
+    state = StandInState(args.job_latency, args.latency_jitter, args.failure_rate, faults_from_args(args), args.job_latency_distribution, canned_text)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(state))
+    print(f"LLM Whisperer stand-in listening on http://127.0.0.1:{args.port}/api/v2 (job latency {state.job_latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nHTTP requests: {state.faults.summary()}; {state.submissions} jobs submitted, {state.status_checks} status checks")
@@ -0,0 +1,86 @@
+# Compares the first-page rasterization backends in extractor/rasterize.py (PyMuPDF pixmap vs pdf2image/poppler)
+# on per-file latency and peak RSS. Each backend runs in its own subprocess so peak RSS isn't shared;
+# pdftoppm's own memory shows up as the children's peak RSS.
+# Run from code/tests/: python benchmark-rasterize.py --input-dir ../../noaa-files --limit 50 [--ocr]
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, '..')
+from extractor.rasterize import RASTER_BACKENDS, render_first_page, ocr_first_page
+
+def peak_rss_mb(who):
+    kb = resource.getrusage(who).ru_maxrss
+    return kb / 1024 / (1024 if sys.platform == 'darwin' else 1)  # ru_maxrss is bytes on macOS, KB on Linux
+
+def run_backend(backend, files, dpi, grayscale, ocr):
+    latencies = []
+    errors = 0
+    for file_path in files:
+        started = time.perf_counter()
+        try:
+            if ocr:
+                ocr_first_page(file_path, dpi=dpi, grayscale=grayscale, backend=backend)
+            else:
+                render_first_page(file_path, dpi=dpi, grayscale=grayscale, backend=backend)
+        except Exception as e:
+            errors += 1
+            print(f"{backend} failed on {os.path.basename(file_path)}: {e}", file=sys.stderr)
+            continue
+        latencies.append(time.perf_counter() - started)
+    return {
+        'backend': backend,
+        'files': len(latencies),
+        'errors': errors,
+        'mean_ms': statistics.mean(latencies) * 1000 if latencies else None,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'max_ms': max(latencies) * 1000 if latencies else None,
+        'peak_rss_mb': peak_rss_mb(resource.RUSAGE_SELF),
+        'children_peak_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+def fmt(value):
+    return f"{value:.1f}" if value is not None else '-'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark first-page rasterization backends.")
+    parser.add_argument('--input-dir', default='../../noaa-files')
+    parser.add_argument('--limit', type=int, default=50, help="number of PDFs to render (default: 50)")
+    parser.add_argument('--dpi', type=int, default=200)
+    parser.add_argument('--color', action='store_true', help="render RGB instead of grayscale")
+    parser.add_argument('--ocr', action='store_true', help="include tesseract in the timed section")
+    parser.add_argument('--backends', nargs='+', default=list(RASTER_BACKENDS), choices=RASTER_BACKENDS)
+    parser.add_argument('--worker', choices=RASTER_BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    files = sorted(
+        os.path.join(args.input_dir, f) for f in os.listdir(args.input_dir) if f.lower().endswith('.pdf')
+    )[:args.limit]
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, files, args.dpi, not args.color, args.ocr)))
+        sys.exit(0)
+
+    if args.ocr and not shutil.which('tesseract'):
+        sys.exit("--ocr needs the tesseract binary on PATH")
+    print(f"Rendering page 1 of {len(files)} PDFs at {args.dpi} DPI ({'RGB' if args.color else 'grayscale'}{', with OCR' if args.ocr else ''})\n")
+    rows = []
+    for backend in args.backends:
+        command = [sys.executable, __file__, '--worker', backend, '--input-dir', args.input_dir, '--limit', str(args.limit), '--dpi', str(args.dpi)]
+        command += ['--color'] * args.color + ['--ocr'] * args.ocr
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0 or not result.stdout.strip():
+            print(f"{backend}: benchmark failed\n{result.stderr}")
+            continue
+        rows.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    print(f"{'backend':<10} {'files':>5} {'errors':>6} {'mean ms':>8} {'p50 ms':>8} {'max ms':>8} {'peak RSS MB':>12} {'children MB':>12}")
+    for row in rows:
+        print(f"{row['backend']:<10} {row['files']:>5} {row['errors']:>6} {fmt(row['mean_ms']):>8} {fmt(row['p50_ms']):>8} "
+              f"{fmt(row['max_ms']):>8} {fmt(row['peak_rss_mb']):>12} {fmt(row['children_peak_rss_mb']):>12}")
@@ -0,0 +1,269 @@
+# Micro-benchmarks of the extractor's per-file stages and the dataset scripts, on synthetic Form 17-4 PDFs
+# generated on the fly (no APIs, no corpus): a digital PDF with a text layer, a rasterized scan of it, and
+# a noisy scan (speckle, skew, faded contrast). Each stage runs `--warmup` times, then `--repeats` timed
+# runs; the median per-item time is compared with a stored baseline and the run fails (exit 1) when any
+# stage is more than `--threshold` slower. Stages that need tesseract are skipped when it isn't installed.
+# Run from code/tests/:
+#   python benchmark-stages.py --save-baseline        # record this machine's baseline
+#   python benchmark-stages.py                        # compare against it
+#   python benchmark-stages.py --stages parse_gpt_response clean_dataset --repeats 10
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pymupdf
+
+sys.path.insert(0, '..')
+from extractor.compaction import compact_text
+from extractor.rasterize import render_first_page
+from extractor.triage import triage_pdf
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def load_script(name, path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+extractor = load_script('llm_extractor', '../llm-extractor.py')
+cleaner = load_script('clean_dataset', '../clean-dataset.py')
+comparator = load_script('compare_to_golden', '../evals/compare-to-golden.py')
+
+STATES = [('UT', 'utah'), ('CO', 'colorado'), ('ID', 'idaho'), ('WY', 'wyoming'), ('NV', 'nevada'), ('CA', 'california'), ('TX', 'texas'), ('ND', 'north dakota')]
+OPERATORS = ['North American Weather Consultants', 'Weather Modification Inc', 'Atmospherics Inc', 'Western Weather Consultants LLC', 'RHS Consulting Ltd']
+AGENTS = ['Silver Iodide', 'Silver iodide, sodium iodide', 'AgI and dry ice', 'Calcium chloride', 'Silver iodide; hygroscopic flares']
+APPARATUS = [('ground', 'Ground based generators'), ('airborne', 'Aircraft with wing-tip flares'), ('ground, airborne', 'Ground generators and aircraft')]
+PURPOSES = ['Augment snowpack', 'Increase rainfall', 'Hail suppression', 'Augment winter precipitation', 'Fog dispersal at airport']
+AREAS = ['Wasatch Mountains', 'Upper Gunnison River Basin', 'Kern River watershed', 'Medicine Bow Range', 'Western Kansas counties']
+CHECKLIST = [
+    "Have you complied with all applicable state and local laws and regulations?",
+    "Is the operation covered by an environmental impact statement or assessment?",
+    "Were suspension criteria established for flooding, avalanche or severe weather?",
+    "Are seeding operations terminated when public safety may be affected?",
+    "Will seeding be conducted near international boundaries or tribal lands?",
+]
+
+# === SYNTHETIC FORM 17-4 GENERATION ===
+
+def synthetic_form(i, rng):
+    """(filename, form text, golden row) for one synthetic Form 17-4."""
+    year = 2000 + i % 25
+    code, state = STATES[i % len(STATES)]
+    operator, agent, purpose, area = rng.choice(OPERATORS), rng.choice(AGENTS), rng.choice(PURPOSES), rng.choice(AREAS)
+    apparatus, apparatus_text = rng.choice(APPARATUS)
+    filename = f"{year}{code}SYN-{i}.pdf"
+    lines = [
+        "U.S. DEPARTMENT OF COMMERCE                                   NOAA FORM 17-4",
+        "INITIAL REPORT ON WEATHER MODIFICATION ACTIVITIES",
+        "1. PROJECT OR ACTIVITY DESIGNATION:",
+        f"   {area} Cloud Seeding Program {i}",
+        "2. PURPOSE OF PROJECT OR ACTIVITY:",
+        f"   {purpose}",
+        "3. SPONSOR: name, affiliation and address",
+        f"   {state.title()} Water Conservancy District",
+        "4. OPERATOR: name, affiliation and address",
+        f"   {operator}",
+        "5. TARGET AND CONTROL AREAS:",
+        f"   TARGET AREA: {area}           CONTROL AREA: none",
+        "6. DATES OF PROJECT",
+        f"   DATE FIRST ACTUAL WEATHER MODIFICATION: 11/01/{year - 1}",
+        f"   EXPECTED TERMINATION DATE: 04/15/{year}",
+        "7. DESCRIPTION OF WEATHER MODIFICATION APPARATUS, MODIFICATION AGENTS AND THEIR DISPERSAL RATES:",
+        f"   {apparatus_text} dispersing {agent} at 10-20 g/hr during storm periods.",
+        "8. SAFETY CHECKLIST",
+    ] + [f"   {question}  [X] YES  [ ] NO" for question in CHECKLIST] + [
+        "Complete in accordance with instructions. Knowing and willful violation of P.L. 92-205 shall subject the",
+        "person to a fine of not more than $10,000. Form approved OMB No. 0648-0025.",
+    ]
+    golden = {
+        'filename': filename, 'project': f"{area} cloud seeding program {i}".lower(), 'year': year, 'season': 'winter',
+        'state': state, 'operator_affiliation': operator.lower(), 'agent': agent.lower(), 'apparatus': apparatus,
+        'purpose': purpose.lower(), 'target_area': area.lower(), 'control_area': '',
+        'start_date': f"11/01/{year - 1}", 'end_date': f"04/15/{year}",
+    }
+    return filename, '\n'.join(lines), golden
+
+def write_digital(path, text):
+    doc = pymupdf.open()
+    page = doc.new_page()  # letter-size
+    page.insert_textbox(pymupdf.Rect(36, 36, 576, 756), text, fontsize=8.5, fontname='cour')
+    doc.save(path)
+    doc.close()
+
+def write_scan(path, digital_path, rng, noisy=False, dpi=150):
+    """An image-only PDF of the digital page, optionally with speckle, skew and faded contrast."""
+    with pymupdf.open(digital_path) as src:
+        pix = src[0].get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width).astype(np.int16)
+    if noisy:
+        nprng = np.random.default_rng(rng.randrange(1 << 30))
+        pixels = 60 + pixels * 0.7 + nprng.normal(0, 18, pixels.shape)  # faded, grainy
+        speckle = nprng.random(pixels.shape)
+        pixels[speckle < 0.01] = 0
+        pixels[speckle > 0.995] = 255
+        for row in range(pixels.shape[0]):  # ~1 degree skew
+            pixels[row] = np.roll(pixels[row], row // 60)
+    pixels = np.clip(pixels, 0, 255).astype(np.uint8)
+    image = pymupdf.Pixmap(pymupdf.csGRAY, pix.width, pix.height, pixels.tobytes(), 0)
+    doc = pymupdf.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=image)
+    doc.save(path)
+    doc.close()
+
+def canned_response(golden):
+    """What the LLM answers for a form, in the prompt's FIELD: value format."""
+    labels = ['PROJECT', 'YEAR', 'SEASON', 'STATE', 'OPERATOR AFFILIATION', 'AGENT', 'APPARATUS', 'PURPOSE', 'TARGET AREA', 'CONTROL AREA', 'START DATE', 'END DATE']
+    return '\n'.join(f"{label}: {value}" for label, value in zip(labels, list(golden.values())[1:]))
+
+def noisy_output(golden, rng):
+    """An extracted row with the kinds of error the golden comparison has to judge."""
+    row = dict(golden)
+    if rng.random() < 0.2:
+        row['agent'] = rng.choice(['agi', 'silver iodide, dry ice', 'co2'])
+    if rng.random() < 0.2:
+        row['start_date'] = f"12/{rng.randint(1, 28):02d}/{golden['year'] - 1}"
+    if rng.random() < 0.1:
+        row['operator_affiliation'] = row['operator_affiliation'].replace('inc', 'incorporated')
+    if rng.random() < 0.1:
+        row['year'] = golden['year'] + 1
+    return row
+
+def ocr_noise(text, rng, rate=0.05):
+    """Text with OCR-like character substitutions."""
+    swaps = {'o': '0', 'l': '1', 'e': 'c', 'i': 'l', 'a': 'o', 's': '5'}
+    return ''.join(swaps.get(c, c) if rng.random() < rate else c for c in text)
+
+# === BENCHMARK HARNESS ===
+
+def time_stage(fn, items, warmup, repeats):
+    """Median and min milliseconds per item over `repeats` passes, after `warmup` untimed passes."""
+    with contextlib.redirect_stdout(io.StringIO()):  # the extractor prints per file
+        for _ in range(warmup):
+            for item in items:
+                fn(item)
+        runs = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for item in items:
+                fn(item)
+            runs.append((time.perf_counter() - started) * 1000 / len(items))
+    return {'median_ms': statistics.median(runs), 'min_ms': min(runs), 'items': len(items), 'repeats': repeats}
+
+def build_stages(work_dir, files, rows, seed):
+    """{stage name: (fn, items)}, or a reason string for stages that can't run here."""
+    rng = random.Random(seed)
+    forms = [synthetic_form(i, rng) for i in range(max(files, 1))]
+    paths = {'digital': [], 'scan': [], 'noisy': []}
+    for filename, text, _ in forms[:files]:
+        digital = os.path.join(work_dir, filename)
+        write_digital(digital, text)
+        paths['digital'].append(digital)
+        for variant in ('scan', 'noisy'):
+            paths[variant].append(os.path.join(work_dir, f"{variant}-{filename}"))
+            write_scan(paths[variant][-1], digital, rng, noisy=variant == 'noisy')
+
+    texts = [text for _, text, _ in forms]
+    responses = [canned_response(golden) for _, _, golden in forms]
+    golden_rows = [synthetic_form(i, rng)[2] for i in range(rows)]
+    raw_csv = os.path.join(work_dir, 'raw.csv')
+    pd.DataFrame([{**row, 'agent': row['agent'].upper()} for row in golden_rows]).to_csv(raw_csv, index=False)
+    golden_csv = os.path.join(work_dir, 'golden.csv')
+    pd.DataFrame(golden_rows).to_csv(golden_csv, index=False)
+    output_csv = os.path.join(work_dir, 'output.csv')
+    pd.DataFrame([noisy_output(row, rng) for row in golden_rows]).to_csv(output_csv, index=False)
+    cleaned_csv = os.path.join(work_dir, 'cleaned.csv')
+
+    has_tesseract = shutil.which('tesseract') is not None
+    no_tesseract = "tesseract not installed"
+    return {
+        'extract_local_text[digital]': (lambda path: extractor.extract_local_text(path, 'pymu'), paths['digital']),
+        'extract_local_text[scan]': (lambda path: extractor.extract_local_text(path, 'pymu'), paths['scan']) if has_tesseract else no_tesseract,
+        'extract_local_text[noisy]': (lambda path: extractor.extract_local_text(path, 'pymu'), paths['noisy']) if has_tesseract else no_tesseract,
+        'triage_pdf[digital]': (triage_pdf, paths['digital']),
+        'triage_pdf[scan]': (triage_pdf, paths['scan']),
+        'render_first_page[scan]': (lambda path: render_first_page(path, dpi=extractor.OCR_DPI, grayscale=extractor.OCR_GRAYSCALE, backend=extractor.OCR_RASTER_BACKEND), paths['scan']),
+        'match_key_phrases[clean]': (extractor.FORM_17_4_MATCHER.match, texts),
+        'match_key_phrases[ocr-noise]': (extractor.FORM_17_4_MATCHER.match, [ocr_noise(text, rng) for text in texts]),
+        'compact_text': (compact_text, texts),
+        'parse_gpt_response': (extractor.parse_gpt_response, responses),
+        f'clean_dataset[{rows} rows]': (lambda _: cleaner.clean_dataset(raw_csv, cleaned_csv, full_rebuild=True), [None]),
+        f'compute_field_accuracy[{rows} rows]': (lambda _: comparator.compute_field_accuracy(output_csv, golden_csv, workers=1), [None]),
+    }
+
+def compare(results, baseline, threshold):
+    """Print each stage against the baseline; returns the names of stages that regressed past the threshold."""
+    regressions = []
+    print(f"\n{'stage':40s} {'median ms':>10s} {'min ms':>9s} {'baseline':>9s} {'change':>8s}")
+    for name, result in results.items():
+        if isinstance(result, str):
+            print(f"{name:40s} skipped: {result}")
+            continue
+        base = baseline.get(name, {}).get('median_ms')
+        change = (result['median_ms'] / base - 1) if base else None
+        flag = ''
+        if change is not None and change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:40s} {result['median_ms']:10.3f} {result['min_ms']:9.3f} {base if base is not None else float('nan'):9.3f} "
+              f"{f'{change:+.0%}' if change is not None else '-':>8s}{flag}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline per-stage micro-benchmarks on synthetic Form 17-4 PDFs.")
+    parser.add_argument('--files', type=int, default=10, help="synthetic PDFs per variant (default: 10)")
+    parser.add_argument('--rows', type=int, default=2000, help="rows in the synthetic datasets for clean_dataset / compute_field_accuracy (default: 2000)")
+    parser.add_argument('--warmup', type=int, default=1, help="untimed passes before measuring (default: 1)")
+    parser.add_argument('--repeats', type=int, default=5, help="timed passes per stage; the median is reported (default: 5)")
+    parser.add_argument('--stages', nargs='+', default=None, help="only run stages whose name starts with one of these")
+    parser.add_argument('--seed', type=int, default=17)
+    parser.add_argument('--baseline', default='../../dataset/benchmarks/stage-baseline.json',
+                        help="baseline to compare with / save to (default: ../../dataset/benchmarks/stage-baseline.json)")
+    parser.add_argument('--save-baseline', action='store_true', help="write this run's timings as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="fail when a stage's median is more than this fraction slower than the baseline (default: 0.25)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        stages = build_stages(work_dir, args.files, args.rows, args.seed)
+        if args.stages:
+            stages = {name: stage for name, stage in stages.items() if name.startswith(tuple(args.stages))}
+        results = {}
+        for name, stage in stages.items():
+            results[name] = stage if isinstance(stage, str) else time_stage(*stage, args.warmup, args.repeats)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['stages']
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        measured = {name: result for name, result in results.items() if not isinstance(result, str)}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r') as f:
+                measured = {**json.load(f)['stages'], **measured}  # a partial run (--stages) updates only its stages
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'machine': platform.platform(), 'python': platform.python_version(), 'stages': measured}, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one.")
+    elif regressions:
+        print(f"\n{len(regressions)} stage(s) more than {args.threshold:.0%} slower than the baseline: {', '.join(regressions)}")
+        sys.exit(1)
+    else:
+        print(f"\nNo stage more than {args.threshold:.0%} slower than the baseline.")
@@ -0,0 +1,208 @@
+# Load test: pushes llm-extractor.py through the local OpenAI and LLM Whisperer stand-ins (no API spend) at
+# several concurrency levels and reports throughput and tail latency for each. The stand-ins answer with a
+# latency distribution, a share of 5xx errors and 429s (random ones, plus a per-minute quota reported in
+# x-ratelimit headers), so retries, backoff and the rate limiter all take part. The PDFs are synthetic
+# Form 17-4s (see benchmark-stages.py) whose canned answers the OpenAI stand-in returns, plus a share of
+# blank "scans" that go to Whisperer. Per-file latency comes from the stage spans each run writes
+# (extractor/metrics.py): first span start to last span end, so it excludes time queued before the file starts.
+# Run from code/tests/:
+#   python load-test-standins.py                                   # --async at concurrency 1, 4 and 16
+#   python load-test-standins.py --mode staged --concurrency 4 16 64 --files 200 --llm-latency lognormal:3:0.6
+#   python load-test-standins.py --rpm 120 --rate-limit-rate 0.05 --error-rate 0.05
+#   python load-test-standins.py --output ../../dataset/benchmarks/load-test.csv   # keep the results
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import pymupdf
+
+sys.path.insert(0, '..')
+from extractor.metrics import percentile
+from standins import openai_server, whisper_server
+from standins.faults import FaultInjector, Latency, QuotaWindow
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CODE_DIR = os.path.dirname(HERE)
+
+def load_script(name, path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+benchmark = load_script('benchmark_stages', 'benchmark-stages.py')
+
+def write_corpus(input_dir, files, scanned_fraction, seed):
+    """Digital synthetic forms plus blank scans; returns {filename: golden row} for the digital ones."""
+    rng = random.Random(seed)
+    golden = {}
+    scanned = round(files * scanned_fraction)
+    for i in range(files - scanned):
+        filename, text, row = benchmark.synthetic_form(i, rng)
+        benchmark.write_digital(os.path.join(input_dir, filename), text)
+        golden[filename] = row
+    for i in range(scanned):
+        doc = pymupdf.open()
+        doc.new_page()  # no text layer: PyMuPDF and OCR find nothing and the waterfall ends at Whisperer
+        doc.save(os.path.join(input_dir, f"{2000 + i % 25}UTSCAN-{i}.pdf"))
+    return golden
+
+def run_level(mode, concurrency, work_dir, input_dir, env, max_attempts):
+    """Run the extractor once at one concurrency level; returns (wall seconds, spans, output rows, return code)."""
+    run_dir = os.path.join(work_dir, f"{mode}-{concurrency}")
+    os.makedirs(run_dir)
+    path = lambda name: os.path.join(run_dir, name)
+    mode_args = {
+        'async': ['--async', '--concurrency', str(concurrency)],
+        'staged': ['--staged', '--io-workers', str(concurrency), '--ocr-workers', str(min(concurrency, os.cpu_count() or 1))],
+    }[mode]
+    started = time.perf_counter()
+    result = subprocess.run([
+        sys.executable, 'llm-extractor.py', *mode_args,
+        '--input-dir', input_dir,
+        '--output-file', path('out.csv'),
+        '--job-store', path('jobs.sqlite'),
+        '--whisper-jobs', path('whisper-jobs.json'),
+        '--whisper-poll-interval', '0.5',
+        '--whisper-max-poll-interval', '2',
+        '--triage-stats', path('triage-stats.json'),
+        '--scan-cache', path('scan-metrics.sqlite'),
+        '--compaction-report', path('compaction-report.csv'),
+        '--metrics-file', path('spans.jsonl'),
+        '--prometheus-file', path('stage-latency.prom'),
+        '--method-counts-file', path('pdf_method_counts.txt'),
+        '--no-text-cache', '--no-response-cache',
+        '--max-attempts', str(max_attempts),
+        '--max-consecutive-failures', '1000',
+    ], cwd=CODE_DIR, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode:
+        print(result.stdout[-2000:], result.stderr[-2000:])
+    spans = []
+    if os.path.exists(path('spans.jsonl')):
+        with open(path('spans.jsonl'), encoding='utf-8') as f:
+            spans = [json.loads(line) for line in f if line.strip()]
+    rows = []
+    if os.path.exists(path('out.csv')):
+        with open(path('out.csv'), newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    return wall, spans, rows, result.returncode
+
+def file_latencies(spans):
+    """Seconds from each written file's first span start to its last span end."""
+    written = {span['file'] for span in spans if span['stage'] == 'write' and span['status'] == 'ok'}
+    bounds = {}
+    for span in spans:
+        if span['file'] in written:
+            begin, end = span['start'], span['start'] + span['seconds']
+            low, high = bounds.get(span['file'], (begin, end))
+            bounds[span['file']] = (min(low, begin), max(high, end))
+    return [high - low for low, high in bounds.values()]
+
+def summarize(mode, concurrency, files, wall, spans, rows, golden, served):
+    latencies = file_latencies(spans)
+    llm = [span['seconds'] for span in spans if span['stage'] == 'llm-request' and span['status'] == 'ok']
+    ms = lambda values, q: round(percentile(values, q) * 1000) if values else None
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'files': files,
+        'written': len(latencies),
+        'correct': sum(1 for row in rows if row['filename'] in golden and row['project'] == golden[row['filename']]['project']),
+        'wall_s': round(wall, 2),
+        'files_per_min': round(len(latencies) / wall * 60, 1),
+        'file_p50_ms': ms(latencies, 50),
+        'file_p95_ms': ms(latencies, 95),
+        'file_p99_ms': ms(latencies, 99),
+        'llm_p50_ms': ms(llm, 50),
+        'llm_p99_ms': ms(llm, 99),
+        'retries': sum(span.get('retries', 0) for span in spans),
+        'served_429': served['quota_429'] + served['injected_429'],
+        'served_5xx': served['injected_5xx'],
+    }
+
+def print_table(results):
+    columns = ['concurrency', 'written', 'wall_s', 'files_per_min', 'file_p50_ms', 'file_p95_ms', 'file_p99_ms', 'llm_p50_ms', 'llm_p99_ms', 'retries', 'served_429', 'served_5xx']
+    print('\n' + ''.join(f"{column:>14}" for column in columns))
+    for result in results:
+        print(''.join(f"{'-' if result[column] is None else result[column]:>14}" for column in columns))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load-test llm-extractor.py against the OpenAI and LLM Whisperer stand-ins.")
+    parser.add_argument('--mode', choices=['async', 'staged'], default='async', help="extractor mode to drive (default: async)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16],
+                        help="levels to run: --concurrency for async, --io-workers for staged (default: 1 4 16)")
+    parser.add_argument('--files', type=int, default=40, help="PDFs per run (default: 40)")
+    parser.add_argument('--scanned-fraction', type=float, default=0.2, help="share of blank scans that go to Whisperer (default: 0.2)")
+    parser.add_argument('--llm-latency', type=Latency.parse, default=Latency('lognormal', 1.0, 0.5),
+                        help="chat completion latency (default: lognormal:1:0.5)")
+    parser.add_argument('--whisper-job-latency', type=Latency.parse, default=Latency('lognormal', 3.0, 0.5),
+                        help="Whisperer job latency, submission to processed (default: lognormal:3:0.5)")
+    parser.add_argument('--whisper-latency', type=Latency.parse, default=Latency('uniform', 0.05, 0.5),
+                        help="latency of each Whisperer HTTP request (default: uniform:0.05:0.5)")
+    parser.add_argument('--error-rate', type=float, default=0.02, help="share of requests answered with a 5xx, both stand-ins (default: 0.02)")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.02, help="share of requests answered with a 429, both stand-ins (default: 0.02)")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="retry-after seconds of injected 429s (default: 1)")
+    parser.add_argument('--rpm', type=int, default=None, help="OpenAI stand-in requests per minute (default: unlimited)")
+    parser.add_argument('--tpm', type=int, default=None, help="OpenAI stand-in tokens per minute (default: unlimited)")
+    parser.add_argument('--max-attempts', type=int, default=6, help="extractor --max-attempts (default: 6)")
+    parser.add_argument('--seed', type=int, default=17)
+    parser.add_argument('--output', default=None,
+                        help="CSV to append the results to, e.g. ../../dataset/benchmarks/load-test.csv (default: only print them)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_dir = os.path.join(work_dir, 'pdfs')
+        os.makedirs(input_dir)
+        golden = write_corpus(input_dir, args.files, args.scanned_fraction, args.seed)
+        responses = {filename: benchmark.canned_response(row) for filename, row in golden.items()}
+
+        openai_faults = FaultInjector(args.llm_latency, args.error_rate, args.rate_limit_rate, args.retry_after, QuotaWindow(args.rpm, args.tpm))
+        whisper_faults = FaultInjector(args.whisper_latency, args.error_rate, args.rate_limit_rate, args.retry_after)
+        openai = openai_server.serve(port=0, faults=openai_faults, responses=responses)
+        job_latency = args.whisper_job_latency
+        whisper = whisper_server.serve(port=0, job_latency=job_latency.median, latency_jitter=job_latency.spread,
+                                       job_latency_distribution=job_latency.distribution, faults=whisper_faults)
+        env = dict(
+            os.environ,
+            OPENAI_BASE_URL=f"http://127.0.0.1:{openai.server_port}/v1", OPENAI_API_KEY='stand-in',
+            LLMWHISPERER_BASE_URL_V2=f"http://127.0.0.1:{whisper.server_port}/api/v2", LLMWHISPERER_API_KEY='stand-in',
+            LLMWHISPERER_LOGGING_LEVEL='ERROR',
+        )
+        print(f"{args.files} files ({len(golden)} digital, {args.files - len(golden)} scans), {args.mode} mode; "
+              f"LLM latency {args.llm_latency}, Whisperer job latency {job_latency}, "
+              f"{args.error_rate:.0%} 5xx, {args.rate_limit_rate:.0%} 429s, quota {args.rpm or '-'} rpm / {args.tpm or '-'} tpm")
+
+        results = []
+        for concurrency in args.concurrency:
+            before = openai_faults.counts + whisper_faults.counts
+            wall, spans, rows, returncode = run_level(args.mode, concurrency, work_dir, input_dir, env, args.max_attempts)
+            served = (openai_faults.counts + whisper_faults.counts) - before
+            results.append(summarize(args.mode, concurrency, args.files, wall, spans, rows, golden, served))
+            r = results[-1]
+            print(f"concurrency {concurrency}: {r['written']}/{args.files} files in {r['wall_s']}s ({r['files_per_min']} files/min), "
+                  f"p95 {r['file_p95_ms']} ms per file, {r['correct']}/{len(golden)} digital rows match their canned answer"
+                  + (f", extractor exited with {returncode}" if returncode else ''))
+        openai.shutdown()
+        whisper.shutdown()
+
+    print_table(results)
+    print(f"\nOpenAI stand-in: {openai_faults.summary()}")
+    print(f"Whisperer stand-in: {whisper_faults.summary()}")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        new_file = not os.path.exists(args.output)
+        with open(args.output, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['run_at', *results[0]])
+            if new_file:
+                writer.writeheader()
+            run_at = time.strftime('%Y-%m-%d %H:%M:%S')
+            writer.writerows({'run_at': run_at, **result} for result in results)
+        print(f"Results appended to {args.output}")
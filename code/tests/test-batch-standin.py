@@ -0,0 +1,58 @@
+# Runs `llm-extractor.py --batch` end to end against the local OpenAI stand-in (no API spend).
+# Run from code/tests/: python test-batch-standin.py
+import os
+import sys
+import subprocess
+import tempfile
+import pymupdf
+
+sys.path.insert(0, '..')
+from standins.openai_server import serve
+
+FORM_TEXT = "\n".join([
+    "INITIAL REPORT ON WEATHER MODIFICATION ACTIVITIES",
+    "1. PROJECT OR ACTIVITY DESIGNATION: Western Uintas Cloud Seeding Program",
+    "2. PURPOSE OF PROJECT OR ACTIVITY: Augment snowpack",
+    "3. SPONSOR: Utah Division of Water Resources",
+    "4. OPERATOR: North American Weather Consultants  AFFILIATION: NAWC",
+    "5. TARGET AND CONTROL AREAS: TARGET AREA: Western Uinta Mountains  CONTROL AREA: None",
+    "6. DATES OF PROJECT: DATE FIRST ACTUAL WEATHER MODIFICATION 11/15/2017  EXPECTED TERMINATION DATE 04/15/2018",
+    "7. DESCRIPTION OF WEATHER MODIFICATION APPARATUS, MODIFICATION AGENTS AND THEIR DISPERSAL RATES:",
+    "Ground based silver iodide generators operated during winter storm periods. " * 8,
+])
+
+with tempfile.TemporaryDirectory() as tmp:
+    input_dir = os.path.join(tmp, 'pdfs')
+    os.makedirs(input_dir)
+    for i in range(3):
+        doc = pymupdf.open()
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (36, 36, -36, -36), FORM_TEXT, fontsize=8)
+        doc.save(os.path.join(input_dir, f"2018UTTEST-{i}.pdf"))
+
+    server = serve(port=8124, batch_latency=2)
+    env = dict(os.environ, OPENAI_BASE_URL='http://127.0.0.1:8124/v1', OPENAI_API_KEY='stand-in')
+    output_file = os.path.join(tmp, 'out.csv')
+    subprocess.run([
+        sys.executable, 'llm-extractor.py', '--batch',
+        '--input-dir', input_dir,
+        '--output-file', output_file,
+        '--job-store', os.path.join(tmp, 'jobs.sqlite'),
+        '--batch-dir', os.path.join(tmp, 'batches'),
+        '--batch-poll-interval', '1',
+        '--whisper-jobs', os.path.join(tmp, 'whisper-jobs.json'),
+        '--triage-stats', os.path.join(tmp, 'triage-stats.json'),
+        '--scan-cache', os.path.join(tmp, 'scan-metrics.sqlite'),
+        '--compaction-report', os.path.join(tmp, 'compaction-report.csv'),
+        '--metrics-file', os.path.join(tmp, 'spans.jsonl'),
+        '--prometheus-file', os.path.join(tmp, 'stage-latency.prom'),
+        '--method-counts-file', os.path.join(tmp, 'pdf_method_counts.txt'),
+        '--no-text-cache', '--no-response-cache',
+    ], cwd='..', env=env, check=True)
+    server.shutdown()
+
+    with open(output_file, encoding='utf-8') as f:
+        rows = f.read().splitlines()
+    print("\n".join(rows))
+    assert len(rows) == 4, f"expected a header and 3 rows, got {len(rows)} lines"
+    print("\nBatch mode against the stand-in: OK")
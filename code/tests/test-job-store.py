@@ -0,0 +1,84 @@
+# Checks the SQLite job store: concurrent workers never claim the same file, claims of a dead process go
+# back to pending, processed-files.txt + an existing CSV migrate without losing or duplicating rows, and
+# failed files follow the dead-letter retry schedule.
+# Run from code/tests/: python test-job-store.py
+import csv
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Barrier, Pool
+
+sys.path.insert(0, '..')
+from extractor.job_store import JobStore
+
+FIELDNAMES = ['filename', 'project']
+
+def start_together(barrier):
+    global start_barrier
+    start_barrier = barrier
+
+def claim_all(db_path):
+    store = JobStore(db_path)
+    start_barrier.wait()  # every worker has the store open before any of them claims, so they race for the same rows
+    claimed = []
+    for file in store.iter_claims():
+        claimed.append(file)
+        store.record_parsed(file, {'filename': file, 'project': f'project {file}'})
+        time.sleep(0.002)  # a little work per file, so the other workers get at the claim transaction in between
+    return claimed
+
+with tempfile.TemporaryDirectory() as tmp:
+    # 1. four processes draining one store
+    db_path = os.path.join(tmp, 'jobs.sqlite')
+    files = [f"2020UTTEST-{i:03d}.pdf" for i in range(200)]
+    JobStore(db_path).add_files(files)
+    with Pool(4, initializer=start_together, initargs=(Barrier(4, timeout=60),)) as pool:
+        claims = pool.map(claim_all, [db_path] * 4, chunksize=1)
+    claimed = [f for worker in claims for f in worker]
+    assert len(claimed) == len(set(claimed)), "a file was claimed twice"
+    assert sorted(claimed) == files, "a file was not claimed"
+    assert sum(1 for worker in claims if worker) > 1, f"one worker claimed everything ({[len(c) for c in claims]}); the race wasn't exercised"
+    print(f"1. 4 workers claimed {[len(c) for c in claims]} files, no duplicates: OK")
+
+    # 2. claims held by a process that died are released
+    store = JobStore(db_path, worker_id=f"{os.uname().nodename}:999999999")
+    store.add_files(['2021UTCRASH-1.pdf'])
+    assert store.claim() == ['2021UTCRASH-1.pdf']
+    assert JobStore(db_path).claim() == ['2021UTCRASH-1.pdf'], "claim of a dead worker was not released"
+    print("2. dead worker's claim released: OK")
+
+    # 3. migration: rows in the CSV are kept, checkpointed files without a row go back to pending
+    output_file = os.path.join(tmp, 'out.csv')
+    checkpoint_file = os.path.join(tmp, 'processed-files.txt')
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows([{'filename': 'b.pdf', 'project': 'b'}, {'filename': 'a.pdf', 'project': 'a'}])
+    with open(checkpoint_file, 'w') as f:
+        f.write('b.pdf\na.pdf\nlost.pdf\n')
+    store = JobStore(os.path.join(tmp, 'migrated.sqlite'))
+    store.import_checkpoint(checkpoint_file, output_file)
+    store.add_files(['a.pdf', 'b.pdf', 'lost.pdf', 'new.pdf'])
+    assert store.claim() == ['lost.pdf', 'new.pdf']
+    store.record_parsed('new.pdf', {'filename': 'new.pdf', 'project': 'new'})
+    store.release()
+    assert store.export_csv(output_file, FIELDNAMES) == 3
+    with open(output_file, newline='', encoding='utf-8') as f:
+        assert [row['filename'] for row in csv.DictReader(f)] == ['b.pdf', 'a.pdf', 'new.pdf']
+    print(store.summary())
+    print("3. checkpoint + CSV migrated, export keeps row order: OK")
+
+    # 4. dead-letter queue: retried on schedule, parked after max_attempts, retry-failed ignores the schedule
+    store = JobStore(os.path.join(tmp, 'dlq.sqlite'), retry_delay=3600, max_attempts=2)
+    store.add_files(['corrupt.pdf'])
+    assert store.claim() == ['corrupt.pdf']
+    state, next_retry_at = store.record_failure('corrupt.pdf', RuntimeError("All PDF text extraction methods failed"))
+    assert state == 'failed' and next_retry_at > store.opened_at + 3500
+    assert JobStore(store.db_path).claim() == [], "failed file claimed before its retry time"
+    retry = JobStore(store.db_path, max_attempts=2)
+    assert retry.claim(retry_failed=True) == ['corrupt.pdf']
+    assert retry.record_failure('corrupt.pdf', ValueError("still broken")) == ('dead', None)
+    assert retry.claim(retry_failed=True) == [], "a file that failed in this run was claimed again"
+    print(retry.dead_letter_summary())
+    print("4. dead-letter schedule and retry-failed: OK")
@@ -0,0 +1,78 @@
+# Checks the Form 17-4 key phrase matcher: a clean page and a page with OCR typos are accepted, while a page
+# missing a required phrase is rejected even when the mean confidence still clears MIN_PHRASE_CONFIDENCE.
+# Run from code/tests/: python test-phrase-match.py
+import re
+import sys
+
+sys.path.insert(0, '..')
+from extractor.phrase_match import PhraseMatcher
+
+# Same phrases and thresholds as llm-extractor.py
+KEY_PHRASES = [
+    "initial report on weather modification",
+    "project or activity designation",
+    "purpose of project or activity",
+    "sponsor",
+    "operator",
+    "target and control areas",
+    "target area",
+    "control area",
+    "dates of project",
+    "date first actual weather modification",
+    "expected termination date",
+    "description of weather modification",
+    "affiliation"
+]
+matcher = PhraseMatcher(KEY_PHRASES, min_confidence=0.9, min_phrase_score=0.8)
+
+PAGE = """U.S. DEPARTMENT OF COMMERCE                                   NOAA FORM 17-4
+INITIAL REPORT ON WEATHER MODIFICATION ACTIVITIES
+1. PROJECT OR ACTIVITY DESIGNATION:
+   Wasatch Front Cloud Seeding Program
+2. PURPOSE OF PROJECT OR ACTIVITY:
+   Augment winter snowpack
+3. SPONSOR: name, affiliation and address
+   Utah Water Conservancy District
+4. OPERATOR: name, affiliation and address
+   North American Weather Consultants
+5. TARGET AND CONTROL AREAS:
+   TARGET AREA: Wasatch Mountains           CONTROL AREA: none
+6. DATES OF PROJECT
+   DATE FIRST ACTUAL WEATHER MODIFICATION: 11/01/2017
+   EXPECTED TERMINATION DATE: 04/15/2018
+7. DESCRIPTION OF WEATHER MODIFICATION APPARATUS, MODIFICATION AGENTS AND THEIR DISPERSAL RATES:
+   Ground-based generators dispersing silver iodide at 10-20 g/hr during storm periods.
+"""
+
+def without(text, *phrases):
+    for phrase in phrases:
+        text = re.sub(re.escape(phrase), '', text, flags=re.IGNORECASE)
+    return text
+
+# 1. verbatim page
+result = matcher.match(PAGE)
+assert result['accepted'] and result['confidence'] == 1.0, result
+print("1. clean page accepted, confidence 1.0: OK")
+
+# 2. OCR typos, one or two edits per phrase
+typos = PAGE.replace('SPONSOR', 'SP0NSOR').replace('TARGET AND CONTROL', 'TARGETAND C0NTROL').replace('DATES OF PROJECT', 'DATES 0F PR0JECT')
+result = matcher.match(typos)
+assert result['accepted'] and result['confidence'] < 1.0, result
+print(f"2. page with OCR typos accepted, confidence {result['confidence']:.3f}: OK")
+
+# 3. required phrases missing: the mean stays above 0.9 but the page is rejected
+for missing in [("expected termination date", "description of weather modification"), ("sponsor", "affiliation"), ("control area",)]:
+    text = without(PAGE, *missing)
+    result = matcher.match(text)
+    weakest = min(result['scores'].values())
+    assert result['confidence'] >= matcher.min_confidence and not result['accepted'], f"accepted without {missing}: {result}"
+    assert weakest < matcher.min_phrase_score
+    print(f"3. page without {', '.join(missing)} rejected "
+          f"(confidence {result['confidence']:.3f}, weakest phrase {weakest:.2f}): OK")
+
+# 4. unrelated text
+result = matcher.match("Annual precipitation summary for the Colorado River basin, water year 2018. " * 20)
+assert not result['accepted'], result
+print(f"4. unrelated document rejected, confidence {result['confidence']:.3f}: OK")
+
+print("\nAll phrase matching checks passed.")
@@ -0,0 +1,77 @@
+# Checks the Form 17-4 region template (extractor/regions.py) against a synthetic scan of the two-column 4-81
+# layout: every printed label must fall inside its template box, ocr_form_regions must find the labels and
+# return each box's value under the right field, and a page that doesn't follow the layout must return None
+# (so the extractor falls back to full-page OCR). The OCR checks need tesseract on the PATH.
+# Run from code/tests/: python test-region-ocr.py
+import os
+import shutil
+import sys
+import tempfile
+
+import pymupdf
+
+sys.path.insert(0, '..')
+from extractor.rasterize import render_first_page
+from extractor.regions import FORM_17_4_TEMPLATE, format_field_map, ocr_form_regions
+
+# (field, label as printed, value, (x, y) of the label as a fraction of the page); the value goes on the next
+# line. Boxes 1-4 sit in two columns, target/control areas and the description run the full width.
+FORM = [
+    ('project',     '1. PROJECT OR ACTIVITY DESIGNATION',   'Wasatch Front Cloud Seeding Program',           (0.06, 0.105)),
+    ('dates',       '6. DATES OF PROJECT',                  'First modification 11/01/2017, ends 04/15/2018', (0.56, 0.105)),
+    ('purpose',     '2. PURPOSE OF PROJECT OR ACTIVITY',    'Augment winter snowpack',                       (0.06, 0.190)),
+    ('sponsor',     '3. SPONSOR',                           'Utah Division of Water Resources',              (0.06, 0.260)),
+    ('operator',    '4. OPERATOR',                          'North American Weather Consultants',            (0.56, 0.260)),
+    ('areas',       '5. TARGET AND CONTROL AREAS',          'Target area Wasatch Mountains, no control area', (0.06, 0.395)),
+    ('description', '7. DESCRIPTION OF WEATHER MODIFICATION', 'Ground generators dispersing silver iodide',   (0.06, 0.475)),
+]
+
+def write_form(path, entries, fontsize=10):
+    doc = pymupdf.open()
+    page = doc.new_page()  # letter-size
+    width, height = page.rect.width, page.rect.height
+    for _, label, value, (x, y) in entries:
+        page.insert_text((x * width, y * height), label, fontsize=fontsize, fontname='helv')
+        page.insert_text((x * width, y * height + fontsize * 1.6), value, fontsize=fontsize, fontname='helv')
+    doc.save(path)
+    doc.close()
+
+def inside(rect, box, page):
+    x0, y0, x1, y1 = box
+    return (rect.x0 >= x0 * page.rect.width and rect.x1 <= x1 * page.rect.width
+            and rect.y0 >= y0 * page.rect.height and rect.y1 <= y1 * page.rect.height)
+
+with tempfile.TemporaryDirectory() as tmp:
+    form_pdf = os.path.join(tmp, 'form.pdf')
+    write_form(form_pdf, FORM)
+
+    # 1. the synthetic page follows the template: each label (and its value) lies inside its field's box
+    boxes = {region['field']: region['box'] for region in FORM_17_4_TEMPLATE}
+    assert set(boxes) == {field for field, *_ in FORM}, "template fields changed; update FORM"
+    with pymupdf.open(form_pdf) as doc:
+        page = doc[0]
+        for field, label, value, _ in FORM:
+            for text in (label, value):
+                hits = page.search_for(text)
+                assert hits and inside(hits[0], boxes[field], page), f"{text!r} is outside the {field} box {boxes[field]}"
+    print(f"1. all {len(FORM)} labels and values fall inside their template boxes: OK")
+
+    if shutil.which('tesseract') is None:
+        print("\ntesseract not installed; skipping the OCR checks.")
+        sys.exit(0)
+
+    # 2. OCR by region finds every field's value in its own box
+    fields = ocr_form_regions(render_first_page(form_pdf, dpi=200))
+    assert fields is not None, "the synthetic 4-81 page didn't fit the template"
+    for field, _, value, _ in FORM:
+        assert value.lower() in fields[field], f"{field}: expected {value.lower()!r} in {fields[field]!r}"
+    print("2. ocr_form_regions read every field from its box: OK")
+    print(format_field_map(fields))
+
+    # 3. a page in another layout (everything in one column, top to bottom) doesn't fit the template
+    other_pdf = os.path.join(tmp, 'other-layout.pdf')
+    write_form(other_pdf, [(field, label, value, (0.06, 0.60 + i * 0.05)) for i, (field, label, value, _) in enumerate(FORM)])
+    assert ocr_form_regions(render_first_page(other_pdf, dpi=200)) is None, "a page in another layout matched the template"
+    print("3. a page in another layout falls back to full-page OCR: OK")
+
+print("\nAll region OCR checks passed.")